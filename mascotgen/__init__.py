@@ -0,0 +1,49 @@
+"""
+Shared ComfyUI tooling for generate_mascot.py / generate_mascots.py.
+"""
+from .atlas import AtlasSpec, build_atlases
+from .cache import RenderCache, workflow_key
+from .client import ComfyClient, ComfyError
+from .finalize import finalize_dir
+from .imaging import ENCODE_MODES, MODERN_FORMATS, encode_modern, encode_png, resize_all, write_sizes
+from .jobs import RenderJob, make_workflow, warmup_workflow
+from .manifest import BuildState, Manifest, load_manifest
+from .pipeline import Pipeline
+from .plan import RenderPlan
+from .policy import CircuitOpen, Policy
+from .qa import QAFailed, QASpec
+from .scheduler import Scheduler
+from .timing import Stages
+from .tracker import CompletionTracker, PromptFailed
+
+__all__ = [
+    "ENCODE_MODES",
+    "MODERN_FORMATS",
+    "AtlasSpec",
+    "BuildState",
+    "CircuitOpen",
+    "ComfyClient",
+    "ComfyError",
+    "CompletionTracker",
+    "Manifest",
+    "Pipeline",
+    "Policy",
+    "PromptFailed",
+    "QAFailed",
+    "QASpec",
+    "RenderCache",
+    "RenderJob",
+    "RenderPlan",
+    "Scheduler",
+    "Stages",
+    "build_atlases",
+    "encode_modern",
+    "encode_png",
+    "finalize_dir",
+    "load_manifest",
+    "make_workflow",
+    "resize_all",
+    "warmup_workflow",
+    "workflow_key",
+    "write_sizes",
+]
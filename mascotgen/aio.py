@@ -0,0 +1,471 @@
+"""
+asyncio ComfyUI client and the default single-server runner.
+
+Every job is one coroutine (queue -> wait -> download -> resize) and at
+most `concurrency` of them are in flight, so the ComfyUI queue stays a
+few prompts deep without a thread per stage. Only the standard library
+is used: a small keep-alive HTTP/1.1 client on asyncio streams and a
+read-only /ws reader that feeds the same CompletionTracker the threaded
+client uses. Requests are retried as the threaded client's are (see
+mascotgen.policy). Everything else a job goes through (resuming,
+admission, the warm-up, waiting with /history as the fallback, the QA
+re-roll) is the threaded runners' own code, driven on the event loop
+(see mascotgen.steps). Resizing runs in an executor (and the encode
+process pool, if any).
+
+Ctrl-C cancels cleanly: our prompts still pending in ComfyUI's queue are
+deleted and, if one of ours is the one running, /interrupt stops it, so
+an abandoned run doesn't keep the GPU busy. Other users' prompts are
+left alone. Like the threaded runners, jobs re-attach to prompts a
+crashed or timed-out run left behind (see mascotgen.journal).
+"""
+import asyncio
+import base64
+import itertools
+import json
+import os
+import signal
+import ssl
+import urllib.parse
+import uuid
+
+from .client import DEFAULT_URL, ComfyClient, ComfyError, backend_class, stage_of
+from .pipeline import Pipeline
+from .policy import CircuitBreaker, Policy, Retry
+from .qa import QAFailed
+from .steps import adrive
+from .tracker import CompletionTracker
+
+
+# URL scheme -> "module:Class" of its asyncio client (the twin of client.BACKENDS).
+ASYNC_BACKENDS = {"local": "mascotgen.local:AsyncLocalClient"}
+
+
+class _Stale(Exception):
+    """A reused keep-alive connection was closed by the server before it answered."""
+
+
+class AsyncComfyClient:
+    def __init__(self, base_url: str = DEFAULT_URL, client_id: str = None, timeout: float = 60,
+                 connections: int = 4, poll_initial: float = 0.25, poll_max: float = 4.0, policy: Policy = None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.timeout = timeout  # per attempt; the policy bounds the whole call
+        self.policy = policy or Policy()
+        self.breaker = CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_cooldown)
+        url = urllib.parse.urlparse(self.base_url)
+        self._host = url.hostname
+        self._port = url.port or (443 if url.scheme == "https" else 80)
+        self._ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self._netloc = url.netloc
+        self._connections = connections
+        self._slots = None     # Semaphore, created on the running loop
+        self._admission = None  # Lock, likewise (see admission)
+        self._idle = []        # keep-alive (reader, writer) pairs
+        self.tracker = CompletionTracker(self.base_url, self.client_id, poll_initial, poll_max)  # state only
+        self._waiters = set()  # asyncio.Events set on every /ws message
+        self._ws = None        # (reader, writer) while the event socket is up
+        self._ws_task = None
+
+    # ----- transport -----
+
+    async def _open(self):
+        return await asyncio.open_connection(self._host, self._port, ssl=self._ssl)
+
+    async def request(self, method: str, path: str, payload=None, sink=None):
+        """Send a request and return the response body (or, with sink, stream it there and return the size).
+
+        Transient failures are retried per the policy, as in ComfyClient.request.
+        """
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self._netloc}\r\nContent-Length: {len(body)}\r\n"
+        if payload is not None:
+            head += "Content-Type: application/json\r\n"
+        message = (head + "\r\n").encode("latin-1") + body  # one write: no Nagle/delayed-ACK stall
+        retry = Retry(self.policy, self.breaker, stage_of(method, path), f"{method} {path}", self.base_url)
+        while True:
+            await asyncio.sleep(retry.gate())
+            try:
+                data = await self._send(method, path, message, sink, max(1.0, min(self.timeout, retry.remaining())))
+            except Exception as e:
+                delay = retry.failed(e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                if sink is not None:
+                    sink.seek(0)
+                    sink.truncate()
+                continue
+            retry.succeeded()
+            return data
+
+    async def _send(self, method: str, path: str, message: bytes, sink, timeout: float):
+        """One attempt of request()."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._connections)
+        async with self._slots:
+            submit = stage_of(method, path) == "submit"
+            for attempt in range(2):
+                while self._idle and self._idle[-1][0].at_eof():
+                    self._idle.pop()[1].close()  # closed by the server while idle
+                reused = bool(self._idle)
+                conn = self._idle.pop() if reused else await asyncio.wait_for(self._open(), timeout)
+                try:
+                    status, data, keep = await asyncio.wait_for(self._exchange(conn, message, sink), timeout)
+                except _Stale:
+                    conn[1].close()
+                    if reused and not attempt and not submit:
+                        continue  # server closed our idle socket; retry once on a fresh one
+                    raise ConnectionResetError(f"{method} {path}: connection closed by server")
+                except BaseException:
+                    conn[1].close()
+                    raise
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    conn[1].close()
+                if status >= 400:
+                    raise ComfyError(f"{method} {path}: HTTP {status} {data[:200]!r}", status)
+                return data
+
+    async def _exchange(self, conn, message: bytes, sink) -> tuple:
+        reader, writer = conn
+        try:
+            writer.write(message)
+            await writer.drain()
+            line = await reader.readline()
+        except ConnectionError:
+            raise _Stale()
+        if not line:
+            raise _Stale()
+        status = int(line.split()[1])
+        headers = await self._read_headers(reader)
+        keep = headers.get("connection", "").lower() != "close"
+        if "content-length" not in headers and "chunked" not in headers.get("transfer-encoding", ""):
+            keep = False  # body runs to EOF
+        if sink is not None and status < 400:
+            total = 0
+            async for chunk in self._body(reader, headers):
+                sink.write(chunk)
+                total += len(chunk)
+            return status, total, keep
+        return status, b"".join([chunk async for chunk in self._body(reader, headers)]), keep
+
+    @staticmethod
+    async def _read_headers(reader) -> dict:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _body(reader, headers: dict):
+        if "chunked" in headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await AsyncComfyClient._read_headers(reader)  # trailers
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                chunk = await reader.read(min(64 * 1024, remaining))
+                if not chunk:
+                    raise ConnectionResetError("connection closed mid-body")
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while chunk := await reader.read(64 * 1024):
+                yield chunk
+
+    async def get_json(self, path: str):
+        return json.loads(await self.request("GET", path))
+
+    async def post_json(self, path: str, payload: dict):
+        data = await self.request("POST", path, payload)
+        return json.loads(data) if data else {}
+
+    async def close(self):
+        if self._ws_task is not None:
+            self._ws_task.cancel()
+            await asyncio.gather(self._ws_task, return_exceptions=True)
+        conns, self._idle = self._idle, []
+        for reader, writer in conns:
+            writer.close()
+
+    # ----- API -----
+
+    async def system_stats(self) -> dict:
+        return await self.get_json("/system_stats")
+
+    async def queue_prompt(self, workflow: dict) -> str:
+        """Queue a prompt under our client_id and return the prompt_id."""
+        result = await self.post_json("/prompt", {"prompt": workflow, "client_id": self.client_id})
+        return result["prompt_id"]
+
+    async def history(self, prompt_id: str):
+        return (await self.get_json(f"/history/{prompt_id}")).get(prompt_id)
+
+    async def queue_state(self) -> dict:
+        return await self.get_json("/queue")
+
+    async def delete_queued(self, prompt_ids: list):
+        await self.post_json("/queue", {"delete": list(prompt_ids)})
+
+    async def interrupt(self):
+        await self.post_json("/interrupt", {})
+
+    output_images = staticmethod(ComfyClient.output_images)
+
+    async def stream_image(self, img_info: dict, sink) -> int:
+        params = urllib.parse.urlencode({"filename": img_info["filename"],
+                                         "subfolder": img_info.get("subfolder", ""),
+                                         "type": img_info.get("type", "output")})
+        return await self.request("GET", f"/view?{params}", sink=sink)
+
+    @property
+    def admission(self) -> asyncio.Lock:
+        """Lock held by the task polling a full queue (see Pipeline.admitting)."""
+        if self._admission is None:
+            self._admission = asyncio.Lock()
+        return self._admission
+
+    # ----- completion tracking -----
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    async def start_tracking(self) -> bool:
+        """Open the /ws event socket. Returns False (polling mode) if the server won't upgrade."""
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (f"GET /ws?clientId={self.client_id} HTTP/1.1\r\nHost: {self._netloc}\r\n"
+                   f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                   f"Sec-WebSocket-Version: 13\r\n\r\n")
+        try:
+            reader, writer = await asyncio.wait_for(self._open(), self.timeout)
+            writer.write(request.encode("latin-1"))
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            await self._read_headers(reader)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        if b" 101 " not in line:
+            writer.close()
+            return False
+        self._ws = (reader, writer)
+        self._ws_task = asyncio.create_task(self._read_ws(reader, writer))
+        return True
+
+    async def _read_ws(self, reader, writer):
+        text = b""
+        try:
+            while True:
+                b1, b2 = await reader.readexactly(2)
+                opcode = b1 & 0x0F
+                length = b2 & 0x7F
+                if length == 126:
+                    length = int.from_bytes(await reader.readexactly(2), "big")
+                elif length == 127:
+                    length = int.from_bytes(await reader.readexactly(8), "big")
+                mask = await reader.readexactly(4) if b2 & 0x80 else None
+                payload = await reader.readexactly(length)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                if opcode == 0x8:
+                    return
+                if opcode == 0x9:  # ping -> pong; client frames must be masked
+                    key = os.urandom(4)
+                    writer.write(bytes([0x8A, 0x80 | len(payload)]) + key
+                                 + bytes(b ^ key[i % 4] for i, b in enumerate(payload)))
+                    continue
+                if opcode in (0x1, 0x0) and (opcode == 0x1 or text):
+                    text += payload
+                    if b1 & 0x80:
+                        self.tracker.handle(json.loads(text))
+                        text = b""
+                        self._wake()
+                # 0x2: binary latent previews; ignored
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._ws = None
+            writer.close()
+            self._wake()
+
+    def _wake(self):
+        for event in self._waiters:
+            event.set()
+
+    async def idle(self, seq: int, timeout: float):
+        """Wait until a message after seq resolves a prompt, the socket drops, or timeout passes."""
+        changed = asyncio.Event()
+        self._waiters.add(changed)
+        try:
+            if self.tracker.seq == seq and self.connected:
+                await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(changed)
+
+    async def wait(self, prompt_id: str, timeout: float = 300) -> dict:
+        """Wait for prompt_id to finish and return its history-shaped entry (see CompletionTracker.waiting)."""
+        step = self.tracker.waiting([prompt_id], timeout, self.history, self.idle, lambda: self.connected)
+        return (await adrive(step))[1]
+
+
+def open_client(url: str = DEFAULT_URL, client_id: str = None, **kwargs):
+    """An asyncio client for url: AsyncComfyClient, or the ASYNC_BACKENDS class for its scheme."""
+    return backend_class(url, ASYNC_BACKENDS, AsyncComfyClient)(url, client_id, **kwargs)
+
+
+# ----- runner -----
+
+async def cancel_remote(client: AsyncComfyClient, prompt_ids: list):
+    """Delete our still-pending prompts from ComfyUI's queue and interrupt ours if it's running."""
+    if not prompt_ids:
+        return
+    try:
+        state = await client.queue_state()
+        pending = [item[1] for item in state.get("queue_pending", []) if item[1] in prompt_ids]
+        running = [item[1] for item in state.get("queue_running", []) if item[1] in prompt_ids]
+        if pending:
+            await client.delete_queued(pending)
+            print(f"  Removed {len(pending)} pending prompt(s) from the ComfyUI queue")
+        if running:
+            await client.interrupt()
+            print(f"  Interrupted running prompt {running[0]}")
+    except (OSError, ValueError) as e:
+        print(f"  Could not cancel on the server: {e}")
+
+
+async def run_jobs(pipeline: Pipeline, client: AsyncComfyClient, jobs, concurrency: int = 4,
+                   on_result=None) -> dict:
+    """Run jobs with at most `concurrency` in flight. Returns {name: success}.
+
+    jobs may be any iterable; it is consumed lazily, one job per free
+    slot. With on_result, each outcome is passed to on_result(job, written
+    rows, or None on failure) instead of being collected, so memory stays
+    flat however many jobs there are (concurrency 0 = all then needs a list).
+
+    On cancellation our prompts are removed from the server before the
+    CancelledError propagates.
+    """
+    loop = asyncio.get_running_loop()
+    workers = concurrency if concurrency > 0 else max(1, len(jobs))
+    pending = iter(jobs)
+    ours = {}  # prompt_id -> job, queued on the server and not yet finished
+    results = {}
+
+    async def attempt(job):
+        """Render (or take from the cache) and save one job; its written rows, or None."""
+        source = await adrive(pipeline.rendering(job, client, ours))
+        if source is None:
+            return None
+        return await loop.run_in_executor(None, pipeline.save, job, source)
+
+    async def one(job):
+        """attempt() job, re-rolling its seed while the render fails QA (see Pipeline.reroll)."""
+        try:
+            return await attempt(job)
+        except QAFailed as failed:
+            return await adrive(pipeline.rerolling(failed, attempt))
+
+    async def worker():
+        # A plain iterator shared by every worker: next() never yields to the loop,
+        # so no two workers can take the same job.
+        for job in pending:
+            try:
+                written = await one(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"  ERROR: {job.name}: {e}")
+                written = None
+            if on_result is not None:
+                on_result(job, written)
+            else:
+                results[job.name] = written is not None
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print("\nCancelling...")
+        await cancel_remote(client, list(ours))
+        raise
+    return results
+
+
+def probe(url: str, policy: Policy = None):
+    """Health-check url via /system_stats (retried per policy).
+
+    Returns the GPU name, or None if ComfyUI isn't reachable.
+    """
+    async def check():
+        client = open_client(url, timeout=10, policy=policy)
+        try:
+            stats = await client.system_stats()
+        finally:
+            await client.close()
+        return stats.get("devices", [{}])[0].get("name", "unknown")
+
+    try:
+        gpu = asyncio.run(check())
+    except (OSError, ValueError) as e:
+        print(f"ComfyUI not available: {e}")
+        return None
+    print(f"ComfyUI connected: {gpu}")
+    return gpu
+
+
+def run(pipeline: Pipeline, url: str, jobs, concurrency: int = 4, warmup: bool = True, on_result=None) -> dict:
+    """Run jobs against url on a fresh event loop; Ctrl-C cleans up the server, then raises KeyboardInterrupt.
+
+    jobs is a list, or with on_result (see run_jobs) any iterable; the
+    warm-up then only looks at its first job.
+    """
+    async def main(jobs):
+        task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, task.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows / not the main thread: default KeyboardInterrupt handling
+        client = open_client(url, pipeline.journal.client_id(url), policy=pipeline.policy)
+        try:
+            tracking = await client.start_tracking()
+            print(f"Completion tracking: {'websocket' if tracking else 'polling'}")
+            count = f"{len(jobs)} images" if isinstance(jobs, list) else "streaming"
+            if warmup and isinstance(jobs, list):
+                await adrive(pipeline.warming(jobs, client))
+            elif warmup:
+                jobs = iter(jobs)
+                first = next(jobs, None)
+                if first is not None:
+                    await adrive(pipeline.warming([first], client))
+                    jobs = itertools.chain([first], jobs)
+            print("\n" + "="*60)
+            print(f"  ASYNC GENERATION ({count}, {concurrency or 'all'} in flight)")
+            print("="*60)
+            return await run_jobs(pipeline, client, jobs, concurrency, on_result)
+        finally:
+            await client.close()
+            try:
+                loop.remove_signal_handler(signal.SIGINT)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    try:
+        return asyncio.run(main(jobs))
+    except asyncio.CancelledError:
+        raise KeyboardInterrupt from None
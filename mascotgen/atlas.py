@@ -0,0 +1,192 @@
+"""
+Sprite atlases for the small icon sizes.
+
+Every output of a manifest whose side is at most `max_size` is grouped by
+its exact size (the tier: "48", "64", "128", or "WxH") and packed into one
+PNG per tier and output directory, next to the icons:
+
+    public/mascot/mascot-atlas-48.png    every *-48.png icon
+    public/mascot/mascot-atlas.json      {tier: {image, width, height, sprites: {file: {x, y, w, h}}}}
+    src/data/mascot-atlas.ts             the same map as a typed constant (optional)
+
+so the app loads one image per tier instead of one per icon. Sprites are
+keyed by the file name they'd otherwise be loaded from.
+
+Rebuilds are incremental: the state file remembers each tier's layout
+and a hash of every sprite's pixels. A tier with no changed sprite is
+left alone; if only pixels changed, just those sprites are pasted into
+the existing atlas; a new, removed or resized icon repacks the tier.
+
+Configured by an [atlas] table in the manifest:
+
+    [atlas]
+    name = "mascot-atlas"           # file prefix and TS constant (MASCOT_ATLAS)
+    max_size = 128                  # pack outputs up to this side
+    ts = "../src/data/mascot-atlas.ts"
+    url = "/mascot/"                # prefix for image in the TS map
+
+    python -m mascotgen.atlas manifests/name-chemi.toml
+"""
+import argparse
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .finalize import pixel_hash
+from .imaging import _box, encode_png
+
+PADDING = 2  # transparent gap between sprites so scaled backgrounds don't bleed into neighbours
+
+
+@dataclass
+class AtlasSpec:
+    name: str = "atlas"
+    max_size: int = 128
+    ts: Path = None
+    url: str = ""
+
+
+def tier_name(w: int, h: int) -> str:
+    return str(w) if w == h else f"{w}x{h}"
+
+
+def tiers(jobs: list, max_size: int) -> dict:
+    """{output_dir: {tier: [(file name, w, h)]}} for every output at most max_size on a side."""
+    out = {}
+    for job in jobs:
+        for fname, size in job.sizes.items():
+            w, h = _box(size)
+            if max(w, h) <= max_size:
+                out.setdefault(Path(job.output_dir), {}).setdefault(tier_name(w, h), []).append((fname, w, h))
+    return out
+
+
+def pack(sprites: list, padding: int = PADDING) -> tuple:
+    """Shelf-pack [(name, w, h)] into a roughly square sheet. Returns ({name: [x, y, w, h]}, width, height)."""
+    sprites = sorted(sprites, key=lambda s: (-s[2], s[0]))
+    area = sum((w + padding) * (h + padding) for _, w, h in sprites)
+    limit = max(max(w for _, w, _ in sprites), math.ceil(math.sqrt(area)))
+    layout = {}
+    x = y = shelf = width = 0
+    for name, w, h in sprites:
+        if x and x + w > limit:
+            x, y, shelf = 0, y + shelf + padding, 0
+        layout[name] = [x, y, w, h]
+        width = max(width, x + w)
+        shelf = max(shelf, h)
+        x += w + padding
+    return layout, width, y + shelf
+
+
+def build_tier(output_dir: Path, tier: str, members: list, spec: AtlasSpec, state: dict,
+               encode: str = "optimize"):
+    """(Re)build one tier's atlas. Returns its map entry, or None if none of its icons exist yet."""
+    from PIL import Image
+    images = {}
+    for fname, w, h in members:
+        path = output_dir / fname
+        if path.exists():
+            with Image.open(path) as img:
+                img.load()
+            images[fname] = img if img.size == (w, h) else img.resize((w, h), Image.LANCZOS)
+    if not images:
+        return None
+
+    layout, width, height = pack([(fname, img.width, img.height) for fname, img in images.items()])
+    hashes = {fname: pixel_hash(img) for fname, img in images.items()}
+    atlas_path = output_dir / f"{spec.name}-{tier}.png"
+    previous = state.get(str(atlas_path), {})
+    entry = {"image": atlas_path.name, "width": width, "height": height,
+             "sprites": {fname: dict(zip("xywh", layout[fname])) for fname in sorted(layout)}}
+
+    if atlas_path.exists() and previous.get("layout") == layout:
+        changed = [fname for fname in layout if previous.get("hashes", {}).get(fname) != hashes[fname]]
+        if not changed:
+            return entry
+        with Image.open(atlas_path) as sheet:
+            sheet = sheet.convert("RGBA")
+        action = f"updated {len(changed)}/{len(layout)} sprites"
+    else:
+        changed = list(layout)
+        sheet = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        action = f"packed {len(layout)} sprites"
+    for fname in changed:
+        x, y, _, _ = layout[fname]
+        sheet.paste(images[fname].convert("RGBA"), (x, y))
+
+    data = encode_png(sheet, encode)
+    atlas_path.write_bytes(data)
+    state[str(atlas_path)] = {"layout": layout, "hashes": hashes}
+    print(f"  Atlas: {atlas_path} ({width}x{height}, {action}, {len(data)//1024}KB)")
+    return entry
+
+
+def write_ts(path: Path, maps: dict, spec: AtlasSpec, source: str):
+    """Write the atlas maps of every output directory as one typed TS constant."""
+    merged = {}
+    for output_dir, tier_map in maps.items():
+        for tier, entry in tier_map.items():
+            if tier in merged:
+                raise ValueError(f"atlas tier {tier} is produced in more than one output directory")
+            merged[tier] = {**entry, "image": spec.url + entry["image"]}
+    const = spec.name.upper().replace("-", "_")
+    text = (f"// Generated by mascotgen.atlas from {source}; do not edit.\n\n"
+            "export interface AtlasSprite {\n  x: number;\n  y: number;\n  w: number;\n  h: number;\n}\n\n"
+            "export interface AtlasTier {\n  image: string;\n  width: number;\n  height: number;\n"
+            "  sprites: Record<string, AtlasSprite>;\n}\n\n"
+            f"export const {const}: Record<string, AtlasTier> = {json.dumps(merged, indent=2, sort_keys=True)};\n")
+    path = Path(path)
+    if not path.exists() or path.read_text(encoding="utf-8") != text:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        print(f"  Atlas map: {path}")
+
+
+def build_atlases(jobs: list, spec: AtlasSpec, state_path: Path, encode: str = "optimize",
+                  source: str = "the manifest") -> dict:
+    """Build every tier atlas and map for jobs' outputs. Returns {output_dir: {tier: map entry}}."""
+    state_path = Path(state_path)
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        state = {}
+
+    start = time.time()
+    maps = {}
+    for output_dir, by_tier in sorted(tiers(jobs, spec.max_size).items()):
+        tier_map = {}
+        for tier, members in sorted(by_tier.items(), key=lambda item: item[1][0][1:]):
+            entry = build_tier(output_dir, tier, members, spec, state, encode)
+            if entry is not None:
+                tier_map[tier] = entry
+        if not tier_map:
+            continue
+        maps[output_dir] = tier_map
+        map_path = output_dir / f"{spec.name}.json"
+        text = json.dumps(tier_map, indent=2, sort_keys=True) + "\n"
+        if not map_path.exists() or map_path.read_text(encoding="utf-8") != text:
+            map_path.write_text(text, encoding="utf-8")
+    if spec.ts is not None and maps:
+        write_ts(spec.ts, maps, spec, source)
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"  Atlases: {sum(len(m) for m in maps.values())} tiers in {time.time() - start:.1f}s")
+    return maps
+
+
+def main():
+    from .manifest import load_manifest
+    parser = argparse.ArgumentParser(description="Pack a manifest's small icons into per-size sprite atlases")
+    parser.add_argument("manifest", type=Path, help="asset manifest (TOML) with an [atlas] table")
+    args = parser.parse_args()
+    manifest = load_manifest(args.manifest)
+    if manifest.atlas is None:
+        raise SystemExit(f"{args.manifest} has no [atlas] table")
+    build_atlases(manifest.jobs, manifest.atlas, manifest.cache_dir / "atlas.json", source=args.manifest.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Benchmark the generators against a simulated ComfyUI server.
+
+    python -m mascotgen.bench                              # both manifests, fake server
+    python -m mascotgen.bench --pipeline --encode-procs 2 --noise 3
+    python -m mascotgen.bench --save before.json
+    python -m mascotgen.bench --baseline before.json       # exit 1 on regression
+    python -m mascotgen.bench --local --latency 0          # post-processing only, no server
+
+Starts mascotgen.fake_server in its own process (--latency, --cold-start,
+--image-size, --noise), then runs every manifest (by default the love-fortune MASCOTS
+set and the name-chemi MASCOT_PROMPTS set plus its logo) in a fresh child
+process per repeat, each against a fresh server, so every run pays the
+same cold start, peak RSS is that run's alone and the server's image
+store isn't counted. Outputs and the render cache go to a
+temporary directory; the real assets are never touched.
+
+Reports, per manifest: wall time, renders and output images per minute,
+peak RSS of the run (and of its encode processes), and for each stage
+(see mascotgen.timing) its wall time (how long at least one
+job was in it) and busy time (summed over jobs; larger than wall when
+stages overlap). Accepts every generator flag, so configurations can be
+compared directly; NAME arguments limit each manifest to those assets.
+Pass --url to benchmark a real ComfyUI instead, or --local to simulate
+the GPU inside each run (mascotgen.local) with the same --latency,
+--cold-start, --image-size and --noise and no server process; with
+--latency 0 that times the download/QA/resize/encode stages alone.
+"""
+import argparse
+import dataclasses
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+from . import cli
+from .manifest import load_manifest
+from .timing import Stages, format_summary
+
+MANIFEST_DIR = Path(__file__).resolve().parent.parent / "manifests"
+DEFAULT_MANIFESTS = [MANIFEST_DIR / "love-fortune.toml", MANIFEST_DIR / "name-chemi.toml"]
+RESULT_PREFIX = "BENCH-RESULT "
+
+
+def build_parser():
+    parser = cli.build_parser("Benchmark the generation pipeline")
+    parser.add_argument("--manifest", action="append", type=Path, dest="manifests",
+                        help="manifest to run (repeatable; default: love-fortune and name-chemi)")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake server: seconds per render")
+    parser.add_argument("--cold-start", type=float, default=1.0,
+                        help="fake server: extra seconds for the first prompt (model load)")
+    parser.add_argument("--image-size", type=int, default=0,
+                        help="fake server: render at this size instead of each job's gen_size")
+    parser.add_argument("--noise", type=int, default=3,
+                        help="fake server: random low bits per channel (0 = tiny solid-colour PNGs)")
+    parser.add_argument("--local", action="store_true",
+                        help="simulate the GPU in-process (local://) instead of starting a fake server")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per manifest; the median is reported")
+    parser.add_argument("--verbose", action="store_true", help="show the generators' own output")
+    parser.add_argument("--save", type=Path, metavar="JSON", help="write the results here")
+    parser.add_argument("--baseline", type=Path, metavar="JSON",
+                        help="compare against a --save'd run; exit 1 if any manifest got slower")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="with --baseline, allowed slowdown of wall time (0.10 = 10%%)")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    return parser
+
+
+def peak_rss_kb(who: int) -> int:
+    rss = resource.getrusage(who).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on macOS, KB on Linux
+
+
+# ----- child: one run of one manifest -----
+
+def run_child(args) -> dict:
+    manifest = load_manifest(args.child)
+    work = Path(tempfile.mkdtemp(prefix="mascotgen-bench-"))
+    jobs = [dataclasses.replace(job, output_dir=work / "out" / Path(job.output_dir).name, **cli.job_overrides(args))
+            for job in manifest.jobs if not args.only or job.name in args.only]
+    args.no_cache = False
+    args.force = True  # always render; the cache is still written, as in a normal cold run
+    stages = Stages()
+
+    start = time.time()
+    results = cli.run_on(args.url, jobs, args, work / "cache", work / "sweeps", stages)
+    if results is None:
+        raise SystemExit(f"cannot reach {', '.join(args.url)}")
+    wall = time.time() - start
+
+    images = sum(len(job.sizes) for job in jobs if results.get(job.name))
+    return {
+        "manifest": args.child.stem,
+        "jobs": len(jobs),
+        "ok": sum(1 for ok in results.values() if ok),
+        "images": images,
+        "wall": wall,
+        "renders_per_min": 60 * len(jobs) / wall,
+        "images_per_min": 60 * images / wall,
+        "peak_rss_kb": peak_rss_kb(resource.RUSAGE_SELF),
+        "peak_rss_children_kb": peak_rss_kb(resource.RUSAGE_CHILDREN),
+        "stages": stages.summary(),
+    }
+
+
+# ----- parent -----
+
+def start_fake(args):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "mascotgen.fake_server", "--port", "0", "--latency", str(args.latency),
+         "--cold-start", str(args.cold_start), "--image-size", str(args.image_size),
+         "--noise", str(args.noise)],
+        stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parent.parent)
+    line = proc.stdout.readline()
+    if "http://" not in line:
+        proc.kill()
+        raise SystemExit("fake server failed to start")
+    return proc, line.strip().split()[-1]
+
+
+def local_url(args) -> str:
+    options = {"latency": args.latency, "cold_start": args.cold_start, "noise": args.noise,
+               "image_size": args.image_size}
+    return "local://?" + urllib.parse.urlencode(options)
+
+
+def run_once(manifest: Path, args, argv: list) -> dict:
+    """One child run of manifest, against args.url or a fresh fake server (models not yet loaded)."""
+    fake = None
+    urls = args.url
+    if not urls and args.local:
+        urls = [local_url(args)]  # a fresh engine in the child
+    elif not urls:
+        fake, url = start_fake(args)
+        urls = [url]
+    cmd = [sys.executable, "-m", "mascotgen.bench", *argv, "--child", str(manifest)]
+    for url in urls:
+        cmd += ["--url", url]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True,
+                              cwd=Path(__file__).resolve().parent.parent)
+    finally:
+        if fake is not None:
+            fake.kill()
+            fake.wait()
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+        elif args.verbose:
+            print(line)
+    if proc.returncode != 0 or result is None:
+        raise SystemExit(f"benchmark run of {manifest} failed (exit {proc.returncode})")
+    return result
+
+
+def median_run(runs: list) -> dict:
+    runs = sorted(runs, key=lambda r: r["wall"])
+    result = dict(runs[len(runs) // 2])
+    result["walls"] = [r["wall"] for r in runs]
+    result["peak_rss_kb"] = max(r["peak_rss_kb"] for r in runs)
+    return result
+
+
+def report(result: dict):
+    print(f"\n{'='*60}")
+    print(f"  {result['manifest']}: {result['ok']}/{result['jobs']} renders, {result['images']} images")
+    print(f"{'='*60}")
+    walls = result.get("walls", [result["wall"]])
+    spread = f" (min {min(walls):.2f}s, max {max(walls):.2f}s)" if len(walls) > 1 else ""
+    print(f"  Wall time:   {result['wall']:.2f}s{spread}")
+    print(f"  Throughput:  {result['renders_per_min']:.1f} renders/min, {result['images_per_min']:.1f} images/min")
+    print(f"  Peak RSS:    {result['peak_rss_kb']/1024:.1f}MB"
+          f" (encode processes {result['peak_rss_children_kb']/1024:.1f}MB)")
+    print("\n".join(format_summary(result["stages"])))
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> bool:
+    """Print wall-time changes vs baseline. Returns False if any manifest regressed."""
+    ok = True
+    print(f"\n{'='*60}")
+    print(f"  VS BASELINE (tolerance {tolerance:.0%})")
+    print(f"{'='*60}")
+    for result in results:
+        before = baseline.get(result["manifest"])
+        if before is None:
+            print(f"  {result['manifest']}: no baseline")
+            continue
+        change = result["wall"] / before["wall"] - 1
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"  {result['manifest']}: {before['wall']:.2f}s -> {result['wall']:.2f}s ({change:+.1%})"
+              f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = cli.parse_args(build_parser(), argv)
+    if args.child is not None:
+        result = run_child(args)
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        return 0
+
+    passthrough = []
+    skip = {"--url", "--manifest", "--save", "--baseline"}
+    it = iter(argv)
+    for arg in it:
+        name = arg.split("=", 1)[0]
+        if name in skip:
+            if "=" not in arg:
+                next(it, None)
+            continue
+        passthrough.append(arg)
+
+    if not args.url:
+        print(f"{'Local' if args.local else 'Fake'} ComfyUI: latency {args.latency}s, "
+              f"cold start {args.cold_start}s, noise {args.noise}"
+              f"{f', size {args.image_size}px' if args.image_size else ''}")
+    results = []
+    for manifest in args.manifests or DEFAULT_MANIFESTS:
+        runs = [run_once(manifest, args, passthrough) for _ in range(args.repeat)]
+        result = median_run(runs)
+        report(result)
+        results.append(result)
+
+    if args.save:
+        args.save.write_text(json.dumps({r["manifest"]: r for r in results}, indent=2) + "\n")
+        print(f"\nSaved: {args.save}")
+    if args.baseline:
+        return 0 if compare(results, json.loads(args.baseline.read_text()), args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Make-style asset build from a manifest.
+
+    python -m mascotgen.build manifests/name-chemi.toml          # rebuild what changed
+    python -m mascotgen.build manifests/name-chemi.toml --check  # CI: exit 1 if stale
+    python -m mascotgen.build manifests/name-chemi.toml --touch  # outputs are current, record it
+
+Only outputs whose spec hash changed (or whose file is missing) are
+rebuilt; --all rebuilds everything. The spec hashes are kept in
+manifests/<name>.state.json; commit it with the outputs the build wrote. Accepts
+every generator flag.
+"""
+import sys
+
+from . import cli
+from .manifest import load_manifest
+
+
+def main(argv=None) -> int:
+    parser = cli.build_parser("Build assets from a manifest", manifest=True)
+    parser.add_argument("--all", action="store_true", help="rebuild every output, not just stale ones")
+    args = cli.parse_args(parser, argv)
+    args.incremental = args.incremental or not args.all
+
+    manifest = load_manifest(args.manifest)
+    if args.check:
+        return cli.check(manifest, args)
+    if args.touch:
+        return cli.touch(manifest, args)
+    results = cli.build(manifest, args)
+    if results is None:
+        return 1
+    failed = [name for name, ok in results.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
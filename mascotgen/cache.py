@@ -0,0 +1,97 @@
+"""
+Content-addressed on-disk cache of original ComfyUI renders.
+
+Key = sha256 of the canonical JSON of the workflow graph, so any change
+to prompt, seed, size, sampler settings or model files is a miss and
+everything else is served from disk without touching the GPU. The
+SaveImage filename_prefix is left out of the key: it only names the file
+ComfyUI writes, not the pixels.
+
+Entries live at <root>/<key[:2]>/<key>.png. A hit bumps the file's
+mtime, and put() evicts least-recently-used entries once the directory
+grows past max_bytes. get_path()/put_stream() hand out the entry's path
+instead of its bytes so large renders can go from socket to disk to
+decoder without being held in memory.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def workflow_key(workflow: dict) -> str:
+    graph = copy.deepcopy(workflow)
+    for node in graph.values():
+        if node.get("class_type") == "SaveImage":
+            node["inputs"].pop("filename_prefix", None)
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, root: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def get(self, key: str):
+        """Return the cached render for key, or None."""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def get_path(self, key: str):
+        """Return the path of the cached render for key (marking it used), or None."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes):
+        self.put_stream(key, lambda f: f.write(data))
+
+    def put_stream(self, key: str, write) -> Path:
+        """Create the entry for key by calling write(binary_file); returns its path."""
+        with self.writer(key) as f:
+            write(f)
+        return self._path(key)
+
+    @contextmanager
+    def writer(self, key: str):
+        """Binary file to write key's entry into; it appears atomically when the block exits cleanly."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}-{id(path)}.tmp")
+        try:
+            with tmp.open("wb") as f:
+                yield f
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*.png"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,498 @@
+"""
+Command-line plumbing shared by generate_mascot.py and generate_mascots.py.
+
+Entry points point at an asset manifest; everything about how its jobs
+are run (incremental builds, pipelining, caching, encode processes,
+sweeps, QA, dedupe, retries and backpressure, finalize, sprite atlases)
+is a common flag handled here.
+"""
+import argparse
+import dataclasses
+import importlib.util
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import aio
+from .atlas import build_atlases
+from .cache import RenderCache
+from .client import DEFAULT_URL, ComfyClient, open_client
+from .dedupe import DEFAULT_THRESHOLD, HashIndex
+from .finalize import finalize_dir
+from .imaging import ENCODE_MODES, MODERN_FORMATS, QUALITY_THRESHOLD, available_formats
+from .journal import Journal
+from .local import is_local
+from .manifest import BuildState, Manifest, record_pick, relocate
+from .pipeline import Pipeline
+from .policy import Policy
+from .scheduler import Scheduler
+from .timing import TRACE_FORMATS, Stages, format_summary
+
+
+def build_parser(description: str, manifest: bool = False) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    if manifest:
+        parser.add_argument("manifest", type=Path, help="asset manifest (TOML)")
+    parser.add_argument("names", nargs="*", metavar="NAME", help="same as --only NAME")
+    parser.add_argument("--url", action="append",
+                        help="ComfyUI server URL; repeat to spread jobs over several servers "
+                             f"(default: the manifest's, else {DEFAULT_URL}); local:// renders synthetic "
+                             "images in-process, without a GPU, and writes under <cache_dir>/local/ "
+                             "(see mascotgen.local)")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="with several servers, max of our prompts in flight per server")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="only generate this asset (repeatable)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild outputs whose spec changed or whose file is missing")
+    parser.add_argument("--check", action="store_true",
+                        help="list stale outputs and exit non-zero if there are any; renders nothing")
+    parser.add_argument("--touch", action="store_true",
+                        help="record the existing outputs as up to date without rendering (like make -t); "
+                             "only for outputs the manifest, as it stands, already produced")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="jobs in flight at once (queued, rendering or downloading); 0 = all")
+    parser.add_argument("--sync", action="store_true",
+                        help="blocking one-job-at-a-time loop instead of the asyncio runner")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="threaded runner: queue every prompt up front and download/resize as renders finish")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="max prompts queued on ComfyUI at once in --pipeline mode (0 = all)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="download/resize threads in --pipeline mode")
+    parser.add_argument("--retries", type=int, default=Policy.retries,
+                        help="retries of a ComfyUI call after a connection error, timeout or 5xx (jittered backoff)")
+    parser.add_argument("--max-queue", type=int, default=Policy.max_queue,
+                        help="don't submit while the server's queue holds this many prompts, anyone's (0 = no limit)")
+    parser.add_argument("--timeout", type=float, default=Policy.timeout,
+                        help="seconds to wait for a render until a few have been timed; "
+                             "after that the timeout follows the observed render times")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="skip the tiny model-loading render before the batch")
+    parser.add_argument("--encode-procs", type=int,
+                        help="processes for resize/encode (0 = in-process; default 0, or one per CPU with --format)")
+    parser.add_argument("--progressive", action="store_true",
+                        help="downscale step by step (e.g. 512->128->64->48) instead of from the source each time")
+    parser.add_argument("--encode", choices=ENCODE_MODES, default="optimize",
+                        help="PNG encode strategy; 'fast' skips zlib optimisation during iteration")
+    parser.add_argument("--format", action="append", dest="formats", choices=MODERN_FORMATS, default=[],
+                        help="also write every size in this format at the smallest quality that passes "
+                             "--quality-threshold (repeatable)")
+    parser.add_argument("--quality-threshold", type=float, default=QUALITY_THRESHOLD,
+                        help="minimum SSIM of --format outputs against the PNG (1.0 = identical)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-render even if the workflow is in the render cache")
+    parser.add_argument("--no-cache", action="store_true", help="disable the render cache")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="render cache size limit")
+    parser.add_argument("--variants", type=int, default=1,
+                        help="seed sweep: render this many candidates per NAME in one batched latent")
+    parser.add_argument("--pick", type=int, metavar="I",
+                        help="with --variants, save candidate I as the asset instead of writing sweeps/, "
+                             "and record it in the manifest (variant = I)")
+    parser.add_argument("--no-qa", action="store_true",
+                        help="save renders without the manifest's [qa] checks (and never re-roll seeds)")
+    parser.add_argument("--no-crop", action="store_true",
+                        help="resize the whole canvas instead of the manifest's [crop] subject cut-out")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="don't save renders that are near-duplicates of an image already kept (perceptual hash)")
+    parser.add_argument("--dedupe-threshold", type=int, default=DEFAULT_THRESHOLD, metavar="BITS",
+                        help="with --dedupe, max differing hash bits (of 64) for a near-duplicate")
+    parser.add_argument("--trace", type=Path, metavar="FILE",
+                        help="write per-stage timings (queue, GPU wait/execute, download, resize/encode) here")
+    parser.add_argument("--trace-format", choices=TRACE_FORMATS, default="jsonl",
+                        help="'jsonl' (one event per line) or 'chrome' (chrome://tracing / Perfetto)")
+    parser.add_argument("--finalize", action="store_true",
+                        help="after the run, re-encode changed outputs at maximum compression")
+    parser.add_argument("--quantize-max", type=int, default=0,
+                        help="with --finalize, palette-quantize icons whose side is <= this (e.g. 64)")
+    parser.add_argument("--no-atlas", action="store_true",
+                        help="don't update the manifest's sprite atlases after the run")
+    return parser
+
+
+def parse_args(parser: argparse.ArgumentParser, argv=None):
+    args = parser.parse_intermixed_args(argv)
+    args.only = (args.only or []) + args.names
+    if args.variants > 1 and not args.only:
+        parser.error("--variants needs at least one NAME")
+    missing = set(args.formats) - set(available_formats())
+    if missing:
+        parser.error(f"this Pillow build can't encode {', '.join(sorted(missing))}")
+    renders = not (args.check or args.touch)
+    needs_numpy = renders and (not (args.no_qa and args.no_crop) or args.dedupe or args.formats)
+    if needs_numpy and importlib.util.find_spec("numpy") is None:
+        parser.error("NumPy is needed for the manifest's [qa] and [crop], --dedupe and --format "
+                     "(pip install -r requirements.txt), or pass --no-qa --no-crop")
+    return args
+
+
+def job_overrides(args) -> dict:
+    """dataclasses.replace() kwargs that --no-qa / --no-crop apply to every job (or ComboSpec)."""
+    overrides = {}
+    if args.no_qa:
+        overrides["qa"] = None
+    if args.no_crop:
+        overrides["crop"] = None
+    return overrides
+
+
+def picked(job, args):
+    """job as --pick installs it: candidate args.pick of its seed's sweep (unchanged without --pick)."""
+    if args.variants <= 1 or args.pick is None:
+        return job
+    return dataclasses.replace(job, variant=args.pick)
+
+
+def make_policy(args) -> Policy:
+    return Policy(retries=args.retries, max_queue=args.max_queue, timeout=args.timeout)
+
+
+def select_jobs(jobs: list, only: list):
+    """Filter jobs by --only. Returns None (after printing) if a name is unknown."""
+    if not only:
+        return jobs
+    unknown = set(only) - {job.name for job in jobs}
+    if unknown:
+        print(f"Unknown asset(s): {', '.join(sorted(unknown))}")
+        return None
+    return [job for job in jobs if job.name in only]
+
+
+def connect(url: str, client_id: str = None, policy: Policy = None):
+    """Probe /system_stats. Returns a client for url, or None if it isn't reachable."""
+    client = open_client(url, client_id, policy=policy)
+    try:
+        stats = client.system_stats()
+        gpu = stats.get("devices", [{}])[0].get("name", "unknown")
+        print(f"ComfyUI connected: {gpu}")
+    except Exception as e:
+        print(f"ComfyUI not available: {e}")
+        return None
+    print(f"Completion tracking: {'websocket' if client.tracker.connected else 'polling'}")
+    return client
+
+
+def resize_opts(args) -> dict:
+    opts = {"progressive": args.progressive, "encode": args.encode}
+    if args.formats:
+        # Only when set, so build-state hashes of PNG-only runs don't change.
+        opts.update(formats=tuple(args.formats), threshold=args.quality_threshold)
+    return opts
+
+
+def stale_jobs(jobs: list, args, state: BuildState) -> list:
+    """Narrow jobs to their stale outputs (for --incremental / --check) and report them."""
+    stale = []
+    for job in jobs:
+        narrowed = state.stale(job, resize_opts(args))
+        if narrowed is not None:
+            stale.append(narrowed)
+            print(f"  Stale: {job.name} ({', '.join(narrowed.sizes)})")
+    print(f"{len(stale)}/{len(jobs)} assets need rebuilding")
+    return stale
+
+
+def checked_out(manifest: Manifest, jobs: list) -> list:
+    """jobs minus external assets whose output_dir isn't there (another repo, not checked out alongside)."""
+    present = []
+    for job in jobs:
+        if job.name in manifest.external and not Path(job.output_dir).is_dir():
+            print(f"  Skipped: {job.name} ({job.output_dir} isn't checked out here)")
+        else:
+            present.append(job)
+    return present
+
+
+def sandboxed(manifest: Manifest, urls: list) -> Manifest:
+    """manifest as a run against urls may write it: moved under <cache_dir>/local/ for local://.
+
+    The local backend's images are placeholders (see mascotgen.local), so
+    they must not reach the tracked outputs and build state, nor a render
+    cache or journal a run against ComfyUI would read.
+    """
+    local = [url for url in urls if is_local(url)]
+    if not local:
+        return manifest
+    if len(local) < len(urls):
+        sys.exit("local:// can't be mixed with ComfyUI servers in one run")
+    root = manifest.cache_dir / "local"
+    print(f"Synthetic renders (local://): writing under {root}")
+    return relocate(manifest, root)
+
+
+def check(manifest: Manifest, args) -> int:
+    """--check: report stale outputs. Returns 1 if anything needs rebuilding, else 0."""
+    manifest = sandboxed(manifest, args.url or manifest.urls)
+    jobs = select_jobs(manifest.jobs, args.only)
+    if jobs is None:
+        return 2
+    jobs = [dataclasses.replace(job, **job_overrides(args)) for job in checked_out(manifest, jobs)]
+    return 1 if stale_jobs(jobs, args, BuildState(manifest.state_path)) else 0
+
+
+def touch(manifest: Manifest, args) -> int:
+    """--touch: mark the selected assets' existing outputs up to date. Returns 1 if any were missing."""
+    manifest = sandboxed(manifest, args.url or manifest.urls)
+    jobs = select_jobs(manifest.jobs, args.only)
+    if jobs is None:
+        return 2
+    jobs = [dataclasses.replace(job, **job_overrides(args)) for job in checked_out(manifest, jobs)]
+    state = BuildState(manifest.state_path)
+    missing = 0
+    for job in jobs:
+        absent = [fname for fname in job.sizes if not (Path(job.output_dir) / fname).exists()]
+        if absent:
+            print(f"  Missing: {job.name} ({', '.join(absent)})")
+            missing += 1
+            continue
+        state.mark(job, resize_opts(args))
+        print(f"  Touched: {job.name}")
+    state.save()
+    print(f"{len(jobs) - missing}/{len(jobs)} assets marked up to date in {state.path}")
+    return 1 if missing else 0
+
+
+def build(manifest: Manifest, args):
+    """Select, narrow, connect and run a manifest's jobs, then update its sprite atlases.
+
+    Returns {name: success}, or None if nothing was run. --check exits the
+    process (status 1 when anything is stale) without rendering.
+    """
+    if args.check:
+        sys.exit(check(manifest, args))
+    if args.touch:
+        sys.exit(touch(manifest, args))
+    urls = args.url or manifest.urls or [DEFAULT_URL]
+    manifest = sandboxed(manifest, urls)
+    jobs = select_jobs(manifest.jobs, args.only)
+    if jobs is None:
+        return None
+    overrides = job_overrides(args)
+    if overrides:
+        jobs = [dataclasses.replace(job, **overrides) for job in jobs]
+    if args.incremental:
+        jobs = stale_jobs(jobs, args, BuildState(manifest.state_path))
+        if not jobs:
+            return {}
+    try:
+        results = run_on(urls, jobs, args, manifest.cache_dir, manifest.sweep_dir, state_path=manifest.state_path)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        sys.exit(130)
+    if results is not None and args.variants > 1 and args.pick is not None:
+        for name, ok in results.items():
+            if not ok:
+                continue
+            if any(is_local(url) for url in urls):
+                print(f"  Not recorded in {manifest.path.name}: {name}'s candidates are synthetic")
+                continue
+            record_pick(manifest.path, name, args.pick)
+            print(f"  Recorded: variant = {args.pick} in [assets.{name}] of {manifest.path.name}")
+    sweeping = args.variants > 1 and args.pick is None
+    if results is not None and manifest.atlas is not None and not sweeping and not args.no_atlas:
+        print("\n" + "="*60)
+        print("  ATLAS")
+        print("="*60)
+        # Every job, not just this run's: an atlas holds the whole tier.
+        build_atlases(manifest.jobs, manifest.atlas, manifest.cache_dir / "atlas.json", args.encode,
+                      manifest.path.name)
+    return results
+
+
+def use_async(args, urls: list) -> bool:
+    """The asyncio runner handles plain single-server runs; the rest use the threaded ones."""
+    return len(urls) == 1 and not (args.sync or args.pipeline or args.variants > 1)
+
+
+def run_on(urls: list, jobs: list, args, cache_dir: Path, sweep_dir: Path, stages: Stages = None,
+           state_path: Path = None):
+    """Health-check urls and run jobs on them. Returns {name: success}, or None if no server answered.
+
+    Prompts are journaled in cache_dir so a run that crashes or times out
+    can be resumed by running it again. Build state goes to state_path
+    (default: in cache_dir).
+    """
+    journal = Journal(Path(cache_dir) / "journal.json")
+    if use_async(args, urls):
+        if aio.probe(urls[0], make_policy(args)) is None:
+            return None
+        return run(jobs, args, None, cache_dir, sweep_dir, stages=stages, url=urls[0], journal=journal,
+                   state_path=state_path)
+    if len(urls) == 1:
+        client = connect(urls[0], journal.client_id(urls[0]), make_policy(args))
+        if client is None:
+            return None
+        try:
+            return run(jobs, args, client, cache_dir, sweep_dir, stages=stages, journal=journal, state_path=state_path)
+        finally:
+            client.close()
+
+    scheduler = Scheduler(urls, depth=args.depth, client_ids={url: journal.client_id(url) for url in urls},
+                          policy=make_policy(args))
+    healthy = scheduler.connect()
+    if not healthy:
+        return None
+    try:
+        return run(jobs, args, healthy[0].client, cache_dir, sweep_dir, scheduler, stages, journal=journal,
+                   state_path=state_path)
+    finally:
+        scheduler.close()
+
+
+def open_pipeline(args, client: ComfyClient, cache_dir: Path, stages: Stages = None,
+                  journal: Journal = None) -> Pipeline:
+    """A Pipeline set up by the common flags (cache, encode pool, resize options, dedupe, --trace).
+
+    See close_pipeline.
+    """
+    cache = None if args.no_cache else RenderCache(cache_dir, args.cache_max_mb * 1024 * 1024)
+    procs = args.encode_procs
+    if procs is None:
+        procs = (os.cpu_count() or 1) if args.formats else 0  # the quality search is CPU-bound
+    pool = ProcessPoolExecutor(max_workers=procs) if procs > 0 else None
+    stages = stages or Stages()
+    if args.trace:
+        stages.trace_to(args.trace, args.trace_format)
+    dedupe = HashIndex(Path(cache_dir) / "hashes.jsonl", args.dedupe_threshold) if args.dedupe else None
+    return Pipeline(client, cache=cache, force=args.force, pool=pool, resize_opts=resize_opts(args),
+                    policy=make_policy(args), stages=stages, journal=journal, dedupe=dedupe)
+
+
+def close_pipeline(pipeline: Pipeline):
+    if pipeline.pool is not None:
+        pipeline.pool.shutdown()
+    pipeline.stages.close()
+
+
+def run(jobs: list, args, client: ComfyClient, cache_dir: Path, sweep_dir: Path,
+        scheduler: Scheduler = None, stages: Stages = None, url: str = None, journal: Journal = None,
+        state_path: Path = None) -> dict:
+    """Run jobs according to the common flags. Returns {name: success}.
+
+    With client=None the jobs go to url through the asyncio runner. With a
+    scheduler, normal runs are spread over all of its backends; sweeps
+    still go to `client`. Stage timings are collected into stages
+    (a fresh Stages if None) and, with --trace, streamed to a file.
+
+    Outputs written by a normal run or a --pick are recorded in the build
+    state at state_path (default: in cache_dir) so a later --incremental
+    run can skip them. Queued prompts go into journal (an in-memory one if
+    None) until their outputs are saved.
+    """
+    state = BuildState(state_path or Path(cache_dir) / "build-state.json")
+    for job in jobs:
+        Path(job.output_dir).mkdir(parents=True, exist_ok=True)
+    pipeline = open_pipeline(args, client, cache_dir, stages, journal)
+    stages = pipeline.stages
+    try:
+        if client is not None and not args.no_warmup:
+            if scheduler is not None and args.variants <= 1:
+                scheduler.warm_up(jobs, pipeline)
+            else:
+                pipeline.warm_up(jobs)
+        if client is None:
+            results = aio.run(pipeline, url, jobs, args.concurrency, warmup=not args.no_warmup)
+        elif args.variants > 1:
+            results = run_sweeps(pipeline, jobs, args, sweep_dir)
+        elif scheduler is not None:
+            print("\n" + "="*60)
+            print(f"  MULTI-BACKEND GENERATION ({len(jobs)} images)")
+            print("="*60)
+            results = scheduler.run(jobs, pipeline, workers=args.workers)
+        elif args.pipeline:
+            print("\n" + "="*60)
+            print(f"  PIPELINED GENERATION ({len(jobs)} images)")
+            print("="*60)
+            results = pipeline.run_pipelined(jobs, max_in_flight=args.max_in_flight, workers=args.workers)
+        else:
+            results = pipeline.run(jobs)
+    finally:
+        close_pipeline(pipeline)
+
+    if args.trace:
+        print("\n" + "="*60)
+        print("  TIMINGS")
+        print("="*60)
+        print("\n".join(format_summary(stages.summary())))
+        print(f"  Trace: {args.trace}")
+
+    rejected = [event for event in stages.events if event["stage"] == "qa" and "failed" in event]
+    if rejected:
+        print("\n" + "="*60)
+        print("  QA")
+        print("="*60)
+        for event in rejected:
+            print(f"  {event['job']} seed {event['seed']}: {event['failed']}")
+
+    if pipeline.dedupe is not None and pipeline.dedupe.duplicates:
+        print("\n" + "="*60)
+        print("  DUPLICATES")
+        print("="*60)
+        for asset, (kept, distance) in sorted(pipeline.dedupe.duplicates.items()):
+            print(f"  {asset} ~ {kept} ({distance} bits): not saved")
+
+    if args.formats:
+        print("\n" + "="*60)
+        print("  OUTPUT SIZES")
+        print("="*60)
+        print("\n".join(size_report(stages, ["png", *args.formats])))
+
+    if args.variants <= 1 or args.pick is not None:
+        for job in jobs:
+            if results.get(job.name):
+                state.mark(picked(job, args), resize_opts(args))
+        state.save()
+
+    if args.finalize:
+        print("\n" + "="*60)
+        print("  FINALIZE")
+        print("="*60)
+        for output_dir in sorted({Path(job.output_dir) for job in jobs}):
+            finalize_dir(output_dir, Path(cache_dir) / "finalized.json", args.quantize_max)
+    return results
+
+
+def size_report(stages: Stages, formats: list) -> list:
+    """Lines of a per-asset table of bytes written in each format, from the encode events."""
+    sizes = {}
+    for event in stages.events:
+        if event["stage"] == "encode":
+            fmt = Path(event["file"]).suffix.lstrip(".")
+            row = sizes.setdefault(event["job"], dict.fromkeys(formats, 0))
+            row[fmt] = row.get(fmt, 0) + event["bytes"]
+    lines = [f"  {'asset':<20}" + "".join(f"{fmt:>10}" for fmt in formats)]
+    for job, row in sizes.items():
+        lines.append(f"  {job:<20}" + "".join(f"{row[fmt]/1024:>8.1f}KB" for fmt in formats))
+    totals = {fmt: sum(row[fmt] for row in sizes.values()) for fmt in formats}
+    lines.append(f"  {'total':<20}" + "".join(f"{totals[fmt]/1024:>8.1f}KB" for fmt in formats))
+    if totals["png"]:
+        lines.append("  vs PNG: " + ", ".join(f"{fmt} {totals[fmt] / totals['png'] - 1:+.0%}"
+                                              for fmt in formats if fmt != "png"))
+    return lines
+
+
+def run_sweeps(pipeline: Pipeline, jobs: list, args, sweep_dir: Path) -> dict:
+    """--variants N NAME...: write every candidate to sweep_dir, or install the --pick'ed one.
+
+    Candidates are the images of one batch under the job's seed; a pick is
+    saved as that job with variant set, which renders the same image again.
+    """
+    results = {}
+    for job in jobs:
+        try:
+            paths = pipeline.sweep(dataclasses.replace(job, variant=None), args.variants)
+            if args.pick is None:
+                pipeline.write_sweep(job, paths, Path(sweep_dir) / job.name)
+                print(f"  Keep one with: --variants {args.variants} --pick <i> {job.name}")
+            elif args.pick >= len(paths):
+                print(f"  ERROR: {job.name} has only {len(paths)} variants")
+                results[job.name] = False
+                continue
+            else:
+                pipeline.save(dataclasses.replace(picked(job, args), qa=None), paths[args.pick])  # picked by eye: no QA
+            results[job.name] = True
+        except Exception as e:
+            print(f"  ERROR: {e}")
+            results[job.name] = False
+    return results
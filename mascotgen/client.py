@@ -0,0 +1,235 @@
+"""
+ComfyUI HTTP client over a persistent keep-alive connection.
+
+urllib.request.urlopen opens a fresh socket per call; here each thread
+keeps one http.client connection to the server and reuses it for
+/prompt, /history and /view, reconnecting once if the server has closed
+an idle connection (a submit is checked before it's sent instead: POST
+/prompt is never resent once it may have reached the server). Every
+call is retried, backed off and bounded by a deadline per
+mascotgen.policy, with a circuit breaker per client.
+
+Other backends plug in by URL scheme: BACKENDS maps a scheme to a class
+with the same API (system_stats, queue_prompt, history, queue_state,
+get_image/stream_image, tracker/wait, close), and open_client picks it.
+`local://` is the in-process synthetic renderer (see mascotgen.local).
+"""
+import http.client
+import importlib
+import json
+import select
+import threading
+import time
+import urllib.parse
+import uuid
+
+from .policy import CircuitBreaker, Policy, Retry
+from .tracker import CompletionTracker
+
+DEFAULT_URL = "http://127.0.0.1:8188"
+
+# URL scheme -> "module:Class" of its client; anything else is ComfyUI over HTTP.
+BACKENDS = {"local": "mascotgen.local:LocalClient"}
+
+
+class ComfyError(OSError):
+    """ComfyUI answered with an HTTP error status."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+def stage_of(method: str, path: str) -> str:
+    """Which policy deadline a request falls under (see mascotgen.policy)."""
+    if method == "POST" and path == "/prompt":
+        return "submit"
+    return "download" if path.startswith("/view") else "api"
+
+
+class ComfyClient:
+    def __init__(self, base_url: str = DEFAULT_URL, client_id: str = None, timeout: float = 60,
+                 policy: Policy = None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.timeout = timeout  # per attempt; the policy bounds the whole call
+        self.policy = policy or Policy()
+        self.breaker = CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_cooldown)
+        url = urllib.parse.urlparse(self.base_url)
+        self._https = url.scheme == "https"
+        self._netloc = url.netloc
+        self._local = threading.local()
+        self._tracker = None
+        self.admission = threading.Lock()  # held by the caller polling a full queue (see Pipeline.admitting)
+
+    # ----- transport -----
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self._netloc, timeout=self.timeout)
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def request(self, method: str, path: str, payload=None, sink=None):
+        """Send a request and return the response body, retrying transient failures per the policy.
+
+        With sink (a binary file object), the body is streamed into it in
+        chunks instead and the byte count is returned; a retry rewinds it.
+        """
+        body = None
+        headers = {}
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        retry = Retry(self.policy, self.breaker, stage_of(method, path), f"{method} {path}", self.base_url)
+        while True:
+            time.sleep(retry.gate())
+            try:
+                data = self._send(method, path, body, headers, sink, max(1.0, min(self.timeout, retry.remaining())))
+            except Exception as e:
+                delay = retry.failed(e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                if sink is not None:
+                    sink.seek(0)
+                    sink.truncate()
+                continue
+            retry.succeeded()
+            return data
+
+    def _send(self, method: str, path: str, body, headers: dict, sink, timeout: float):
+        """One attempt of request()."""
+        submit = stage_of(method, path) == "submit"
+        for attempt in range(2):
+            conn = self._conn()
+            reused = conn.sock is not None
+            if reused and submit and _dropped(conn.sock):
+                # Closed while idle: reconnect before sending, since a submit is never resent.
+                self._drop()
+                conn, reused = self._conn(), False
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                if sink is None or resp.status >= 400:
+                    data = resp.read()
+                else:
+                    return self._stream(resp, sink)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._drop()
+                # Server closed our idle keep-alive socket; reconnect once. A fresh
+                # connection failing, or a submit, may have reached the server.
+                if attempt or not reused or submit:
+                    raise
+                continue
+            except http.client.HTTPException as e:
+                self._drop()
+                # A response cut short (IncompleteRead) or garbled: a transport error, like the asyncio client's.
+                raise ConnectionResetError(f"{method} {path}: {e!r}") from e
+            except Exception:
+                self._drop()
+                raise
+            if resp.status >= 400:
+                raise ComfyError(f"{method} {path}: HTTP {resp.status} {data[:200]!r}", resp.status)
+            return data
+
+    def _stream(self, resp, sink) -> int:
+        total = 0
+        try:
+            while True:
+                chunk = resp.read(64 * 1024)
+                if not chunk:
+                    return total
+                sink.write(chunk)
+                total += len(chunk)
+        except Exception:
+            self._drop()
+            raise
+
+    def get_json(self, path: str):
+        return json.loads(self.request("GET", path))
+
+    def post_json(self, path: str, payload: dict):
+        data = self.request("POST", path, payload)
+        return json.loads(data) if data else {}
+
+    def close(self):
+        self._drop()
+        if self._tracker is not None:
+            self._tracker.close()
+
+    # ----- API -----
+
+    def system_stats(self) -> dict:
+        return self.get_json("/system_stats")
+
+    def queue_prompt(self, workflow: dict) -> str:
+        """Queue a prompt under our client_id and return the prompt_id."""
+        return self.post_json("/prompt", {"prompt": workflow, "client_id": self.client_id})["prompt_id"]
+
+    def history(self, prompt_id: str):
+        """Return the /history entry for prompt_id, or None if it hasn't finished yet."""
+        return self.get_json(f"/history/{prompt_id}").get(prompt_id)
+
+    def queue_state(self) -> dict:
+        """/queue: queue_running and queue_pending items, [number, prompt_id, workflow, ...]."""
+        return self.get_json("/queue")
+
+    def get_image(self, filename: str, subfolder: str = "", folder_type: str = "output", sink=None):
+        """Image bytes from /view, or streamed into sink (returns the byte count)."""
+        params = urllib.parse.urlencode({"filename": filename, "subfolder": subfolder, "type": folder_type})
+        return self.request("GET", f"/view?{params}", sink=sink)
+
+    @property
+    def tracker(self) -> CompletionTracker:
+        """Completion tracker for client_id; websocket if available, /history polling otherwise."""
+        if self._tracker is None:
+            self._tracker = CompletionTracker(self.base_url, self.client_id, fetch_history=self.history)
+            self._tracker.start()
+        return self._tracker
+
+    def wait(self, prompt_id: str, timeout: float = 300) -> dict:
+        return self.tracker.wait(prompt_id, timeout)
+
+    @staticmethod
+    def output_images(result: dict) -> list:
+        """Image descriptors ({filename, subfolder, type}) of a history entry, in batch order."""
+        return [img_info
+                for node_id, node_output in result.get("outputs", {}).items()
+                for img_info in node_output.get("images", [])]
+
+    def stream_image(self, img_info: dict, sink) -> int:
+        return self.get_image(img_info["filename"], img_info.get("subfolder", ""),
+                              img_info.get("type", "output"), sink=sink)
+
+
+def _dropped(sock) -> bool:
+    """Whether an idle keep-alive socket has been closed by the server (it reads as ready at EOF)."""
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+def backend_class(url: str, backends: dict, default):
+    """The class registered in backends for url's scheme, else default."""
+    target = backends.get(urllib.parse.urlparse(url).scheme)
+    if target is None:
+        return default
+    module, _, name = target.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def open_client(url: str = DEFAULT_URL, client_id: str = None, **kwargs):
+    """A client for url: ComfyClient, or the BACKENDS class for its scheme."""
+    return backend_class(url, BACKENDS, ComfyClient)(url, client_id, **kwargs)
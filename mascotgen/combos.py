@@ -0,0 +1,251 @@
+"""
+Combinatorial variants: every combination of a manifest's prompt fragments.
+
+A [combos] table gives a prompt with one {placeholder} per axis and, for
+each axis, named fragments to put there:
+
+    [combos]
+    prompt = "A {base_style}, the piglet {pose}, {color} color scheme, {accessory}"
+    seed = 1000
+    output_dir = "../mascot-variants"
+    sizes = { "{name}.png" = 256, "{name}-xs.png" = 48 }
+
+    [combos.axes.pose]
+    wave = "waving hello with one wing"
+    jump = "jumping in the air excited"
+
+Each combination is named after its fragments ("wave-pink-crown", or the
+`name` template) and gets a seed derived from that name, so adding a
+fragment never reseeds existing combinations.
+
+Jobs are produced lazily from itertools.product and fed to the asyncio
+runner one free slot at a time, and nothing per-combination is kept in
+memory: outputs go to sharded subdirectories (<output_dir>/<2 hex chars
+of the name's hash>/) and each finished combination is appended to its
+shard's index.jsonl:
+
+    {"name": "wave-pink-crown", "prompt": "<sha256[:16]>", "seed": 123, "files": {"3f/wave-pink-crown.png": 40312}}
+
+A later run skips combinations whose index entry matches their prompt and
+seed and whose files exist, so it only renders what's new or changed.
+With --dedupe, a combination that came out as a near-duplicate of one
+already kept is indexed with "duplicate_of" instead of files, and counts
+as done too.
+
+    python -m mascotgen.combos manifests/love-fortune.toml --list
+    python -m mascotgen.combos manifests/love-fortune.toml --limit 50
+"""
+import dataclasses
+import hashlib
+import itertools
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .dedupe import asset_id
+from .imaging import CropSpec
+from .jobs import RenderJob
+from .journal import Journal
+from .qa import QASpec
+from .timing import Stages
+
+
+@dataclass
+class ComboSpec:
+    prompt: str
+    axes: dict                    # axis -> {fragment name: prompt fragment}
+    output_dir: Path
+    sizes: dict                   # file name template ("{name}-xs.png") -> size
+    seed: int = 0
+    name: str = None              # e.g. "{pose}-{color}"; default: every axis, in order
+    gen_size: int = 512
+    prefix: str = "combo"
+    shard_chars: int = 2          # hex chars of the shard directory name (0 = no sharding)
+    qa: QASpec = None
+    crop: CropSpec = None
+    upscale_model: str = None     # see mascotgen.plan
+
+
+def count(spec: ComboSpec) -> int:
+    return math.prod(len(fragments) for fragments in spec.axes.values())
+
+
+def combo_seed(seed: int, name: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"{seed}:{name}".encode("utf-8")).digest()[:4], "big") & 0x7FFFFFFF
+
+
+def shard(spec: ComboSpec, name: str) -> str:
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:spec.shard_chars]
+
+
+def expand(spec: ComboSpec):
+    """Yield a RenderJob per combination, in axis order, without building the list."""
+    axes = list(spec.axes)
+    template = spec.name or "-".join("{" + axis + "}" for axis in axes)
+    for picks in itertools.product(*(spec.axes[axis].items() for axis in axes)):
+        name, prompt = template, spec.prompt
+        for axis, (slug, fragment) in zip(axes, picks):
+            name = name.replace("{" + axis + "}", slug)
+            prompt = prompt.replace("{" + axis + "}", fragment)
+        yield RenderJob(
+            name=name,
+            prompt=prompt,
+            seed=combo_seed(spec.seed, name),
+            output_dir=spec.output_dir / shard(spec, name),
+            sizes={fname.replace("{name}", name): size for fname, size in spec.sizes.items()},
+            gen_size=spec.gen_size,
+            prefix=spec.prefix,
+            qa=spec.qa,
+            crop=spec.crop,
+            upscale_model=spec.upscale_model,
+        )
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ComboIndex:
+    """Per-shard append-only index.jsonl files under root; the last line for a name wins."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, job: RenderJob) -> Path:
+        return Path(job.output_dir) / "index.jsonl"
+
+    def entry(self, job: RenderJob):
+        """The latest index entry for job, read from its shard's index (never the whole set)."""
+        found = None
+        try:
+            with self._path(job).open(encoding="utf-8") as f:
+                for line in f:
+                    if f'"name": {json.dumps(job.name)}' in line:
+                        found = json.loads(line)
+        except FileNotFoundError:
+            pass
+        return found
+
+    def done(self, job: RenderJob) -> bool:
+        entry = self.entry(job)
+        if entry is None or entry["prompt"] != prompt_hash(job.prompt) or entry["seed"] != job.seed:
+            return False
+        return "duplicate_of" in entry or all(Path(job.output_dir, fname).exists() for fname in job.sizes)
+
+    def record(self, job: RenderJob, written: list, duplicate_of: str = None):
+        """Append job's entry from its write_sizes rows (none if dedupe kept its existing files, or skipped it)."""
+        rows = [(Path(path), nbytes) for path, w, h, nbytes, *_ in written]
+        if not written:
+            rows = [(path, path.stat().st_size) for path in (Path(job.output_dir, f) for f in job.sizes)
+                    if path.exists()]
+        entry = {"name": job.name, "prompt": prompt_hash(job.prompt), "seed": job.seed,
+                 "files": {str(path.relative_to(self.root)): nbytes for path, nbytes in rows}}
+        if duplicate_of is not None:
+            entry["duplicate_of"] = duplicate_of
+        line = json.dumps(entry)
+        with self._path(job).open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def todo(spec: ComboSpec, index: ComboIndex, args, tally: dict):
+    """Lazily filter expand() down to what this run renders (--only, index, --all, --limit)."""
+    jobs = expand(spec)
+    if args.only:
+        jobs = (job for job in jobs if job.name in args.only)
+    for job in jobs:
+        if not args.all and index.done(job):
+            tally["skipped"] += 1
+            continue
+        if args.limit and tally["queued"] >= args.limit:
+            return
+        tally["queued"] += 1
+        yield job
+
+
+def build_parser():
+    from . import cli  # cli -> manifest -> this module
+    parser = cli.build_parser("Render every combination of a manifest's [combos] fragments", manifest=True)
+    parser.add_argument("--all", action="store_true", help="re-render combinations already in the index")
+    parser.add_argument("--limit", type=int, default=0, help="render at most this many combinations")
+    parser.add_argument("--list", action="store_true", help="print what would be rendered and exit")
+    return parser
+
+
+def main(argv=None) -> int:
+    from . import aio, cli
+    from .manifest import load_manifest
+    args = cli.parse_args(build_parser(), argv)
+    manifest = load_manifest(args.manifest)
+    urls = args.url or manifest.urls
+    manifest = cli.sandboxed(manifest, urls)
+    spec = manifest.combos
+    if spec is None:
+        print(f"{args.manifest} has no [combos] table")
+        return 2
+    spec = dataclasses.replace(spec, **cli.job_overrides(args))
+    index = ComboIndex(spec.output_dir)
+    tally = {"queued": 0, "skipped": 0, "rendered": 0, "duplicates": 0, "failed": 0, "bytes": 0}
+
+    if args.list:
+        for job in todo(spec, index, args, tally):
+            print(f"  {job.name} (seed {job.seed}): ...{job.prompt[-70:]}")
+        print(f"{tally['queued']} to render, {tally['skipped']} up to date, {count(spec)} combinations")
+        return 0
+
+    if len(urls) != 1:
+        print("Combinations run against a single ComfyUI server")
+        return 2
+    if aio.probe(urls[0], cli.make_policy(args)) is None:
+        return 1
+
+    def prepared():
+        for job in todo(spec, index, args, tally):
+            Path(job.output_dir).mkdir(parents=True, exist_ok=True)
+            yield job
+
+    def finished(job, written):
+        # A near-duplicate fails its job (see mascotgen.dedupe) but is done as far as the index goes.
+        duplicate = None if pipeline.dedupe is None else pipeline.dedupe.duplicates.pop(asset_id(job), None)
+        if duplicate is not None:
+            index.record(job, [], duplicate[0])
+            tally["duplicates"] += 1
+            return
+        if written is None:
+            tally["failed"] += 1
+            return
+        index.record(job, written)
+        tally["rendered"] += 1
+        tally["bytes"] += sum(row[3] for row in written)
+
+    print(f"{count(spec)} combinations -> {spec.output_dir}")
+    # Stage events aren't retained (they'd grow with the run); --trace still streams them.
+    pipeline = cli.open_pipeline(args, None, manifest.cache_dir, Stages(retain=False),
+                                 Journal(manifest.cache_dir / "journal.json"))
+    start = time.time()
+    try:
+        aio.run(pipeline, urls[0], prepared(), args.concurrency or 4, warmup=not args.no_warmup,
+                on_result=finished)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return 130
+    finally:
+        cli.close_pipeline(pipeline)
+
+    print("\n" + "="*60)
+    print("  COMBINATIONS")
+    print("="*60)
+    print(f"  Rendered: {tally['rendered']} ({tally['bytes']/1e6:.1f}MB) in {time.time() - start:.1f}s")
+    print(f"  Up to date: {tally['skipped']}")
+    if tally["duplicates"]:
+        print(f"  Near-duplicates (not saved): {tally['duplicates']}")
+    if tally["failed"]:
+        print(f"  Failed: {tally['failed']}")
+    print(f"  Index: {spec.output_dir}/*/index.jsonl")
+    return 1 if tally["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
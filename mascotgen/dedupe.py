@@ -0,0 +1,228 @@
+"""
+Perceptual-hash dedupe of rendered originals.
+
+Seed sweeps and regenerated sets often come back with images that are
+the same picture to the eye but not byte-for-byte. With --dedupe each
+downloaded original is hashed before it's resized, and one that's within
+`threshold` bits of an image already kept is not resized, encoded or
+written:
+
+  * a near-duplicate of another asset's kept original is not saved and
+    the job fails with Duplicate, so a sweep or combination run doesn't
+    ship lookalikes and a build doesn't count it as up to date;
+  * an asset re-rendered to (nearly) the picture it already has, with
+    the same output sizes and options and its files still on disk,
+    keeps the files it has.
+
+Two 64-bit hashes are taken from a grayscale thumbnail with NumPy: dHash
+(signs of the horizontal gradient on 9x8) and pHash (signs of the
+low-frequency 8x8 DCT block of 32x32 around its median). An image is a
+near-duplicate only if both are within the threshold, which keeps one
+hash's blind spot (flat regions for dHash, exact tone curves for pHash)
+from merging different pictures. Both are blind to colour, and the same
+pose in another colour scheme is not a duplicate, so the mean RGB of
+each quadrant must also be within COLOR_TOLERANCE.
+
+Kept hashes live in a HashIndex persisted as JSON lines (the last line
+for an asset wins), loaded into NumPy arrays so a lookup is one
+vectorized XOR/popcount over every kept image, which stays fast across
+thousands of renders.
+"""
+import dataclasses
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+DEFAULT_THRESHOLD = 6  # of 64 bits
+COLOR_TOLERANCE = 16   # max difference of a quadrant's mean R, G or B (0-255)
+HASH_MARGIN = 4        # how far a value must clear its reference to set a bit (grey levels / DCT units)
+
+
+def _gray(img, width: int, height: int):
+    import numpy as np
+    from PIL import Image
+    return np.asarray(img.convert("L").resize((width, height), Image.LANCZOS), dtype=np.float64)
+
+
+def _pack(bits) -> int:
+    import numpy as np
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(img) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 thumbnail is brighter than its left neighbour.
+
+    By more than HASH_MARGIN grey levels, so a flat background hashes as
+    flat instead of as the sign of whatever noise and resampling ringing
+    survived the downscale.
+    """
+    px = _gray(img, 9, 8)
+    return _pack(px[:, 1:] - px[:, :-1] > HASH_MARGIN)
+
+
+_DCT = {}
+
+
+def _dct_matrix(n: int):
+    """Orthonormal DCT-II basis, so a 2-D DCT is D @ X @ D.T."""
+    import numpy as np
+    if n not in _DCT:
+        k = np.arange(n)[:, None]
+        m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+        m[0] /= np.sqrt(2)
+        _DCT[n] = m
+    return _DCT[n]
+
+
+def phash(img) -> int:
+    """64-bit DCT hash: the 8x8 lowest frequencies of a 32x32 thumbnail above their median (DC excluded).
+
+    Also by more than HASH_MARGIN, for the same reason as dhash: in a
+    near-flat image every coefficient is noise around the median.
+    """
+    import numpy as np
+    d = _dct_matrix(32)
+    low = (d @ _gray(img, 32, 32) @ d.T)[:8, :8]
+    return _pack(low - np.median(low.ravel()[1:]) > HASH_MARGIN)
+
+
+def colors(img) -> bytes:
+    """Mean RGB of each quadrant (top-left, top-right, bottom-left, bottom-right): 12 bytes."""
+    from PIL import Image
+    return img.convert("RGB").resize((2, 2), Image.BOX).tobytes()
+
+
+def image_hashes(source) -> tuple:
+    """(dhash, phash, colors) of the image at path source."""
+    from PIL import Image
+    with Image.open(source) as img:
+        img.load()
+    return dhash(img), phash(img), colors(img)
+
+
+def _popcount(x):
+    import numpy as np
+    if hasattr(np, "bitwise_count"):  # NumPy 2
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class Duplicate(RuntimeError):
+    """A render of job came out as a near-duplicate of another asset's kept original; nothing was saved."""
+
+    def __init__(self, job, kept: str, distance: int):
+        super().__init__(f"{job.name} is within {distance} bits of {kept}; not saved")
+        self.job = job
+        self.kept = kept
+        self.distance = distance
+
+
+def asset_id(job) -> str:
+    """How the index names a job's asset: its output directory and name."""
+    return str(Path(job.output_dir) / job.name)
+
+
+def outputs_key(sizes: dict, resize_opts: dict) -> str:
+    """Hash of what an asset's files were written with, so changed sizes or options aren't deduped away."""
+    def plain(value):
+        return dataclasses.asdict(value) if dataclasses.is_dataclass(value) else list(value)
+
+    spec = json.dumps({"sizes": sizes, "resize": resize_opts}, sort_keys=True, default=plain)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:16]
+
+
+class HashIndex:
+    """Hashes of kept originals, appended to path, or with path=None kept in memory for this run only."""
+
+    def __init__(self, path: Path = None, threshold: int = DEFAULT_THRESHOLD):
+        import numpy as np
+        self.path = None if path is None else Path(path)
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.assets = []     # slot -> asset id
+        self.outputs = []    # slot -> outputs_key
+        self.slots = {}      # asset id -> slot
+        self._dhash = np.zeros(64, dtype=np.uint64)
+        self._phash = np.zeros(64, dtype=np.uint64)
+        self._colors = np.zeros((64, 12), dtype=np.int16)
+        self.duplicates = {}  # asset id -> (kept asset id, distance), for this run's report
+        if self.path is not None and self.path.exists():
+            lines = 0
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._put(entry["asset"], entry["outputs"], int(entry["dhash"], 16), int(entry["phash"], 16),
+                              bytes.fromhex(entry["colors"]))
+                    lines += 1
+            if lines > 2 * len(self.assets):
+                self._compact()  # mostly superseded lines: rewrite with one per asset
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def _put(self, asset: str, outputs: str, dh: int, ph: int, rgb: bytes):
+        import numpy as np
+        slot = self.slots.get(asset)
+        if slot is None:
+            slot = self.slots[asset] = len(self.assets)
+            self.assets.append(asset)
+            self.outputs.append(outputs)
+            if slot == len(self._dhash):
+                self._dhash = np.concatenate([self._dhash, np.zeros_like(self._dhash)])
+                self._phash = np.concatenate([self._phash, np.zeros_like(self._phash)])
+                self._colors = np.concatenate([self._colors, np.zeros_like(self._colors)])
+        self.outputs[slot] = outputs
+        self._dhash[slot] = dh
+        self._phash[slot] = ph
+        self._colors[slot] = np.frombuffer(rgb, dtype=np.uint8)
+
+    def _line(self, slot: int) -> str:
+        return json.dumps({"asset": self.assets[slot], "outputs": self.outputs[slot],
+                           "dhash": f"{int(self._dhash[slot]):016x}", "phash": f"{int(self._phash[slot]):016x}",
+                           "colors": self._colors[slot].astype("uint8").tobytes().hex()})
+
+    def _compact(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(self._line(slot) + "\n" for slot in range(len(self.assets))), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def distances(self, hashes: tuple):
+        """Distance from image_hashes() to every kept image, by slot.
+
+        The larger of the dHash and pHash Hamming distances, or 65 (never a
+        match) where the colours differ by more than COLOR_TOLERANCE.
+        """
+        import numpy as np
+        n = len(self.assets)
+        dh, ph, rgb = hashes
+        bits = np.maximum(_popcount(self._dhash[:n] ^ np.uint64(dh)), _popcount(self._phash[:n] ^ np.uint64(ph)))
+        shade = np.abs(self._colors[:n] - np.frombuffer(rgb, dtype=np.uint8)).max(axis=1)
+        return np.where(shade > COLOR_TOLERANCE, 65, bits)
+
+    def check(self, asset: str, outputs: str, hashes: tuple, have_files: bool):
+        """Look an original up and keep it unless it's a near-duplicate.
+
+        Returns None if the image is new (it's recorded as asset's), or
+        (kept asset id, distance) for a near-duplicate of another asset,
+        or of asset itself when it was kept with the same outputs key and
+        have_files says its files are still there.
+        """
+        with self.lock:
+            if self.assets:
+                dist = self.distances(hashes)
+                own = self.slots.get(asset)
+                if own is not None and dist[own] <= self.threshold and have_files and self.outputs[own] == outputs:
+                    return asset, int(dist[own])
+                if own is not None:
+                    dist[own] = 65
+                nearest = int(dist.argmin())
+                if dist[nearest] <= self.threshold:
+                    self.duplicates[asset] = (self.assets[nearest], int(dist[nearest]))
+                    return self.duplicates[asset]
+            self._put(asset, outputs, *hashes)
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(self._line(self.slots[asset]) + "\n")
+            return None
@@ -0,0 +1,501 @@
+"""
+Fake ComfyUI server for exercising the generators without a GPU.
+
+Implements the subset of the ComfyUI HTTP/WebSocket API the scripts use:
+/prompt, /history, /view, /queue, /interrupt, /system_stats and /ws.
+Each prompt "renders" for --latency seconds and produces a PNG at the
+width/height/batch_size of its EmptySD3LatentImage node (or --image-size),
+times the factor in the upscale model's name ("RealESRGAN_x2.pth") when
+the graph loads one. A LatentFromBatch node renders just its slice of
+the batch, the same images the whole batch has at those indices.
+The first prompt with a given set of model loaders also pays --cold-start
+seconds, and nodes unchanged since the previous prompt are reported in an
+execution_cached message, as ComfyUI does.
+Renders are a disc near the centre on the background the prompt asks for
+("solid white background", "solid dark background (#1A0A14)"), coloured
+with the prompt's first other #RRGGBB or a colour derived from the
+workflow, so they pass the QA gate (mascotgen.qa) the way a good render
+does; prompts that name no background render solid colour. --noise N
+randomises the low N bits of every channel, which brings PNG sizes up to
+those of real renders (--noise 3 at 1024px gives roughly 1.5MB, like a
+real Flux render).
+
+    python -m mascotgen.fake_server --port 8188 --latency 0.5
+
+`--url local://` runs the same engine inside the generator's process,
+with no server or port at all (see mascotgen.local).
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import queue
+import re
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+BACKGROUND = re.compile(r"solid ([^,]*?)background(?: \(#([0-9A-Fa-f]{6})\))?")
+HEX = re.compile(r"#([0-9A-Fa-f]{6})")
+UPSCALE = re.compile(r"(?:^|[^0-9])(?:x(\d)|(\d)x)(?:[^0-9]|$)", re.IGNORECASE)
+
+
+def scene(prompt: str, digest: bytes) -> tuple:
+    """(subject rgb, background rgb or None) for a prompt: see the module docstring."""
+    def rgb(hex_):
+        return tuple(bytes.fromhex(hex_))
+
+    background = None
+    match = BACKGROUND.search(prompt)
+    if match:
+        named = match.group(2) or next(iter(HEX.findall(match.group(1))), None)
+        if named:
+            background = rgb(named)
+        elif "white" in match.group(1):
+            background = (255, 255, 255)
+        else:
+            background = (16, 16, 16)
+    colors = [rgb(h) for h in HEX.findall(prompt) if rgb(h) != background]
+    return (colors[0] if colors else (digest[0], digest[1], digest[2])), background
+
+
+def batchless(workflow: dict) -> dict:
+    """workflow without its batch size or LatentFromBatch slicing.
+
+    ComfyUI draws a batch's noise image by image from the seed, so image i
+    of a seed is the same in a batch of any size or sliced out on its own;
+    renders are derived from this plus the index to match.
+    """
+    graph = {node_id: json.loads(json.dumps(node)) for node_id, node in workflow.items()
+             if node.get("class_type") != "LatentFromBatch"}
+    for node_id, node in workflow.items():
+        if node.get("class_type") == "LatentFromBatch":
+            for other in graph.values():
+                for name, value in other.get("inputs", {}).items():
+                    if value == [node_id, 0]:
+                        other["inputs"][name] = node["inputs"]["samples"]
+        elif node.get("class_type") == "EmptySD3LatentImage":
+            graph[node_id]["inputs"].pop("batch_size", None)
+    return graph
+
+
+def make_png(width: int, height: int, rgb: tuple, noise: int = 0, background: tuple = None,
+             offset: tuple = (0, 0)) -> bytes:
+    """Encode an RGB PNG, using the standard library only.
+
+    Solid colour rgb, or with a background, a disc of rgb a quarter of the
+    side in radius, `offset` pixels from the centre. The low `noise` bits
+    of every channel are randomised.
+    """
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    if background is None:
+        pixels = bytes(rgb) * (width * height)
+    else:
+        r = min(width, height) // 4
+        cx, cy = width // 2 + offset[0], height // 2 + offset[1]
+        bg, fg = bytes(background), bytes(rgb)
+        rows = []
+        for y in range(height):
+            half = int(max(0, r * r - (y - cy) ** 2) ** 0.5)
+            x0, x1 = max(0, cx - half), min(width, cx + half)
+            rows.append(bg * x0 + fg * (x1 - x0) + bg * (width - x1) if half else bg * width)
+        pixels = b"".join(rows)
+    if noise > 0:
+        mask = bytes(i & ((1 << min(noise, 8)) - 1) for i in range(256))
+        bits = os.urandom(len(pixels)).translate(mask)
+        pixels = (int.from_bytes(pixels, "big") ^ int.from_bytes(bits, "big")).to_bytes(len(pixels), "big")
+    stride = width * 3
+    raw = b"".join(b"\x00" + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeComfyUI:
+    """In-memory prompt queue with a single sequential "GPU" worker."""
+
+    def __init__(self, latency: float = 0.5, gpu_name: str = "Fake GPU", image_size: int = 0,
+                 noise: int = 0, cold_start: float = 0.0):
+        self.latency = latency
+        self.cold_start = cold_start
+        self.loaded = set()    # loader-node signatures already "in VRAM"
+        self.last_graph = {}   # previous prompt's graph, for execution_cached
+        self.gpu_name = gpu_name
+        self.image_size = image_size  # 0 = the latent's width/height
+        self.noise = noise
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.pending = []      # [number, prompt_id, workflow, extra, outputs]
+        self.running = []
+        self.history = {}
+        self.images = {}       # filename -> png bytes
+        self.sockets = {}      # client_id -> [handler, ...]
+        self.counter = 0
+        self.interrupted = set()
+        self.dead = False
+        self.connections = set()
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    # ----- API -----
+
+    def submit(self, workflow: dict, client_id: str) -> dict:
+        prompt_id = str(uuid.uuid4())
+        with self.lock:
+            number = self.counter
+            self.counter += 1
+            item = [number, prompt_id, workflow, {"client_id": client_id}, ["9"]]
+            self.pending.append(item)
+        self.jobs.put(item)
+        self._broadcast_status()
+        return {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    def queue_state(self) -> dict:
+        with self.lock:
+            return {"queue_running": list(self.running), "queue_pending": list(self.pending)}
+
+    def delete(self, prompt_ids: list):
+        with self.lock:
+            self.pending = [item for item in self.pending if item[1] not in prompt_ids]
+            self.interrupted.update(prompt_ids)
+
+    def interrupt(self):
+        with self.lock:
+            for item in self.running:
+                self.interrupted.add(item[1])
+
+    def queue_remaining(self) -> int:
+        with self.lock:
+            return len(self.pending) + len(self.running)
+
+    # ----- worker -----
+
+    def _work(self):
+        while not self.dead:
+            item = self.jobs.get()
+            number, prompt_id, workflow, extra, _ = item
+            with self.lock:
+                if prompt_id in self.interrupted or item not in self.pending:
+                    continue
+                self.pending.remove(item)
+                self.running.append(item)
+            client_id = extra["client_id"]
+            started = time.time()
+            self._send(client_id, "execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)})
+            cached = self._cached_nodes(workflow)
+            if cached:
+                self._send(client_id, "execution_cached", {"nodes": cached, "prompt_id": prompt_id,
+                                                           "timestamp": int(started * 1000)})
+            self._send(client_id, "executing", {"node": "5", "prompt_id": prompt_id})
+            loaders = json.dumps({k: v for k, v in workflow.items() if "Loader" in v.get("class_type", "")},
+                                 sort_keys=True)
+            deadline = started + self.latency
+            if loaders not in self.loaded:
+                deadline += self.cold_start
+                self.loaded.add(loaders)
+            self.last_graph = workflow
+            while time.time() < deadline and prompt_id not in self.interrupted and not self.dead:
+                time.sleep(max(0, min(0.01, deadline - time.time())))
+            if self.dead:
+                return
+            if prompt_id in self.interrupted:
+                with self.lock:
+                    self.running.remove(item)
+                self._send(client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": "5"})
+                self._broadcast_status()
+                continue
+
+            images = self._render(prompt_id, workflow)
+            output = {"images": images}
+            finished = time.time()
+            with self.lock:
+                self.running.remove(item)  # same step as the history entry, as in ComfyUI
+                self.history[prompt_id] = {
+                    "prompt": item,
+                    "outputs": {"9": output},
+                    "status": {
+                        "status_str": "success",
+                        "completed": True,
+                        "messages": [
+                            ["execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)}],
+                            ["execution_success", {"prompt_id": prompt_id, "timestamp": int(finished * 1000)}],
+                        ],
+                    },
+                }
+            self._send(client_id, "executed", {"node": "9", "output": output, "prompt_id": prompt_id})
+            self._send(client_id, "execution_success", {"prompt_id": prompt_id, "timestamp": int(finished * 1000)})
+            self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+            self._broadcast_status()
+
+    def _cached_nodes(self, workflow: dict) -> list:
+        """Ids of nodes whose class, inputs and upstream nodes match the previous prompt's."""
+        memo = {}
+
+        def cached(node_id):
+            if node_id not in memo:
+                memo[node_id] = False  # cycles don't happen in valid graphs; be safe anyway
+                node = workflow[node_id]
+                links = [v[0] for v in node.get("inputs", {}).values()
+                         if isinstance(v, list) and len(v) == 2 and v[0] in workflow]
+                memo[node_id] = (self.last_graph.get(node_id) == node
+                                 and node.get("class_type") not in ("SaveImage", "PreviewImage")
+                                 and all(cached(link) for link in links))
+            return memo[node_id]
+
+        return sorted(node_id for node_id in workflow if cached(node_id))
+
+    def _render(self, prompt_id: str, workflow: dict) -> list:
+        latent = {}
+        prefix = "ComfyUI"
+        folder = "output"
+        scale = 1
+        for node in workflow.values():
+            if node.get("class_type") == "EmptySD3LatentImage":
+                latent = node["inputs"]
+            elif node.get("class_type") == "UpscaleModelLoader":
+                factor = UPSCALE.search(node["inputs"].get("model_name", ""))
+                scale = int(factor.group(1) or factor.group(2)) if factor else 4
+            elif node.get("class_type") == "SaveImage":
+                prefix = node["inputs"].get("filename_prefix", prefix)
+            elif node.get("class_type") == "PreviewImage":
+                folder = "temp"
+        width = self.image_size or int(latent.get("width", 512)) * scale
+        height = self.image_size or int(latent.get("height", 512)) * scale
+        prompt = next((node["inputs"].get("t5xxl", "") for node in workflow.values()
+                       if node.get("class_type") == "CLIPTextEncodeFlux" and node["inputs"].get("t5xxl")), "")
+        digest = hashlib.sha256(json.dumps(batchless(workflow), sort_keys=True).encode()).digest()
+        indices = range(int(latent.get("batch_size", 1)))
+        for node in workflow.values():
+            if node.get("class_type") == "LatentFromBatch":
+                start = min(int(node["inputs"].get("batch_index", 0)), len(indices) - 1)
+                indices = indices[start:start + int(node["inputs"].get("length", 1))]
+        images = []
+        for i in indices:
+            pick = digest[i % 32:] + digest[:i % 32]
+            rgb, background = scene(prompt, pick)
+            # Up to 5% off-centre, so every seed is a slightly different picture.
+            offset = ((pick[3] - 128) * width // 5120, (pick[4] - 128) * height // 5120)
+            filename = f"{prefix}_{prompt_id[:8]}_{i:05d}_.png"
+            data = make_png(width, height, rgb, self.noise, background, offset)
+            with self.lock:
+                self.images[filename] = data
+            images.append({"filename": filename, "subfolder": "", "type": folder})
+        return images
+
+    # ----- websocket -----
+
+    def _send(self, client_id: str, msg_type: str, data: dict):
+        message = json.dumps({"type": msg_type, "data": data})
+        with self.lock:
+            handlers = list(self.sockets.get(client_id, []))
+        for handler in handlers:
+            handler.ws_send(message)
+
+    def _broadcast_status(self):
+        message = json.dumps({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": self.queue_remaining()}}}})
+        with self.lock:
+            handlers = [h for hs in self.sockets.values() for h in hs]
+        for handler in handlers:
+            handler.ws_send(message)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeComfyUI/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, every JSON
+    # reply waits ~40ms for the client's delayed ACK and skews queue timings.
+    disable_nagle_algorithm = True
+
+    @property
+    def comfy(self) -> FakeComfyUI:
+        return self.server.comfy
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.comfy.lock:
+            self.comfy.connections.add(self.connection)
+
+    def finish(self):
+        with self.comfy.lock:
+            self.comfy.connections.discard(self.connection)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def _json(self, obj, status: int = 200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == "/ws":
+            return self._websocket(params.get("clientId", ""))
+        if url.path == "/system_stats":
+            return self._json({"system": {"os": "fake", "comfyui_version": "fake"},
+                               "devices": [{"name": self.comfy.gpu_name, "type": "cuda"}]})
+        if url.path == "/queue":
+            return self._json(self.comfy.queue_state())
+        if url.path == "/history":
+            with self.comfy.lock:
+                return self._json(dict(self.comfy.history))
+        if url.path.startswith("/history/"):
+            prompt_id = url.path[len("/history/"):]
+            with self.comfy.lock:
+                entry = self.comfy.history.get(prompt_id)
+            return self._json({prompt_id: entry} if entry else {})
+        if url.path == "/view":
+            with self.comfy.lock:
+                data = self.comfy.images.get(params.get("filename", ""))
+            if data is None:
+                return self._json({"error": "not found"}, 404)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        body = self._body()
+        if url.path == "/prompt":
+            return self._json(self.comfy.submit(body["prompt"], body.get("client_id", "")))
+        if url.path == "/queue":
+            if body.get("clear"):
+                self.comfy.delete([item[1] for item in self.comfy.queue_state()["queue_pending"]])
+            self.comfy.delete(body.get("delete", []))
+            return self._json({})
+        if url.path == "/interrupt":
+            self.comfy.interrupt()
+            return self._json({})
+        self._json({"error": "not found"}, 404)
+
+    # ----- minimal RFC 6455 server side -----
+
+    def _websocket(self, client_id: str):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.ws_lock = threading.Lock()
+        with self.comfy.lock:
+            self.comfy.sockets.setdefault(client_id, []).append(self)
+        self.ws_send(json.dumps({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": self.comfy.queue_remaining()}}, "sid": client_id}}))
+        try:
+            while True:
+                header = self.rfile.read(2)
+                if len(header) < 2:
+                    break
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack(">H", self.rfile.read(2))[0]
+                elif length == 127:
+                    length = struct.unpack(">Q", self.rfile.read(8))[0]
+                if header[1] & 0x80:
+                    self.rfile.read(4)  # client mask; payload contents are ignored
+                self.rfile.read(length)
+                if opcode == 0x8:
+                    break
+        finally:
+            with self.comfy.lock:
+                self.comfy.sockets.get(client_id, []).remove(self)
+            self.close_connection = True
+
+    def ws_send(self, message: str):
+        data = message.encode("utf-8")
+        if len(data) < 126:
+            header = struct.pack(">BB", 0x81, len(data))
+        elif len(data) < 65536:
+            header = struct.pack(">BBH", 0x81, 126, len(data))
+        else:
+            header = struct.pack(">BBQ", 0x81, 127, len(data))
+        try:
+            with self.ws_lock:
+                self.wfile.write(header + data)
+                self.wfile.flush()
+        except (OSError, ValueError):  # ValueError: the handler already closed the socket
+            pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8188, latency: float = 0.5, gpu_name: str = "Fake GPU",
+          image_size: int = 0, noise: int = 0, cold_start: float = 0.0):
+    """Start a fake server on a background thread and return it (port 0 = pick a free port)."""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.comfy = FakeComfyUI(latency=latency, gpu_name=gpu_name, image_size=image_size, noise=noise,
+                               cold_start=cold_start)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def kill(server):
+    """Simulate a crashed backend: stop rendering and drop every open connection."""
+    server.comfy.dead = True
+    server.shutdown()
+    server.server_close()
+    with server.comfy.lock:
+        connections = list(server.comfy.connections)
+    for conn in connections:
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per render")
+    parser.add_argument("--image-size", type=int, default=0,
+                        help="render every image at this size instead of the workflow's")
+    parser.add_argument("--noise", type=int, default=0,
+                        help="randomise the low N bits of each channel (0 = solid colour)")
+    parser.add_argument("--cold-start", type=float, default=0.0,
+                        help="extra seconds for the first prompt with a given set of model loaders")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency, image_size=args.image_size, noise=args.noise,
+                   cold_start=args.cold_start)
+    print(f"Fake ComfyUI listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
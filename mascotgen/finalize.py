@@ -0,0 +1,101 @@
+"""
+Offline PNG finalize pass.
+
+Generation runs can encode with mode="fast" (zlib level 1) to keep the
+critical path short; this pass then re-encodes everything in an output
+directory at maximum compression, optionally palette-quantizing small
+icons, and reports bytes saved and time spent.
+
+A state file records a hash of each finalized file's pixels, so files
+whose pixel content hasn't changed since the last pass are skipped and
+only freshly generated outputs are rewritten. A file is also left alone
+if the re-encode isn't smaller.
+
+    python -m mascotgen.finalize public/mascot --quantize-max 64
+"""
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from .imaging import encode_png
+
+
+def pixel_hash(img) -> str:
+    h = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def quantize(img):
+    """Palette-quantize to 256 colours, keeping alpha when present."""
+    from PIL import Image
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        return img.convert("RGBA").quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    return img.convert("RGB").quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+
+
+def finalize_file(path: Path, state: dict, quantize_max: int = 0) -> tuple:
+    """Re-encode one PNG in place. Returns (bytes_before, bytes_after); equal if skipped."""
+    from PIL import Image
+    before = path.stat().st_size
+    with Image.open(path) as img:
+        img.load()
+    current = pixel_hash(img)
+    if state.get(path.name) == current:
+        return before, before
+
+    if quantize_max and max(img.size) <= quantize_max and img.mode != "P":
+        img = quantize(img)
+    data = encode_png(img, "optimize")
+    if len(data) >= before:
+        state[path.name] = current
+        return before, before
+    path.write_bytes(data)
+    state[path.name] = pixel_hash(img)
+    return before, len(data)
+
+
+def finalize_dir(directory: Path, state_path: Path, quantize_max: int = 0) -> dict:
+    """Finalize every PNG in directory. Returns a summary dict and prints a report."""
+    directory = Path(directory)
+    state_path = Path(state_path)
+    try:
+        all_state = json.loads(state_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        all_state = {}
+    state = all_state.setdefault(str(directory.resolve()), {})
+
+    start = time.time()
+    files = rewritten = saved = 0
+    for path in sorted(directory.glob("*.png")):
+        files += 1
+        before, after = finalize_file(path, state, quantize_max)
+        if after < before:
+            rewritten += 1
+            saved += before - after
+            print(f"  Optimized: {path.name} {before/1024:.1f}KB -> {after/1024:.1f}KB")
+    elapsed = time.time() - start
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(all_state, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"  Finalize: {rewritten}/{files} files rewritten, {saved/1024:.1f}KB saved in {elapsed:.1f}s")
+    return {"files": files, "rewritten": rewritten, "bytes_saved": saved, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encode generated PNGs at maximum compression")
+    parser.add_argument("directories", nargs="+", type=Path)
+    parser.add_argument("--state", type=Path, default=Path(".render-cache") / "finalized.json",
+                        help="where to remember already-finalized pixel hashes")
+    parser.add_argument("--quantize-max", type=int, default=0,
+                        help="palette-quantize PNGs whose largest side is <= this (0 = never)")
+    args = parser.parse_args()
+    for directory in args.directories:
+        print(f"{directory}:")
+        finalize_dir(directory, args.state, args.quantize_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Resize/encode stage: decode a render once and derive every output size from it.
+
+Functions here are top-level and take/return plain bytes and paths so they
+can be handed to a ProcessPoolExecutor; encoding several assets then runs
+on several cores instead of serialising behind the GIL. Sources may be a
+file path (preferred: the original render streamed to disk, so neither
+the pipe to a worker process nor the decoder needs an in-memory copy of
+the encoded PNG) or raw PNG bytes.
+
+Besides the PNG, every size can also be written as WebP and/or AVIF. The
+quality of each is searched for: the lowest quality whose decode still
+has at least `threshold` luma SSIM against the LANCZOS-resized pixels
+the PNG holds losslessly. Images with alpha are compared composited onto both
+backgrounds the assets sit on (white and #1A0A14), so a fringe that only
+shows on one of them still counts. The similarity check needs NumPy.
+
+With a CropSpec, the decoded render is first cut down to its subject plus
+a margin and its solid background keyed out to alpha (see crop_subject),
+and every size is derived from that, so small icons spend their pixels
+on the mascot instead of on padding. Also NumPy.
+"""
+import io
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+def _box(size) -> tuple:
+    """sizes values are either an int (square) or a (width, height) pair."""
+    return (size, size) if isinstance(size, int) else tuple(size)
+
+
+def parse_color(value) -> tuple:
+    """"#RRGGBB" (or an [r, g, b] list) as an (r, g, b) tuple."""
+    if isinstance(value, str):
+        value = value.lstrip("#")
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    return tuple(value)
+
+
+ENCODE_MODES = ("fast", "optimize")
+MODERN_FORMATS = ("webp", "avif")
+QUALITY_THRESHOLD = 0.99
+
+# What transparent pixels are judged against: the app's light and dark backgrounds.
+ALPHA_BACKGROUNDS = ((255, 255, 255), (0x1A, 0x0A, 0x14))
+
+
+def encode_png(img, mode: str = "optimize") -> bytes:
+    """PNG-encode img. "fast" uses zlib level 1 for iteration; "optimize" is the slow, smallest path."""
+    buf = io.BytesIO()
+    if mode == "fast":
+        img.save(buf, format="PNG", compress_level=1)
+    elif mode == "optimize":
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        raise ValueError(f"Unknown encode mode {mode!r}; expected one of {ENCODE_MODES}")
+    return buf.getvalue()
+
+
+def available_formats() -> tuple:
+    """The MODERN_FORMATS this Pillow build can encode."""
+    from PIL import features
+    return tuple(fmt for fmt in MODERN_FORMATS if features.check(fmt))
+
+
+def _planes(img) -> list:
+    """Luma arrays img is judged by: its own, or with alpha, composited onto each background."""
+    import numpy as np
+    from PIL import Image
+    if img.mode not in ("RGBA", "LA", "PA") and "transparency" not in img.info:
+        return [np.asarray(img.convert("L"), dtype=np.float64)]
+    rgba = img.convert("RGBA")
+    return [np.asarray(Image.alpha_composite(Image.new("RGBA", rgba.size, bg + (255,)), rgba).convert("L"),
+                       dtype=np.float64)
+            for bg in ALPHA_BACKGROUNDS]
+
+
+def _ssim(a, b, window: int = 7) -> float:
+    """Mean SSIM of two equally sized 2-D arrays over window x window patches."""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    window = min(window, *a.shape)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def mean(x):
+        return sliding_window_view(x, (window, window)).mean(axis=(-2, -1))
+
+    mu_a, mu_b = mean(a), mean(b)
+    var_a = mean(a * a) - mu_a ** 2
+    var_b = mean(b * b) - mu_b ** 2
+    cov = mean(a * b) - mu_a * mu_b
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(np.mean(ssim))
+
+
+def similarity(reference, candidate) -> float:
+    """SSIM of candidate against reference (1.0 = identical); the worst background for alpha images."""
+    return min(_ssim(a, b) for a, b in zip(_planes(reference), _planes(candidate)))
+
+
+def encode_modern(img, fmt: str, threshold: float = QUALITY_THRESHOLD, lo: int = 20, hi: int = 100) -> tuple:
+    """Smallest-quality fmt encode of img that keeps similarity() >= threshold.
+
+    Binary search over quality lo..hi. Returns (data, quality, score); if
+    even hi misses the threshold, that encode is returned with its score.
+    """
+    from PIL import Image
+    if fmt not in MODERN_FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {MODERN_FORMATS}")
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    def encode(quality):
+        buf = io.BytesIO()
+        if fmt == "webp":
+            img.save(buf, format="WEBP", quality=quality, method=6)
+        else:
+            img.save(buf, format="AVIF", quality=quality)
+        data = buf.getvalue()
+        with Image.open(io.BytesIO(data)) as decoded:
+            return data, similarity(img, decoded.convert(img.mode))
+
+    best = tried = None
+    while lo <= hi:
+        quality = (lo + hi) // 2
+        data, score = encode(quality)
+        tried = (data, quality, score)
+        if score >= threshold:
+            best = tried
+            hi = quality - 1
+        else:
+            lo = quality + 1
+    # Every miss moves the search up, so without a hit the last try was the highest quality.
+    return best or tried
+
+
+@dataclass
+class CropSpec:
+    background: tuple = None  # RGB to crop and key away; None = the border's median colour
+    tolerance: int = 40       # per-channel difference from the background beyond which a pixel is subject
+    margin: float = 0.08      # room kept around the subject, fraction of its longer side
+    key: bool = True          # make the background transparent
+
+    @classmethod
+    def from_table(cls, table: dict) -> "CropSpec":
+        table = dict(table)
+        if table.get("background") is not None:
+            table["background"] = parse_color(table["background"])
+        return cls(**table)
+
+
+def _fill_runs(reach, free):
+    """reach extended along every row-run of free pixels it touches."""
+    import numpy as np
+    breaks = ~free
+    breaks[:, 0] = True  # runs never wrap onto the next row
+    run = np.cumsum(breaks.ravel())
+    touched = np.zeros(run[-1] + 1, dtype=bool)
+    touched[run[reach.ravel()]] = True
+    return touched[run].reshape(free.shape) & free
+
+
+def _outside(free):
+    """Pixels of the boolean mask free connected to the image border through free pixels.
+
+    Scanline fill: spread along rows, then columns, until nothing changes,
+    which takes one pass per turn the background makes around the subject
+    rather than one per pixel of distance.
+    """
+    import numpy as np
+    reach = np.zeros_like(free)
+    for edge in (np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1]):
+        reach[edge] = free[edge]
+    while True:
+        grown = _fill_runs(_fill_runs(reach, free).T, free.T).T
+        if (grown == reach).all():
+            return reach
+        reach = grown
+
+
+def crop_subject(img, spec: CropSpec, aspect: float = 1.0):
+    """img cut to its subject plus spec.margin at aspect (w/h), with the background keyed to alpha.
+
+    One mask per image: each pixel's largest channel difference from the
+    background. Pixels beyond spec.tolerance are subject and give the
+    bounding box. With spec.key, background-like pixels connected to the
+    edge fade out over tolerance/2..tolerance (so anti-aliased edges stay
+    smooth), and partly transparent ones get the background's share taken
+    back out of their colour, so no white or dark fringe is left for the
+    app's own background to show. Enclosed background-coloured areas (eye
+    highlights on a white render) stay opaque. An image with no subject
+    is returned unchanged.
+    """
+    import numpy as np
+    from PIL import Image
+    rgb = np.asarray(img.convert("RGB"), dtype=np.float32)
+    h, w, _ = rgb.shape
+    if spec.background is None:
+        border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]])
+        background = np.median(border, axis=0)
+    else:
+        background = np.asarray(spec.background, dtype=np.float32)
+    diff = np.abs(rgb - background).max(axis=-1)
+    subject = diff > spec.tolerance
+    # Rows/columns with a couple of subject pixels at least, so stray specks don't stretch the box.
+    rows = np.flatnonzero(subject.sum(axis=1) >= max(2, w // 200))
+    cols = np.flatnonzero(subject.sum(axis=0) >= max(2, h // 200))
+    if not rows.size or not cols.size:
+        return img
+
+    if spec.key:
+        low = spec.tolerance / 2
+        alpha = np.ones((h, w), dtype=np.float32)
+        outside = _outside(~subject)
+        alpha[outside] = np.clip((diff[outside] - low) / (spec.tolerance - low), 0, 1)
+        partial = (alpha > 0) & (alpha < 1)
+        a = alpha[partial][:, None]
+        rgb[partial] = np.clip((rgb[partial] - (1 - a) * background) / a, 0, 255)
+        rgb[alpha == 0] = 0
+        pixels = np.dstack([rgb, alpha * 255]).round().astype(np.uint8)
+        fill = (0, 0, 0, 0)
+    else:
+        pixels = rgb.round().astype(np.uint8)
+        fill = tuple(int(c) for c in np.round(background))
+    cut = Image.fromarray(pixels, "RGBA" if spec.key else "RGB")
+
+    x0, x1, y0, y1 = cols[0], cols[-1] + 1, rows[0], rows[-1] + 1
+    box_w = max(x1 - x0, (y1 - y0) * aspect)
+    pad = spec.margin * max(x1 - x0, y1 - y0)
+    box_w, box_h = round(box_w + 2 * pad), round((box_w + 2 * pad) / aspect)
+    left, top = round((x0 + x1 - box_w) / 2), round((y0 + y1 - box_h) / 2)
+    out = Image.new(cut.mode, (box_w, box_h), fill)
+    out.paste(cut, (-left, -top))  # anything past the render's edge stays background
+    return out
+
+
+def _open(source):
+    from PIL import Image
+    if isinstance(source, (str, Path)):
+        return Image.open(source)
+    return Image.open(io.BytesIO(source))
+
+
+def iter_resized(source, sizes: dict, progressive: bool = False, crop: CropSpec = None):
+    """Decode source once and yield (filename, image) for every entry in sizes, largest first.
+
+    With progressive=True each downscale starts from the smallest already
+    produced image that is still at least as large as the target
+    (512 -> 128 -> 64 -> 48) instead of running every LANCZOS pass over the
+    full-resolution source. With crop, every size comes from the subject
+    crop_subject() cuts out, at the aspect of the largest size.
+    """
+    from PIL import Image
+    with _open(source) as src:
+        src.load()
+        order = sorted(sizes.items(), key=lambda item: _box(item[1])[0] * _box(item[1])[1], reverse=True)
+        if crop is not None:
+            w, h = _box(order[0][1])
+            src = crop_subject(src, crop, w / h)
+        made = []
+        for fname, size in order:
+            w, h = _box(size)
+            base = src
+            if progressive:
+                for img in made:
+                    # Never chain off an upscaled intermediate (e.g. the 600px logo from 512).
+                    if w <= img.width <= src.width and h <= img.height <= src.height:
+                        base = img
+            img = base if base.size == (w, h) else base.resize((w, h), Image.LANCZOS)
+            if progressive:
+                made.append(img)
+            yield fname, img
+
+
+def resize_all(source, sizes: dict, progressive: bool = False, encode: str = "optimize",
+               crop: CropSpec = None) -> dict:
+    """Decode source once and return {filename: png_bytes} for every entry in sizes."""
+    encoded = {fname: encode_png(img, encode) for fname, img in iter_resized(source, sizes, progressive, crop)}
+    return {fname: encoded[fname] for fname in sizes}
+
+
+def write_sizes(source, output_dir: Path, sizes: dict, progressive: bool = False,
+                encode: str = "optimize", formats: tuple = (), threshold: float = QUALITY_THRESHOLD,
+                crop: CropSpec = None) -> list:
+    """Resize source to every entry in sizes and write each file as soon as it's encoded.
+
+    Each size is also written next to its PNG in every one of formats
+    (see encode_modern). Returns [(path, width, height, nbytes, seconds,
+    quality)]: the PNGs in sizes order, then the other formats in the same
+    order. seconds is the resize + encode + write time of that file (the
+    largest PNG also pays for decoding and cropping the source); quality is
+    None for PNGs.
+    """
+    written = {}
+    extra = {}
+    start = time.time()
+    for fname, img in iter_resized(source, sizes, progressive, crop):
+        data = encode_png(img, encode)
+        path = Path(output_dir) / fname
+        path.write_bytes(data)
+        now = time.time()
+        written[fname] = (path, img.width, img.height, len(data), now - start, None)
+        start = now
+        for fmt in formats:
+            data, quality, score = encode_modern(img, fmt, threshold)
+            out = path.with_suffix(f".{fmt}")
+            out.write_bytes(data)
+            now = time.time()
+            extra.setdefault(fname, []).append((out, img.width, img.height, len(data), now - start, quality))
+            start = now
+    return [written[fname] for fname in sizes] + [row for fname in sizes for row in extra.get(fname, [])]
@@ -0,0 +1,187 @@
+"""
+Flux Schnell GGUF workflow template and the typed job that wraps it.
+"""
+import copy
+from dataclasses import dataclass
+from pathlib import Path
+
+from .imaging import CropSpec
+from .qa import QASpec
+
+
+# Nodes that are the same in every graph: the GGUF UNet and T5/CLIP loaders,
+# the VAE loader and the empty-prompt negative conditioning. ComfyUI reuses a
+# node's cached output when its class and inputs are unchanged, so keeping
+# these identical (same ids, same literal inputs) means only the first
+# prompt of a session loads models or encodes the negative; later ones start
+# at the positive encode. Never derive anything in here from a job.
+SHARED_NODES = {
+    "1": {
+        "class_type": "UnetLoaderGGUF",
+        "inputs": {
+            "unet_name": "flux1-schnell-Q4_K_S.gguf"
+        }
+    },
+    "2": {
+        "class_type": "DualCLIPLoaderGGUF",
+        "inputs": {
+            "clip_name1": "clip_l.safetensors",
+            "clip_name2": "t5-v1_1-xxl-encoder-Q4_K_M.gguf",
+            "type": "flux"
+        }
+    },
+    "6": {
+        "class_type": "CLIPTextEncodeFlux",
+        "inputs": {
+            "clip": ["2", 0],
+            "clip_l": "",
+            "t5xxl": "",
+            "guidance": 3.5
+        }
+    },
+    "7": {
+        "class_type": "VAELoader",
+        "inputs": {
+            "vae_name": "ae.safetensors"
+        }
+    },
+}
+
+WARMUP_SIZE = 64
+
+
+def make_workflow(prompt_text: str, seed: int = 0, width: int = 512, height: int = 512,
+                  prefix: str = "mascot", batch_size: int = 1, upscale_model: str = None,
+                  variant: int = None) -> dict:
+    """The txt2img graph; with upscale_model the decoded image is run through that model before it's saved.
+
+    variant renders just image `variant` of seed's batch (see RenderJob.variant).
+    """
+    shared = copy.deepcopy(SHARED_NODES)
+    graph = {
+        "1": shared["1"],
+        "2": shared["2"],
+        "3": {
+            "class_type": "CLIPTextEncodeFlux",
+            "inputs": {
+                "clip": ["2", 0],
+                "clip_l": prompt_text,
+                "t5xxl": prompt_text,
+                "guidance": 3.5
+            }
+        },
+        "4": {
+            "class_type": "EmptySD3LatentImage",
+            "inputs": {
+                "width": width,
+                "height": height,
+                "batch_size": batch_size
+            }
+        },
+        "5": {
+            "class_type": "KSampler",
+            "inputs": {
+                "model": ["1", 0],
+                "positive": ["3", 0],
+                "negative": ["6", 0],
+                "latent_image": ["4", 0],
+                "seed": seed,
+                "steps": 4,
+                "cfg": 1.0,
+                "sampler_name": "euler",
+                "scheduler": "normal",
+                "denoise": 1.0
+            }
+        },
+        "6": shared["6"],
+        "7": shared["7"],
+        "8": {
+            "class_type": "VAEDecode",
+            "inputs": {
+                "samples": ["5", 0],
+                "vae": ["7", 0]
+            }
+        },
+        "9": {
+            "class_type": "SaveImage",
+            "inputs": {
+                "images": ["8", 0],
+                "filename_prefix": prefix
+            }
+        }
+    }
+    if upscale_model:
+        graph["10"] = {
+            "class_type": "UpscaleModelLoader",
+            "inputs": {
+                "model_name": upscale_model
+            }
+        }
+        graph["11"] = {
+            "class_type": "ImageUpscaleWithModel",
+            "inputs": {
+                "upscale_model": ["10", 0],
+                "image": ["8", 0]
+            }
+        }
+        graph["9"]["inputs"]["images"] = ["11", 0]
+    if variant is not None:
+        # LatentFromBatch tags the slice with its batch index, so KSampler
+        # draws that index's noise: the image the sweep showed, sampled alone.
+        graph["4"]["inputs"]["batch_size"] = variant + 1
+        graph["12"] = {
+            "class_type": "LatentFromBatch",
+            "inputs": {
+                "samples": ["4", 0],
+                "batch_index": variant,
+                "length": 1
+            }
+        }
+        graph["5"]["inputs"]["latent_image"] = ["12", 0]
+    return graph
+
+
+def warmup_workflow(workflow: dict, size: int = WARMUP_SIZE) -> dict:
+    """A tiny copy of workflow that loads every model and writes nothing to ComfyUI's output dir.
+
+    The latent shrinks to size x size (batch 1) and SaveImage becomes
+    PreviewImage; every other node is untouched, so the loaders and the
+    negative encode it caches are exactly the ones the real graphs use.
+    """
+    graph = copy.deepcopy(workflow)
+    for node in graph.values():
+        if node["class_type"] == "EmptySD3LatentImage":
+            node["inputs"].update(width=size, height=size, batch_size=1)
+        elif node["class_type"] == "SaveImage":
+            node["class_type"] = "PreviewImage"
+            node["inputs"].pop("filename_prefix", None)
+    return graph
+
+
+@dataclass
+class RenderJob:
+    """One asset: what to render and which sizes to write where.
+
+    sizes maps output filename -> int (square) or (width, height).
+    qa is what a render must pass before it's resized (see mascotgen.qa),
+    and crop cuts every size from the subject alone (see crop_subject).
+    upscale_model makes it a two-stage render: gen_size, then that
+    ComfyUI upscale model (see mascotgen.plan). variant is the candidate
+    of a `--variants N` sweep of seed that --pick kept.
+    """
+    name: str
+    prompt: str
+    seed: int
+    output_dir: Path
+    sizes: dict
+    gen_size: int = 512
+    prefix: str = "mascot"
+    qa: QASpec = None
+    crop: CropSpec = None
+    upscale_model: str = None
+    variant: int = None
+
+    def workflow(self, batch_size: int = 1) -> dict:
+        return make_workflow(self.prompt, seed=self.seed, width=self.gen_size, height=self.gen_size,
+                             prefix=self.prefix, batch_size=batch_size, upscale_model=self.upscale_model,
+                             variant=self.variant)
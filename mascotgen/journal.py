@@ -0,0 +1,101 @@
+"""
+On-disk journal of prompts a build has queued, so a crashed or timed-out
+run doesn't throw away GPU work.
+
+Each asset maps to the prompt_id it was last queued as, the server and
+workflow key it was queued with, and its status ("queued" until a
+completion is observed, then "rendered"). An entry is dropped once the
+asset's outputs are saved or ComfyUI reports the prompt failed; a
+timeout, crash or Ctrl-C leaves it in place.
+
+The next run re-attaches instead of queueing again: a prompt already in
+/history is downloaded from there, one still in /queue is waited on, and
+only assets with no usable prompt are rendered. The journal also keeps
+the client_id used for each server, so re-attached prompts keep reporting
+over /ws to the new run.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+class Journal:
+    """The journal at path, or with path=None one kept in memory for this run only."""
+
+    def __init__(self, path: Path = None):
+        self.path = None if path is None else Path(path)
+        self.lock = threading.Lock()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8")) if self.path else {}
+        except (FileNotFoundError, ValueError):
+            data = {}
+        self.clients = data.get("clients", {})  # server url -> client_id
+        self.assets = data.get("assets", {})    # name -> {prompt_id, key, url, status, queued_at}
+
+    def client_id(self, url: str) -> str:
+        """The client_id to use for url: the previous run's, so its prompts still report to us."""
+        url = url.rstrip("/")
+        with self.lock:
+            if url not in self.clients:
+                self.clients[url] = str(uuid.uuid4())
+                self._save()
+            return self.clients[url]
+
+    def prompt_for(self, name: str, key: str, url: str):
+        """prompt_id an earlier run queued for this asset, workflow and server, or None."""
+        entry = self.assets.get(name)
+        if entry is None or entry["key"] != key or entry["url"] != url.rstrip("/"):
+            return None
+        return entry["prompt_id"]
+
+    def queued(self, name: str, key: str, url: str, prompt_id: str):
+        self._update(name, {"prompt_id": prompt_id, "key": key, "url": url.rstrip("/"),
+                            "status": "queued", "queued_at": time.time()})
+
+    def rendered(self, name: str):
+        with self.lock:
+            if name in self.assets:
+                self.assets[name]["status"] = "rendered"
+                self._save()
+
+    def forget(self, name: str):
+        """Drop an asset's entry: its outputs are saved, or its prompt is no use to a later run."""
+        self._update(name, None)
+
+    def _update(self, name: str, entry):
+        with self.lock:
+            if entry is None:
+                if self.assets.pop(name, None) is None:
+                    return
+            else:
+                self.assets[name] = entry
+            self._save()
+
+    def _save(self):
+        # Written on every change; atomic so a crash mid-write can't lose the rest.
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"clients": self.clients, "assets": self.assets}, indent=2, sort_keys=True),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def resumable(prompt_id: str, queue_state: dict, entry) -> bool:
+    """Whether a journaled prompt is worth re-attaching to.
+
+    queue_state is the /queue response and entry the prompt's /history
+    entry (None if absent), fetched in that order so a prompt finishing
+    in between is still seen. Prompts still pending or running and
+    finished ones with outputs are; failed, interrupted or deleted ones,
+    or ones a restarted server has forgotten, are not.
+    """
+    live = queue_state.get("queue_running", []) + queue_state.get("queue_pending", [])
+    if any(item[1] == prompt_id for item in live):
+        return True
+    status = (entry or {}).get("status") or {}
+    return entry is not None and status.get("status_str") != "error" and bool(entry.get("outputs"))
@@ -0,0 +1,181 @@
+"""
+In-process render backend: the whole pipeline without a GPU or ComfyUI.
+
+`--url local://` runs prompts on the fake server's engine
+(mascotgen.fake_server.FakeComfyUI) inside this process instead of
+sending them over HTTP: one sequential "GPU" thread that synthesizes a
+PNG at the workflow's width/height (times the upscale model's factor)
+from a hash of the workflow. The same job always gives the same image,
+so the render cache, build state and dedupe behave as they do against
+ComfyUI, and the synthetic subject sits on the background the prompt
+asks for, so renders pass the QA gate and crop like real ones. Queueing,
+completion events, /queue, cancellation and downloads all go through the
+same client API as ComfyUI's, so every runner works unchanged.
+
+Options go in the query string (all default to 0):
+
+    --url 'local://?latency=0.5&cold_start=2&noise=3'
+
+latency and cold_start are seconds per render and for the first render
+with a given set of model loaders; noise randomises the low bits of
+every channel (3 gives real-render PNG sizes); image_size overrides the
+workflow's size. Different hosts (local://a, local://b) are separate
+engines, for exercising the multi-server scheduler.
+
+Its images are placeholders, so a manifest run against local:// writes
+everything (outputs, build state, render cache, journal) under
+<cache_dir>/local/ instead of where the manifest says (see
+mascotgen.cli.sandboxed): a synthetic render can never be shipped, or
+served from the cache to a later run against ComfyUI.
+"""
+import asyncio
+import json
+import threading
+import urllib.parse
+
+from .aio import AsyncComfyClient
+from .client import ComfyClient, ComfyError
+from .fake_server import FakeComfyUI
+from .tracker import CompletionTracker
+
+OPTIONS = {"latency": float, "cold_start": float, "noise": int, "image_size": int}
+GPU_NAME = "Local synthetic renderer (CPU)"
+
+_engines = {}  # local://<host> -> FakeComfyUI, shared by every client in the process
+_engines_lock = threading.Lock()
+
+
+def is_local(url: str) -> bool:
+    return urllib.parse.urlparse(url).scheme == "local"
+
+
+def engine(url: str) -> FakeComfyUI:
+    """The engine behind url, started (with url's options) on first use."""
+    parsed = urllib.parse.urlparse(url)
+    options = {}
+    for key, values in urllib.parse.parse_qs(parsed.query).items():
+        if key not in OPTIONS:
+            raise ValueError(f"unknown local backend option {key!r} (expected {', '.join(OPTIONS)})")
+        options[key] = OPTIONS[key](values[-1])
+    with _engines_lock:
+        if parsed.netloc not in _engines:
+            options.setdefault("latency", 0.0)
+            _engines[parsed.netloc] = FakeComfyUI(gpu_name=GPU_NAME, **options)
+        return _engines[parsed.netloc]
+
+
+class LocalTracker(CompletionTracker):
+    """A CompletionTracker the engine feeds directly, like an event socket that never drops."""
+
+    connected = True
+    on_message = None  # called (on the engine's thread) after every message
+
+    def ws_send(self, message: str):
+        self.handle(json.loads(message))
+        if self.on_message is not None:
+            self.on_message()
+
+
+class LocalClient(ComfyClient):
+    """ComfyClient's API on the in-process engine for a local:// URL."""
+
+    def __init__(self, base_url: str = "local://", client_id: str = None, timeout: float = 60, policy=None):
+        super().__init__(base_url, client_id, timeout, policy)
+        self.engine = engine(base_url)
+        self.base_url = f"local://{urllib.parse.urlparse(base_url).netloc}"
+        self._tracker = LocalTracker(self.base_url, self.client_id, fetch_history=self.history)
+        with self.engine.lock:
+            self.engine.sockets.setdefault(self.client_id, []).append(self._tracker)
+
+    def request(self, method: str, path: str, payload=None, sink=None):
+        raise ComfyError(f"{method} {path}: {self.base_url} has no HTTP API")
+
+    def close(self):
+        with self.engine.lock:
+            listeners = self.engine.sockets.get(self.client_id, [])
+            if self._tracker in listeners:
+                listeners.remove(self._tracker)
+
+    def system_stats(self) -> dict:
+        return {"system": {"comfyui_version": "local"}, "devices": [{"name": self.engine.gpu_name, "type": "cpu"}]}
+
+    def queue_prompt(self, workflow: dict) -> str:
+        return self.engine.submit(workflow, self.client_id)["prompt_id"]
+
+    def history(self, prompt_id: str):
+        with self.engine.lock:
+            return self.engine.history.get(prompt_id)
+
+    def queue_state(self) -> dict:
+        return self.engine.queue_state()
+
+    def get_image(self, filename: str, subfolder: str = "", folder_type: str = "output", sink=None):
+        with self.engine.lock:
+            data = self.engine.images.get(filename)
+        if data is None:
+            raise ComfyError(f"GET /view {filename}: HTTP 404")
+        if sink is None:
+            return data
+        sink.write(data)
+        return len(data)
+
+    @property
+    def tracker(self) -> LocalTracker:
+        return self._tracker
+
+
+class AsyncLocalClient(AsyncComfyClient):
+    """AsyncComfyClient's API on the in-process engine; completions wake waiters on the event loop."""
+
+    def __init__(self, base_url: str = "local://", client_id: str = None, timeout: float = 60, **kwargs):
+        super().__init__(base_url, client_id, timeout, **kwargs)
+        self.local = LocalClient(base_url, self.client_id, timeout)
+        self.base_url = self.local.base_url
+        self.tracker = self.local.tracker
+        self._tracking = False
+
+    async def request(self, method: str, path: str, payload=None, sink=None):
+        return self.local.request(method, path, payload, sink)
+
+    async def close(self):
+        self.tracker.on_message = None
+        self._tracking = False
+        self.local.close()
+
+    async def system_stats(self) -> dict:
+        return self.local.system_stats()
+
+    async def queue_prompt(self, workflow: dict) -> str:
+        return self.local.queue_prompt(workflow)
+
+    async def history(self, prompt_id: str):
+        return self.local.history(prompt_id)
+
+    async def queue_state(self) -> dict:
+        return self.local.queue_state()
+
+    async def delete_queued(self, prompt_ids: list):
+        self.local.engine.delete(prompt_ids)
+
+    async def interrupt(self):
+        self.local.engine.interrupt()
+
+    async def stream_image(self, img_info: dict, sink) -> int:
+        return self.local.stream_image(img_info, sink)
+
+    @property
+    def connected(self) -> bool:
+        return self._tracking
+
+    async def start_tracking(self) -> bool:
+        loop = asyncio.get_running_loop()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                pass  # loop already closed; nobody is waiting
+
+        self.tracker.on_message = wake
+        self._tracking = True
+        return True
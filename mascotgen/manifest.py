@@ -0,0 +1,253 @@
+"""
+Declarative asset manifests and make-style build state.
+
+A manifest is a TOML file listing each asset's prompt, seed, render size
+and output sizes (see manifests/*.toml). Paths in it are relative to the
+manifest file. `{var}` in a prompt expands to the matching [vars] entry.
+`url` names the ComfyUI server, or `urls` a list of them to fan out over.
+An optional [atlas] table packs the small outputs into sprite atlases
+(see mascotgen.atlas), [combos] describes combinatorial variants
+(see mascotgen.combos), [qa] what every render must pass before it's
+resized (see mascotgen.qa) and [crop] how outputs are cut to the subject
+with the background keyed out (see mascotgen.imaging.crop_subject). An
+asset's inline `qa = {...}` or `crop = {...}` overrides single keys of
+the table, and `qa = false` / `crop = false` turns it off for that asset.
+With a [plan] table, an asset without its own gen_size renders at the
+smallest size its outputs need (see mascotgen.plan). `variant = I`
+renders candidate I of the seed's sweep; `--variants N --pick I NAME`
+writes it (see record_pick).
+
+BuildState remembers, per output file, a hash of everything that
+determines its pixels (the render's workflow key, the output size and
+the resize options). An output is stale when that hash changed or the
+file is missing, so editing one seed rebuilds one asset and adding a size
+only re-runs the resize step (the render itself comes from the cache).
+The state lives next to the manifest (`<name>.state.json`, or `state`)
+and is committed with the outputs, so `--check` on a fresh checkout
+passes until someone edits the manifest. An asset with `external = true`
+writes into another checkout (the app logo); --check skips it when that
+directory isn't there.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from .atlas import AtlasSpec
+from .cache import workflow_key
+from .combos import ComboSpec
+from .imaging import CropSpec
+from .jobs import RenderJob
+from .plan import RenderPlan, plan
+from .qa import QASpec
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+
+@dataclass
+class Manifest:
+    path: Path
+    jobs: list
+    urls: list
+    cache_dir: Path
+    sweep_dir: Path
+    atlas: AtlasSpec = None
+    combos: ComboSpec = None
+    state_path: Path = None  # BuildState file, tracked next to the manifest
+    external: frozenset = frozenset()  # assets whose output_dir belongs to another checkout
+
+
+def load_manifest(path) -> Manifest:
+    path = Path(path)
+    with path.open("rb") as f:
+        data = tomllib.load(f)
+    base = path.parent
+    variables = data.get("vars", {})
+    defaults = data.get("defaults", {})
+
+    def expand_vars(prompt: str) -> str:
+        for key, value in variables.items():
+            prompt = prompt.replace("{" + key + "}", value)
+        return prompt
+
+    def table_spec(cls, table: str, override=None):
+        if override is False or (override is None and table not in data):
+            return None
+        return cls.from_table({**data.get(table, {}), **(override or {})})
+
+    planner = RenderPlan.from_table(data["plan"]) if "plan" in data else None
+
+    def render_size(spec: dict, sizes: dict, crop) -> tuple:
+        """(gen_size, upscale_model): pinned by the asset, planned, or the old fixed 512."""
+        if "gen_size" in spec or planner is None:
+            return spec.get("gen_size", 512), None
+        return plan(planner, sizes, crop)
+
+    jobs = []
+    external = set()
+    for name, spec in data.get("assets", {}).items():
+        spec = {**defaults, **spec}
+        if spec.get("external"):
+            external.add(name)
+        prompt = expand_vars(spec["prompt"])
+        sizes = {fname: size if isinstance(size, int) else tuple(size)
+                 for fname, size in spec["sizes"].items()}
+        crop = table_spec(CropSpec, "crop", spec.get("crop"))
+        gen_size, upscale_model = render_size(spec, sizes, crop)
+        jobs.append(RenderJob(
+            name=name,
+            prompt=prompt,
+            seed=spec["seed"],
+            output_dir=(base / spec["output_dir"]).resolve(),
+            sizes=sizes,
+            gen_size=gen_size,
+            prefix=spec.get("prefix", "mascot"),
+            qa=table_spec(QASpec, "qa", spec.get("qa")),
+            crop=crop,
+            upscale_model=upscale_model,
+            variant=spec.get("variant"),
+        ))
+
+    atlas = None
+    if "atlas" in data:
+        spec = data["atlas"]
+        atlas = AtlasSpec(
+            name=spec.get("name", "atlas"),
+            max_size=spec.get("max_size", 128),
+            ts=(base / spec["ts"]).resolve() if "ts" in spec else None,
+            url=spec.get("url", ""),
+        )
+
+    combos = None
+    if "combos" in data:
+        spec = {**defaults, **data["combos"]}
+        sizes = {fname: size if isinstance(size, int) else tuple(size) for fname, size in spec["sizes"].items()}
+        crop = table_spec(CropSpec, "crop", spec.get("crop"))
+        gen_size, upscale_model = render_size(spec, sizes, crop)
+        combos = ComboSpec(
+            prompt=expand_vars(spec["prompt"]),
+            axes=spec["axes"],
+            output_dir=(base / spec["output_dir"]).resolve(),
+            sizes=sizes,
+            seed=spec.get("seed", 0),
+            name=spec.get("name"),
+            gen_size=gen_size,
+            prefix=spec.get("prefix", "combo"),
+            shard_chars=spec.get("shard_chars", 2),
+            qa=table_spec(QASpec, "qa", spec.get("qa")),
+            crop=crop,
+            upscale_model=upscale_model,
+        )
+
+    return Manifest(
+        path=path,
+        jobs=jobs,
+        urls=data.get("urls") or [data.get("url", "http://127.0.0.1:8188")],
+        cache_dir=(base / data.get("cache_dir", ".render-cache")).resolve(),
+        sweep_dir=(base / data.get("sweep_dir", "sweeps")).resolve(),
+        atlas=atlas,
+        combos=combos,
+        state_path=(base / data.get("state", f"{path.stem}.state.json")).resolve(),
+        external=frozenset(external),
+    )
+
+
+def relocate(manifest: Manifest, root: Path) -> Manifest:
+    """manifest with every path it writes moved under root, keeping their layout.
+
+    Paths are taken relative to the manifest's directory without leading
+    "..", so ../public/mascot becomes root/public/mascot.
+    """
+    base = manifest.path.resolve().parent
+
+    def moved(path):
+        if path is None:
+            return None
+        rel = Path(os.path.relpath(Path(path).resolve(), base))
+        return Path(root, *(part for part in rel.parts if part != ".."))
+
+    return dataclasses.replace(
+        manifest,
+        jobs=[dataclasses.replace(job, output_dir=moved(job.output_dir)) for job in manifest.jobs],
+        cache_dir=moved(manifest.cache_dir),
+        sweep_dir=moved(manifest.sweep_dir),
+        state_path=moved(manifest.state_path),
+        atlas=manifest.atlas and dataclasses.replace(manifest.atlas, ts=moved(manifest.atlas.ts)),
+        combos=manifest.combos and dataclasses.replace(manifest.combos, output_dir=moved(manifest.combos.output_dir)),
+    )
+
+
+def record_pick(path: Path, name: str, variant: int):
+    """Set `variant = <variant>` in [assets.<name>] of the manifest at path, leaving the rest as written.
+
+    The line goes after the asset's `seed` (or its header) unless it has one already.
+    """
+    path = Path(path)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    header = re.compile(rf"\[assets\.(?:{re.escape(name)}|\"{re.escape(name)}\")\]\s*(#.*)?$")
+    start = next((i for i, line in enumerate(lines) if header.match(line)), None)
+    if start is None:
+        raise ValueError(f"{path} has no [assets.{name}] table")
+    end = next((i for i in range(start + 1, len(lines)) if lines[i].startswith("[")), len(lines))
+    entry = f"variant = {variant}\n"
+    existing = next((i for i in range(start + 1, end) if re.match(r"variant\s*=", lines[i])), None)
+    if existing is not None:
+        lines[existing] = entry
+    else:
+        seed = next((i for i in range(start + 1, end) if re.match(r"seed\s*=", lines[i])), start)
+        lines.insert(seed + 1, entry)
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+class BuildState:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.outputs = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.outputs = {}  # output path, relative to the state file -> spec hash
+
+    def key(self, path: Path) -> str:
+        """How an output is named in the file: relative to it, so a fresh checkout of the repo matches."""
+        return Path(os.path.relpath(Path(path).resolve(), self.path.resolve().parent)).as_posix()
+
+    @staticmethod
+    def output_spec(job: RenderJob, fname: str, resize_opts: dict) -> str:
+        spec = {
+            "render": workflow_key(job.workflow()),
+            "size": job.sizes[fname],
+            "resize": resize_opts,
+        }
+        if job.crop is not None:
+            spec["crop"] = dataclasses.asdict(job.crop)
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def stale(self, job: RenderJob, resize_opts: dict):
+        """Return job narrowed to its stale outputs, or None if everything is up to date.
+
+        With resize_opts["formats"], an output whose .webp/.avif twin is missing is stale too.
+        """
+        sizes = {}
+        for fname, size in job.sizes.items():
+            path = Path(job.output_dir) / fname
+            files = [path] + [path.with_suffix(f".{fmt}") for fmt in resize_opts.get("formats", ())]
+            current = self.outputs.get(self.key(path)) == self.output_spec(job, fname, resize_opts)
+            if not current or not all(f.exists() for f in files):
+                sizes[fname] = size
+        if not sizes:
+            return None
+        return dataclasses.replace(job, sizes=sizes)
+
+    def mark(self, job: RenderJob, resize_opts: dict):
+        for fname in job.sizes:
+            self.outputs[self.key(Path(job.output_dir) / fname)] = self.output_spec(job, fname, resize_opts)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.outputs, indent=2, sort_keys=True) + "\n", encoding="utf-8")
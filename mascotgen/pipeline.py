@@ -0,0 +1,623 @@
+"""
+Render -> download -> resize/encode pipeline shared by both generators.
+
+A Pipeline owns the per-run knobs (client, render cache, encode process
+pool, resize options) so entry points only have to describe their jobs.
+
+Originals never sit in memory as encoded bytes: /view responses are
+streamed straight into their cache entry (or a scratch file when the
+cache is off) and the resize stage decodes from that path.
+
+Queued prompts are recorded in a Journal until their outputs are saved,
+and jobs re-attach to a prompt an interrupted run left on the server
+(see mascotgen.journal) instead of rendering it again.
+
+Originals are QA-checked before the resize stage, and a job whose render
+fails is re-rendered with re-rolled seeds (see mascotgen.qa). With a
+HashIndex, an original that's a near-duplicate of another asset's fails
+its job as well (see mascotgen.dedupe).
+
+Submissions wait for room in the server's queue, and renders time out
+after what the renders so far suggest rather than a flat limit (see
+mascotgen.policy).
+
+What a job goes through with the server (resuming, admission, queueing,
+the warm-up, rendering and the QA re-roll) is written as steps (see
+mascotgen.steps): the methods here drive them with the threaded client
+and mascotgen.aio drives the same ones on its event loop.
+"""
+import shutil
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .cache import RenderCache, workflow_key
+from .client import ComfyClient
+from .dedupe import Duplicate, HashIndex, asset_id, image_hashes, outputs_key
+from .imaging import write_sizes
+from .jobs import WARMUP_SIZE, RenderJob, warmup_workflow
+from .journal import Journal, resumable
+from .policy import CircuitOpen, Policy, RenderTimes, jitter, queue_depth
+from .qa import QAFailed, check, reroll
+from .steps import SLEEP, drive
+from .timing import Stages
+from .tracker import PromptFailed
+
+
+def _resize(source, output_dir, sizes, opts):
+    """write_sizes plus its (start, end) so pooled encodes can be timed too."""
+    start = time.time()
+    written = write_sizes(source, output_dir, sizes, **opts)
+    return start, time.time(), written
+
+
+def _status_times(entry: dict) -> tuple:
+    """(execution_start, execution end) in seconds from a history entry's status messages, or Nones."""
+    started = ended = None
+    for msg_type, data in (entry.get("status") or {}).get("messages") or []:
+        stamp = data.get("timestamp") if isinstance(data, dict) else None
+        if stamp is None:
+            continue
+        if msg_type == "execution_start":
+            started = stamp / 1000
+        elif msg_type in ("execution_success", "execution_error", "execution_interrupted"):
+            ended = stamp / 1000
+    return started, ended
+
+
+class Pipeline:
+    def __init__(self, client: ComfyClient, cache: RenderCache = None, force: bool = False,
+                 pool=None, resize_opts: dict = None, policy: Policy = None, stages: Stages = None,
+                 journal: Journal = None, dedupe: HashIndex = None, times: RenderTimes = None):
+        self.client = client
+        self.cache = cache
+        self.force = force
+        self.pool = pool                      # ProcessPoolExecutor for write_sizes, or None
+        self.resize_opts = resize_opts or {}  # write_sizes kwargs: progressive, encode, formats, threshold
+        self.policy = policy or Policy()      # backpressure and render timeouts (and the clients' retries)
+        self.times = times or RenderTimes(self.policy)  # seconds per image so far, shared like stages
+        self.stages = stages or Stages()      # per-stage timings, shared across with_client copies
+        self.journal = journal or Journal()   # prompts in flight, for resuming after a crash
+        self.dedupe = dedupe                  # perceptual hashes of kept originals, or None to keep everything
+        self._scratch = None
+
+    def with_client(self, client: ComfyClient) -> "Pipeline":
+        """Same cache/pool/options, different ComfyUI server."""
+        return Pipeline(client, cache=self.cache, force=self.force, pool=self.pool,
+                        resize_opts=self.resize_opts, policy=self.policy, stages=self.stages,
+                        journal=self.journal, dedupe=self.dedupe, times=self.times)
+
+    # ----- stages -----
+
+    def cached(self, key: str):
+        """Path of the cached original for key, or None (always None with force)."""
+        if self.cache is None or self.force:
+            return None
+        return self.cache.get_path(key)
+
+    def download(self, result: dict, keys: list, job: RenderJob) -> list:
+        """Stream a finished prompt's images to disk under keys. Returns their paths."""
+        paths = []
+        for img_info, key in zip(self.client.output_images(result), keys):
+            start = time.time()
+            with self.sink(key) as f:
+                nbytes = self.client.stream_image(img_info, f)
+            paths.append(self.stored(key, job, img_info, start, nbytes))
+        return paths
+
+    @contextmanager
+    def sink(self, key: str):
+        """Binary file a downloaded original for key is written to: its cache entry, else a scratch file."""
+        if self.cache is not None:
+            with self.cache.writer(key) as f:
+                yield f
+            return
+        if self._scratch is None:
+            self._scratch = Path(tempfile.mkdtemp(prefix="mascotgen-"))
+        with (self._scratch / f"{key}.png").open("wb") as f:
+            yield f
+
+    def stored(self, key: str, job: RenderJob, img_info: dict, start: float, nbytes: int) -> Path:
+        """Record a finished sink() download and return where it landed."""
+        self.stages.add("download", start, time.time(), nbytes, job=job.name, file=img_info["filename"])
+        print(f"  Downloaded: {img_info['filename']} ({nbytes//1024}KB)")
+        if self.cache is not None:
+            return self.cache.get_path(key)
+        return self._scratch / f"{key}.png"
+
+    def release(self, path: Path):
+        """Delete a downloaded original once it's been resized, unless the cache owns it."""
+        if self._scratch is not None and Path(path).parent == self._scratch:
+            Path(path).unlink(missing_ok=True)
+
+    def admit(self, client: ComfyClient = None, wait: bool = True):
+        """Wait until the server's queue is below policy.max_queue. Returns the prompts queued there.
+
+        0 if there's no limit or /queue can't be read (the submit's own
+        retries deal with a server that's down). With wait=False, a full
+        queue returns None at once instead.
+        """
+        return drive(self.admitting(client or self.client, wait))
+
+    def admitting(self, client, wait: bool = True):
+        """Step (see mascotgen.steps) of admit(): one caller per client polls a full queue, the rest wait behind it."""
+        if not self.policy.max_queue:
+            return 0
+        yield client.admission.acquire,
+        try:
+            delay = self.policy.backoff
+            waited = False
+            while True:
+                try:
+                    depth = queue_depth((yield client.queue_state,))
+                except (OSError, ValueError):
+                    return 0
+                if depth < self.policy.max_queue:
+                    return depth
+                if not wait:
+                    return None
+                if not waited:
+                    print(f"  Backpressure: {depth} prompts queued on {client.base_url}; waiting for room")
+                    waited = True
+                yield SLEEP, jitter(delay)
+                delay = min(delay * 2, self.policy.backoff_max)
+        finally:
+            client.admission.release()
+
+    def queue(self, job: RenderJob, workflow: dict, client: ComfyClient = None) -> str:
+        """POST workflow to ComfyUI (this pipeline's client by default), journal it and return its prompt_id."""
+        return drive(self.queueing(job, workflow, client or self.client))
+
+    def queueing(self, job: RenderJob, workflow: dict, client):
+        """Step of queue()."""
+        with self.stages.time("queue", job=job.name):
+            prompt_id = yield client.queue_prompt, workflow
+        self.journal.queued(job.name, workflow_key(workflow), client.base_url, prompt_id)
+        return prompt_id
+
+    def resume(self, job: RenderJob, key: str):
+        """Re-attach to the prompt an earlier run left for job on this server.
+
+        Returns (prompt_id, history entry), with entry None while the prompt
+        is still queued or running, or None if there's nothing to resume.
+        """
+        return drive(self.resuming(job, key, self.client))
+
+    def resuming(self, job: RenderJob, key: str, client):
+        """Step of resume() on client."""
+        prompt_id = self.journal.prompt_for(job.name, key, client.base_url)
+        if prompt_id is None:
+            return None
+        try:
+            state = yield client.queue_state,
+            entry = yield client.history, prompt_id
+        except (OSError, ValueError):
+            return None
+        if not resumable(prompt_id, state, entry):
+            self.journal.forget(job.name)
+            return None
+        print(f"  Resumed: {job.name} -> {prompt_id} ({'finished' if entry else 'still queued'})")
+        return prompt_id, entry
+
+    def submitting(self, job: RenderJob, workflow: dict, client, ours: int = 0, wait: bool = True):
+        """Step: resume job's prompt on client, or admit and queue it afresh.
+
+        Returns (prompt_id, entry, ahead): entry is the history entry of a
+        resumed prompt that already finished, else None, and ahead is how
+        many prompts it waits behind, for its timeout: ours (those of this
+        run in flight there), or the server's queue if admission saw more.
+        None with wait=False if the server's queue is full.
+        """
+        resumed = yield from self.resuming(job, workflow_key(workflow), client)
+        if resumed is not None:
+            return (*resumed, ours)
+        depth = yield from self.admitting(client, wait)
+        if depth is None:
+            return None
+        prompt_id = yield from self.queueing(job, workflow, client)
+        print(f"  Queued: {job.name} -> {prompt_id}")
+        return prompt_id, None, max(depth, ours)
+
+    def rendered(self, job: RenderJob, prompt_id: str, queued_at: float, entry: dict):
+        """Record a finished prompt's render, split into gpu_wait/execute when ComfyUI says when it ran."""
+        done = time.time()
+        self.journal.rendered(job.name)
+        self.stages.add("render", queued_at, done, job=job.name, prompt_id=prompt_id)
+        started, ended = _status_times(entry)
+        if started is None:
+            return
+        # Server clock: clamp into what we saw locally.
+        started = min(max(started, queued_at), done)
+        ended = min(max(ended or done, started), done)
+        self.stages.add("gpu_wait", queued_at, started, job=job.name, prompt_id=prompt_id)
+        self.stages.add("execute", started, ended, job=job.name, prompt_id=prompt_id)
+        self.times.observe(ended - started, len(ComfyClient.output_images(entry)))
+
+    def warm_up(self, jobs: list) -> bool:
+        """Load the models with a tiny render before the batch so no real job pays for it.
+
+        The warm-up graph is the first uncached job's with a 64px latent and
+        no saved output, so ComfyUI keeps exactly the loader and negative
+        encode outputs the real graphs reuse. Skipped when every job is a
+        cache hit; a failure is reported but not fatal. Returns whether a
+        warm-up ran.
+        """
+        return drive(self.warming(jobs, self.client))
+
+    def warming(self, jobs: list, client):
+        """Step of warm_up() on client."""
+        todo = [job for job in jobs if self.cached(workflow_key(job.workflow())) is None]
+        if not todo:
+            return False
+        print(f"\nWarm-up: loading models on {client.base_url} ({WARMUP_SIZE}px)")
+        try:
+            client.tracker  # subscribed before queueing: a warm-up can finish in milliseconds
+            with self.stages.time("queue", job="warm-up"):
+                prompt_id = yield client.queue_prompt, warmup_workflow(todo[0].workflow())
+            queued_at = time.time()
+            yield client.wait, prompt_id, self.policy.timeout  # model loading: nothing to adapt from
+        except Exception as e:
+            print(f"  Warm-up failed: {e}")
+            return False
+        done = time.time()
+        self.stages.add("warmup", queued_at, done, job="warm-up", prompt_id=prompt_id, server=client.base_url)
+        print(f"  Models loaded ({done - queued_at:.1f}s)")
+        return True
+
+    def render(self, job: RenderJob):
+        """Return the path of the job's original render, from the cache or from ComfyUI (None if it has no image)."""
+        return drive(self.rendering(job, self.client))
+
+    def rendering(self, job: RenderJob, client, ours: dict = None):
+        """Step of render() on client.
+
+        ours maps the run's prompts in flight on client to their jobs; the
+        job's prompt is in it while it's awaited, and stays there if the
+        step is closed (cancelled) meanwhile, for cancelling on the server.
+        """
+        ours = {} if ours is None else ours
+        workflow = job.workflow()
+        key = workflow_key(workflow)
+        cached = self.cached(key)
+        if cached is not None:
+            print(f"  Cache hit: {job.name} ({key[:12]})")
+            return cached
+        prompt_id, entry, ahead = yield from self.submitting(job, workflow, client, len(ours))
+        queued_at = time.time()
+        if entry is None:
+            ours[prompt_id] = job
+            try:
+                entry = yield client.wait, prompt_id, self.times.timeout(ahead)
+            except Exception as e:
+                ours.pop(prompt_id, None)
+                if isinstance(e, PromptFailed):
+                    self.journal.forget(job.name)
+                raise
+            ours.pop(prompt_id, None)
+        self.rendered(job, prompt_id, queued_at, entry)
+        print(f"  Completed: {job.name}")
+        images = client.output_images(entry)
+        if not images:
+            return None
+        start = time.time()
+        with self.sink(key) as f:
+            nbytes = yield client.stream_image, images[0], f
+        return self.stored(key, job, images[0], start, nbytes)
+
+    def inspect(self, job: RenderJob, source: Path):
+        """QA-check the original at source against job.qa; on failure, release it and raise QAFailed."""
+        if job.qa is None:
+            return
+        start = time.time()
+        try:
+            metrics = check(job, source)
+        except QAFailed as e:
+            self.stages.add("qa", start, time.time(), job=job.name, seed=job.seed, failed="; ".join(e.failures))
+            print(f"  QA failed: {job.name} (seed {job.seed}): {'; '.join(e.failures)}")
+            self.journal.forget(job.name)  # a rejected render isn't worth resuming
+            self.release(source)
+            raise
+        self.stages.add("qa", start, time.time(), job=job.name, seed=job.seed, **metrics)
+
+    def duplicate(self, job: RenderJob, source: Path):
+        """(kept asset, distance) if the original at source is a near-duplicate not worth saving, else None."""
+        if self.dedupe is None:
+            return None
+        start = time.time()
+        have_files = all((Path(job.output_dir) / fname).exists() for fname in job.sizes)
+        match = self.dedupe.check(asset_id(job), outputs_key(job.sizes, self.opts(job)), image_hashes(source),
+                                  have_files)
+        self.stages.add("dedupe", start, time.time(), job=job.name,
+                        **({} if match is None else {"duplicate_of": match[0], "distance": match[1]}))
+        return match
+
+    def opts(self, job: RenderJob) -> dict:
+        """write_sizes kwargs for job: the run's resize options plus the job's own crop."""
+        if job.crop is None:
+            return self.resize_opts
+        return {**self.resize_opts, "crop": job.crop}
+
+    def save(self, job: RenderJob, source: Path, wait: bool = True):
+        """Resize/encode the original at source to every size of job (in the process pool if any).
+
+        With wait=False and a pool, returns the Future instead of blocking.
+        The original is released (scratch files deleted) once it's encoded.
+        Raises QAFailed if the original fails job.qa (see checked_save). With
+        dedupe, a near-duplicate of another asset raises Duplicate and one
+        of the job's own current outputs writes nothing and returns no rows.
+        """
+        self.inspect(job, source)
+        match = self.duplicate(job, source)
+        if match is not None:
+            kept, distance = match
+            self.release(source)
+            self.journal.forget(job.name)
+            if kept != asset_id(job):
+                raise Duplicate(job, kept, distance)
+            print(f"  Unchanged: {job.name} (within {distance} bits of its current outputs)")
+            if wait or self.pool is None:
+                return []
+            future = Future()
+            future.set_result((time.time(), time.time(), []))
+            return future
+        if self.pool is None:
+            try:
+                return self._report(job, _resize(source, job.output_dir, job.sizes, self.opts(job)))
+            finally:
+                self.release(source)
+        future = self.pool.submit(_resize, source, job.output_dir, job.sizes, self.opts(job))
+        future.add_done_callback(lambda f: self.release(source))
+        return self._report(job, future.result()) if wait else future
+
+    def checked_save(self, job: RenderJob, source: Path) -> list:
+        """save(), re-rolling the seed if the render fails QA (see reroll)."""
+        try:
+            return self.save(job, source)
+        except QAFailed as e:
+            return self.reroll(e)
+
+    def reroll(self, failed: QAFailed) -> list:
+        """Re-render a job that failed QA with re-rolled seeds until one passes; returns its saved rows.
+
+        Raises the last QAFailed once job.qa.retries seeds have failed as well.
+        """
+        def attempt(job):
+            source = self.render(job)
+            return None if source is None else self.save(job, source)
+
+        return drive(self.rerolling(failed, attempt))
+
+    def rerolling(self, failed: QAFailed, attempt):
+        """Step of reroll(); attempt(job) renders and saves a re-rolled job and returns its rows, or None."""
+        job = failed.job
+        for n in range(1, job.qa.retries + 1):
+            retry = reroll(job, n)
+            print(f"  Re-rolling {job.name}: seed {retry.seed} ({n}/{job.qa.retries})")
+            try:
+                written = yield attempt, retry
+            except QAFailed as e:
+                failed = e
+                continue
+            if written is None:
+                continue
+            print(f"  QA passed: {job.name} with seed {retry.seed} (set seed = {retry.seed} to keep it)")
+            return written
+        raise failed
+
+    def _report(self, job: RenderJob, timed: tuple) -> list:
+        """Record a _resize result's timings, print its files and return them."""
+        start, end, written = timed
+        self.journal.forget(job.name)  # outputs are on disk; nothing left to resume
+        if not written:
+            return written
+        self.stages.add("resize", start, end, sum(row[3] for row in written), job=job.name)
+        # write_sizes goes largest first; lay the per-file intervals back out in that order.
+        t = start
+        for outpath, w, h, nbytes, seconds, quality in sorted(written, key=lambda row: -row[1] * row[2]):
+            self.stages.add("encode", t, t + seconds, nbytes, job=job.name, file=outpath.name, size=f"{w}x{h}",
+                            quality=quality)
+            t += seconds
+        for outpath, w, h, nbytes, seconds, quality in written:
+            print(f"  Saved: {outpath} ({w}x{h}, {nbytes//1024}KB{f', q{quality}' if quality else ''})")
+        return written
+
+    @staticmethod
+    def header(job: RenderJob, title: str = "Generating"):
+        print(f"\n{'='*50}")
+        print(f"{title}: {job.name}")
+        print(f"Seed: {job.seed}")
+        print(f"Render: {job.gen_size}px" + (f" -> {job.upscale_model}" if job.upscale_model else ""))
+        print(f"Prompt: {job.prompt[:80]}...")
+        print(f"{'='*50}")
+
+    # ----- runs -----
+
+    def run(self, jobs: list) -> dict:
+        """Render jobs one at a time. With a pool, encoding overlaps the next render.
+
+        Returns {name: success}.
+        """
+        results = {}
+        encoding = {}  # name -> (job, future)
+        for job in jobs:
+            self.header(job)
+            try:
+                source = self.render(job)
+                if source is None:
+                    results[job.name] = False
+                    continue
+                if self.pool is None:
+                    self.save(job, source)
+                    results[job.name] = True
+                else:
+                    encoding[job.name] = (job, self.save(job, source, wait=False))
+            except QAFailed as e:
+                try:
+                    self.reroll(e)
+                    results[job.name] = True
+                except Exception as e:
+                    print(f"  ERROR: {e}")
+                    results[job.name] = False
+            except Exception as e:
+                print(f"  ERROR: {e}")
+                results[job.name] = False
+
+        for name, (job, future) in encoding.items():
+            try:
+                print(f"\n{name}:")
+                self._report(job, future.result())
+                results[name] = True
+            except Exception as e:
+                print(f"  ERROR encoding {name}: {e}")
+                results[name] = False
+        return results
+
+    def run_pipelined(self, jobs: list, max_in_flight: int = 0, workers: int = 2) -> dict:
+        """Keep the GPU busy while finished renders are downloaded and resized.
+
+        Up to max_in_flight prompts (0 = all of them) sit in the ComfyUI
+        queue at once, and none are added while it holds policy.max_queue;
+        each completion is handed to a thread pool for download/resize so
+        the next render starts immediately. Cache hits go straight to the
+        thread pool. Returns {name: success}.
+        """
+        pending = deque(jobs)
+        in_flight = {}  # prompt_id -> (job, queued_at, cache_key)
+        deadlines = {}  # prompt_id -> when to give up on it
+        futures = {}
+        results = {}
+        tracker = self.client.tracker
+
+        def finish(job, result, key):
+            paths = self.download(result, [key], job)
+            if not paths:
+                return False
+            self.checked_save(job, paths[0])
+            return True
+
+        def save_cached(job, source):
+            self.checked_save(job, source)
+            return True
+
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            while pending or in_flight:
+                while pending and (max_in_flight <= 0 or len(in_flight) < max_in_flight):
+                    job = pending.popleft()
+                    workflow = job.workflow()
+                    key = workflow_key(workflow)
+                    cached = self.cached(key)
+                    if cached is not None:
+                        print(f"  Cache hit: {job.name} ({key[:12]})")
+                        futures[job.name] = threads.submit(save_cached, job, cached)
+                        continue
+                    try:
+                        placed = drive(self.submitting(job, workflow, self.client, len(in_flight), wait=not in_flight))
+                    except Exception as e:
+                        print(f"  ERROR queueing {job.name}: {e}")
+                        results[job.name] = False
+                        continue
+                    if placed is None:
+                        pending.appendleft(job)  # server full: collect finished renders first
+                        break
+                    prompt_id, entry, ahead = placed
+                    if entry is not None:  # resumed, and already finished
+                        self.rendered(job, prompt_id, time.time(), entry)
+                        futures[job.name] = threads.submit(finish, job, entry, key)
+                        continue
+                    in_flight[prompt_id] = (job, time.time(), key)
+                    deadlines[prompt_id] = time.time() + self.times.timeout(ahead)
+
+                if not in_flight:
+                    continue
+                now = time.time()
+                expired = [pid for pid in in_flight if now > deadlines[pid]]
+                for prompt_id in expired:
+                    job, queued_at, _ = in_flight.pop(prompt_id)
+                    print(f"  ERROR: {job.name} ({prompt_id}) did not complete within "
+                          f"{deadlines.pop(prompt_id) - queued_at:.0f}s")
+                    results[job.name] = False
+                if not in_flight:
+                    continue
+
+                try:
+                    prompt_id, entry = tracker.wait_any(in_flight, timeout=max(0, min(deadlines.values()) - now))
+                except TimeoutError:
+                    continue
+                except CircuitOpen as e:
+                    # The server is down: give up on what's queued there (the journal keeps it for a resume).
+                    for job, _, _ in in_flight.values():
+                        print(f"  ERROR: {job.name}: {e}")
+                        results[job.name] = False
+                    in_flight.clear()
+                    deadlines.clear()
+                    continue
+                except PromptFailed as e:
+                    job, _, _ = in_flight.pop(e.prompt_id)
+                    deadlines.pop(e.prompt_id)
+                    self.journal.forget(job.name)
+                    print(f"  ERROR: {job.name}: {e}")
+                    results[job.name] = False
+                    continue
+                job, queued_at, key = in_flight.pop(prompt_id)
+                deadlines.pop(prompt_id)
+                self.rendered(job, prompt_id, queued_at, entry)
+                print(f"  Completed: {job.name}")
+                futures[job.name] = threads.submit(finish, job, entry, key)
+
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"  ERROR saving {name}: {e}")
+                    results[name] = False
+
+        return results
+
+    def sweep(self, job: RenderJob, variants: int) -> list:
+        """Render `variants` candidates in one batched latent and return their paths.
+
+        The whole batch shares one text-encoding pass and one sampler launch.
+        Each image is cached under "<workflow key>-<index>" so a later pick
+        can reuse it without re-rendering.
+        """
+        self.header(job, f"Sweeping ({variants} variants)")
+        workflow = job.workflow(batch_size=variants)
+        keys = [f"{workflow_key(workflow)}-{i}" for i in range(variants)]
+        cached = [self.cached(key) for key in keys]
+        if all(path is not None for path in cached):
+            print(f"  Cache hit: {keys[0][:12]} (x{variants})")
+            return cached
+
+        ahead = self.admit()
+        prompt_id = self.queue(job, workflow)
+        queued_at = time.time()
+        print(f"  Queued: {prompt_id}")
+        result = self.client.wait(prompt_id, self.times.timeout(ahead, images=variants))
+        self.rendered(job, prompt_id, queued_at, result)
+        print("  Completed!")
+        return self.download(result, keys, job)
+
+    def write_sweep(self, job: RenderJob, paths: list, sweep_dir: Path):
+        """Copy candidates to sweep_dir as <name>-v<i>.png, noting which fail QA.
+
+        With dedupe, lookalikes of an earlier candidate are left out.
+        """
+        sweep_dir.mkdir(parents=True, exist_ok=True)
+        seen = None if self.dedupe is None else HashIndex(threshold=self.dedupe.threshold)
+        written = 0
+        for i, path in enumerate(paths):
+            match = None if seen is None else seen.check(f"{job.name}-v{i}", "", image_hashes(path), False)
+            if match is not None:
+                print(f"  Duplicate: v{i} is within {match[1]} bits of {match[0]}")
+            else:
+                shutil.copyfile(path, sweep_dir / f"{job.name}-v{i}.png")
+                written += 1
+                try:
+                    check(job, path)
+                except QAFailed as e:
+                    print(f"  v{i}: QA failed: {'; '.join(e.failures)}")
+            self.release(path)
+        print(f"  Wrote {written} candidates to {sweep_dir}")
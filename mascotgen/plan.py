@@ -0,0 +1,70 @@
+"""
+Render-size planning: the smallest render that covers an asset's outputs.
+
+Every asset used to render at the manifest's one gen_size (512 for
+name-chemi, 1024 for love-fortune) whatever it shipped at, so a 128px
+icon paid for up to 16x the latent pixels it needed. With a [plan] table
+each asset's gen_size is chosen from its largest output:
+
+    side = largest output side * oversample   (/ fill when it's cropped)
+
+rounded up to a multiple of `multiple` and kept within [min_size,
+max_size]. Flux latents are an eighth of the image in 2x2 patches, so
+any multiple of 16 is valid; 64 keeps to the sizes the model was mostly
+trained on. A cropped asset's outputs are cut from the subject alone,
+which spans about `fill` of the render's side, so it renders that much
+larger.
+
+With `upscale_model` set, an asset that needs more than `upscale_above`
+renders in two stages: the sampler runs at 1/`upscale_scale` of the side
+and ComfyUI's upscale model takes the decoded image the rest of the way,
+which costs a fraction of sampling the full size. Only the assets that
+need it (the 600px logo) take the second stage.
+
+An asset's own `gen_size` pins its render size and skips planning.
+
+    [plan]
+    oversample = 1.5
+    upscale_model = "RealESRGAN_x2.pth"
+"""
+import math
+from dataclasses import dataclass
+
+
+@dataclass
+class RenderPlan:
+    oversample: float = 1.5      # render pixels per output pixel along a side
+    fill: float = 0.7            # share of the render's side a cropped subject spans
+    multiple: int = 64           # render sides are rounded up to a multiple of this
+    min_size: int = 256          # below this the model loses the composition
+    max_size: int = 1024         # largest single-stage render
+    upscale_model: str = None    # ComfyUI upscale model for two-stage renders; None = single stage only
+    upscale_scale: int = 2       # the upscale model's factor
+    upscale_above: int = 768     # sides needing more than this render in two stages (with upscale_model)
+
+    @classmethod
+    def from_table(cls, table: dict) -> "RenderPlan":
+        return cls(**table)
+
+
+def largest(sizes: dict) -> int:
+    """Longest side among sizes' values (int for square, or (width, height))."""
+    return max(size if isinstance(size, int) else max(size) for size in sizes.values())
+
+
+def plan(spec: RenderPlan, sizes: dict, crop=None) -> tuple:
+    """(gen_size, upscale_model) for an asset writing sizes, cut to the subject when crop is set.
+
+    upscale_model is None for a single-stage render.
+    """
+    need = largest(sizes) * spec.oversample
+    if crop is not None:
+        need /= spec.fill
+
+    def side(px: float) -> int:
+        snapped = math.ceil(px / spec.multiple) * spec.multiple
+        return min(max(snapped, spec.min_size), spec.max_size)
+
+    if spec.upscale_model and need > spec.upscale_above:
+        return side(need / spec.upscale_scale), spec.upscale_model
+    return side(need), None
@@ -0,0 +1,216 @@
+"""
+Retry, timeout and backpressure policy for talking to ComfyUI.
+
+Every HTTP call made by ComfyClient and AsyncComfyClient goes through a
+Retry: a transient failure (a connection reset or refusal, a socket
+timeout, HTTP 5xx or 429) is retried after a jittered exponential
+backoff, up to `retries` more times and never past the deadline of the
+call's stage:
+
+    submit     POST /prompt
+    download   GET /view
+    api        everything else (/history, /queue, /system_stats, ...)
+
+A 4xx (an invalid graph, a missing model) is the server answering, and
+fails at once. POST /prompt isn't idempotent, so it's only retried when
+it certainly wasn't accepted (connection refused, 429 or 503); a reset
+mid-submit could otherwise queue the same render twice.
+
+Each client has a CircuitBreaker: after `breaker_failures` failed
+attempts in a row its server is given `breaker_cooldown` seconds of
+quiet, and calls made meanwhile wait for the cooldown if their deadline
+allows, else fail with CircuitOpen (as does the call that opened it, so
+a /history poll gives up instead of waiting out the render timeout).
+
+Submissions pause while the server's /queue holds `max_queue` prompts
+(ours or anyone's), so a busy server isn't buried (see Pipeline.admit).
+
+How long a render may take comes from RenderTimes: until a few renders
+have been timed it's the flat `timeout`; after that it's `timeout_factor`
+times the slow end (90th percentile) of the observed seconds per image,
+for the image itself and each prompt queued ahead of it, within
+[min_timeout, max_timeout].
+"""
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# Per-stage deadline of one call, retries included, in seconds.
+DEADLINES = {"submit": 60, "download": 120, "api": 30}
+
+MIN_SAMPLES = 3  # renders timed before timeouts adapt
+
+
+@dataclass
+class Policy:
+    retries: int = 3               # extra attempts after a transient failure
+    backoff: float = 0.5           # first retry delay, doubling per attempt (jittered)
+    backoff_max: float = 8.0
+    deadlines: dict = field(default_factory=lambda: dict(DEADLINES))
+    breaker_failures: int = 5      # failed attempts in a row that open the circuit (0 = never)
+    breaker_cooldown: float = 15.0
+    max_queue: int = 8             # pause submitting while the server's queue holds this many (0 = never)
+    timeout: float = 300           # render timeout before there are timings to adapt from
+    timeout_factor: float = 4.0
+    min_timeout: float = 30
+    max_timeout: float = 1800
+
+    def deadline(self, stage: str) -> float:
+        return self.deadlines.get(stage, DEADLINES["api"])
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before retry number attempt (1-based)."""
+        return jitter(min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+
+def jitter(delay: float) -> float:
+    """delay spread over its upper half, so clients that failed together don't retry together."""
+    return random.uniform(delay / 2, delay)
+
+
+def queue_depth(state: dict) -> int:
+    """Prompts running or pending in a /queue response."""
+    return len(state.get("queue_running", [])) + len(state.get("queue_pending", []))
+
+
+def transient(exc: BaseException) -> bool:
+    """Whether a failed call is worth retrying: the network or an overloaded server, not a rejected request."""
+    if isinstance(exc, CircuitOpen):
+        return False
+    status = getattr(exc, "status", None)  # ComfyError: the server answered with an HTTP error
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(exc, OSError)  # resets, refusals, socket and asyncio timeouts
+
+
+def unreachable(exc: BaseException) -> bool:
+    """Whether a call failed because the server can't be reached (not an HTTP error or a local disk error)."""
+    return isinstance(exc, (ConnectionError, TimeoutError, CircuitOpen))
+
+
+def unsent(exc: BaseException) -> bool:
+    """Whether a failed call certainly never reached the server's handler (safe to resend a submit)."""
+    return isinstance(exc, ConnectionRefusedError) or getattr(exc, "status", None) in (429, 503)
+
+
+class CircuitOpen(OSError):
+    """A server failed too often in a row and is being left alone for its cooldown."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.streak = 0        # failed attempts in a row
+        self.open_until = 0.0
+
+    def wait_time(self) -> float:
+        """Seconds until calls may go through again (0 while closed or half-open)."""
+        return max(0.0, self.open_until - time.time())
+
+    def success(self):
+        with self.lock:
+            self.streak = 0
+
+    def failure(self) -> bool:
+        """Record a failed attempt. Returns True if it opened a closed (or half-open) circuit."""
+        with self.lock:
+            self.streak += 1
+            if not self.failures or self.streak < self.failures:
+                return False
+            # Half-open after the cooldown: one more failure re-opens it straight away.
+            now = time.time()
+            opened = self.open_until <= now
+            self.open_until = now + self.cooldown
+            return opened
+
+
+class Retry:
+    """One call's attempts: its stage deadline, retry count and the client's breaker.
+
+    Drive it with
+
+        while True:
+            sleep(retry.gate())
+            try:
+                result = attempt(timeout=retry.remaining())
+            except Exception as e:
+                delay = retry.failed(e)  # may raise CircuitOpen
+                if delay is None:
+                    raise
+                sleep(delay)
+                continue
+            retry.succeeded()
+            return result
+    """
+
+    def __init__(self, policy: Policy, breaker: CircuitBreaker, stage: str, what: str, server: str = ""):
+        self.policy = policy
+        self.breaker = breaker
+        self.stage = stage
+        self.what = what
+        self.server = server
+        self.deadline = time.time() + policy.deadline(stage)
+        self.attempt = 0
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def gate(self) -> float:
+        """Seconds to wait before the next attempt for an open circuit; raises CircuitOpen past the deadline."""
+        wait = self.breaker.wait_time()
+        if not wait:
+            return 0.0
+        wait += jitter(1.0)  # don't all come back in the same instant
+        if wait >= self.remaining():
+            raise CircuitOpen(f"{self.what}: {self.server} is cooling down after repeated failures")
+        return wait
+
+    def failed(self, exc: BaseException):
+        """Record exc. Returns the delay before retrying, or None if the call should give up (re-raise).
+
+        Raises CircuitOpen if exc opened the circuit: pollers stop waiting on a server that's down.
+        """
+        if not transient(exc):
+            if getattr(exc, "status", None) is not None:
+                self.breaker.success()  # the server answered
+            return None
+        if self.breaker.failure():
+            print(f"  Circuit open: {self.server} failing ({exc}); pausing calls for {self.breaker.cooldown:.0f}s")
+            raise CircuitOpen(f"{self.what}: {self.server} failed {self.breaker.failures} times in a row") from exc
+        self.attempt += 1
+        if self.attempt > self.policy.retries or (self.stage == "submit" and not unsent(exc)):
+            return None
+        delay = self.policy.delay(self.attempt)
+        if delay >= self.remaining():
+            return None
+        return delay
+
+    def succeeded(self):
+        self.breaker.success()
+
+
+class RenderTimes:
+    """Recent seconds-per-image of finished renders, and the render timeouts they imply."""
+
+    def __init__(self, policy: Policy, window: int = 50):
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds: float, images: int = 1):
+        with self.lock:
+            self.samples.append(seconds / max(1, images))
+
+    def timeout(self, ahead: int = 0, images: int = 1) -> float:
+        """How long to wait for a prompt of `images` images with `ahead` prompts queued before it."""
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < MIN_SAMPLES:
+            return self.policy.timeout
+        slow = samples[int(0.9 * (len(samples) - 1))]
+        budget = self.policy.timeout_factor * slow * (images + ahead)
+        return min(max(budget, self.policy.min_timeout), self.policy.max_timeout)
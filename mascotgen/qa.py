@@ -0,0 +1,152 @@
+"""
+QA gate for rendered originals, run before anything is resized.
+
+The prompts ask for a solid background, a centred composition and (for
+name-chemi) the brand colour; nothing made sure a render complied before
+it was resized into every size and handed to a human to review. Each
+original is now measured with NumPy on a <=256px thumbnail:
+
+    border   share of the outer band (`border` of the side) that is the
+             expected background, within `tolerance` per channel
+    offset   distance of the subject's bounding-box centre from the
+             image centre, as a fraction of the side (the subject is
+             every pixel that isn't background)
+    brand    share of the subject's saturated pixels whose hue is within
+             `hue_tolerance` degrees of the brand colour's
+
+A render outside any limit raises QAFailed, and the runners re-render
+the job with a re-rolled seed, up to `retries` times (see
+Pipeline.reroll). The seed in the manifest is left alone; the one that
+passed is printed so it can be pinned.
+
+Configured by a [qa] table in the manifest, overridable per asset with
+an inline `qa = { ... }` (or `qa = false` to skip an asset):
+
+    [qa]
+    background = "#FFFFFF"
+    brand = "#FF7043"
+    retries = 2
+"""
+import colorsys
+import dataclasses
+import hashlib
+from dataclasses import dataclass
+
+from .imaging import parse_color
+
+THUMBNAIL = 256
+
+
+@dataclass
+class QASpec:
+    background: tuple = None   # expected background RGB; None = the border's median colour
+    border: float = 0.04       # width of the border band, fraction of the side
+    tolerance: int = 40        # max per-channel difference for a pixel to count as background
+    min_border: float = 0.9    # min share of the border band that is background
+    max_offset: float = 0.12   # max subject-centre offset, fraction of the side
+    brand: tuple = None        # RGB whose hue the subject must show; None = don't check
+    hue_tolerance: float = 15  # degrees
+    min_brand: float = 0.03    # min share of the subject's saturated pixels in the brand hue
+    retries: int = 2           # re-rolled seeds to try after a failure
+
+    @classmethod
+    def from_table(cls, table: dict) -> "QASpec":
+        table = dict(table)
+        for key in ("background", "brand"):
+            if table.get(key) is not None:
+                table[key] = parse_color(table[key])
+        return cls(**table)
+
+
+class QAFailed(RuntimeError):
+    """A render of job failed the QA gate."""
+
+    def __init__(self, job, failures: list, metrics: dict):
+        super().__init__(f"{job.name} (seed {job.seed}) failed QA: {'; '.join(failures)}")
+        self.job = job
+        self.failures = failures
+        self.metrics = metrics
+
+
+def reroll_seed(seed: int, attempt: int) -> int:
+    """The seed a job's attempt'th QA retry renders with (stable, so a rerun hits the render cache)."""
+    return int.from_bytes(hashlib.sha256(f"{seed}:qa:{attempt}".encode("utf-8")).digest()[:4], "big") & 0x7FFFFFFF
+
+
+def reroll(job, attempt: int):
+    return dataclasses.replace(job, seed=reroll_seed(job.seed, attempt))
+
+
+def _hue(rgb):
+    """Hue in degrees and saturation (0-1) of an (..., 3) float array in 0-1."""
+    import numpy as np
+    mx, mn = rgb.max(axis=-1), rgb.min(axis=-1)
+    delta = mx - mn
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    safe = np.where(delta == 0, 1, delta)
+    hue = np.select([mx == r, mx == g], [(g - b) / safe % 6, (b - r) / safe + 2], (r - g) / safe + 4) * 60
+    saturation = np.where(mx == 0, 0, delta / np.where(mx == 0, 1, mx))
+    return hue, saturation
+
+
+def measure(img, spec: QASpec) -> dict:
+    """border, offset, subject and brand (None when unchecked) of img under spec."""
+    import numpy as np
+    img = img.convert("RGB")
+    if max(img.size) > THUMBNAIL:
+        img = img.reduce(max(img.size) // THUMBNAIL)
+    px = np.asarray(img, dtype=np.int16)
+    h, w, _ = px.shape
+    band = max(1, round(spec.border * min(w, h)))
+    edge = np.ones((h, w), dtype=bool)
+    edge[band:h - band, band:w - band] = False
+
+    background = spec.background
+    if background is None:
+        background = np.median(px[edge], axis=0)
+    subject = np.abs(px - np.asarray(background, dtype=np.int16)).max(axis=-1) > spec.tolerance
+    metrics = {"border": float(1 - subject[edge].mean()), "subject": float(subject.mean()),
+               "offset": None, "brand": None}
+
+    # Bounding box of rows/columns that are at least 1% subject, so stray specks don't stretch it.
+    rows = np.flatnonzero(subject.mean(axis=1) >= 0.01)
+    cols = np.flatnonzero(subject.mean(axis=0) >= 0.01)
+    if rows.size and cols.size:
+        dy = (rows[0] + rows[-1] + 1) / 2 - h / 2
+        dx = (cols[0] + cols[-1] + 1) / 2 - w / 2
+        metrics["offset"] = float(max(abs(dx) / w, abs(dy) / h))
+
+    if spec.brand is not None and spec.min_brand > 0 and subject.any():
+        hue, saturation = _hue(px[subject] / 255.0)
+        vivid = saturation >= 0.35
+        target = colorsys.rgb_to_hsv(*(c / 255 for c in spec.brand))[0] * 360
+        near = np.abs((hue[vivid] - target + 180) % 360 - 180) <= spec.hue_tolerance
+        metrics["brand"] = float(near.mean()) if near.size else 0.0
+    return metrics
+
+
+def failures(metrics: dict, spec: QASpec) -> list:
+    """What's wrong with a render's measure()ments, as short phrases; empty if it passes."""
+    out = []
+    if metrics["border"] < spec.min_border:
+        out.append(f"border {metrics['border']:.0%} background (min {spec.min_border:.0%})")
+    if metrics["offset"] is None:
+        out.append("no subject")
+    elif metrics["offset"] > spec.max_offset:
+        out.append(f"off-centre by {metrics['offset']:.0%} (max {spec.max_offset:.0%})")
+    if metrics["brand"] is not None and metrics["brand"] < spec.min_brand:
+        out.append(f"brand hue {metrics['brand']:.1%} of subject (min {spec.min_brand:.0%})")
+    return out
+
+
+def check(job, source):
+    """Raise QAFailed if the original at source fails job.qa. Returns its measurements (None without a spec)."""
+    from PIL import Image
+    if job.qa is None:
+        return None
+    with Image.open(source) as img:
+        metrics = measure(img, job.qa)
+    problems = failures(metrics, job.qa)
+    if problems:
+        raise QAFailed(job, problems, metrics)
+    return metrics
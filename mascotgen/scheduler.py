@@ -0,0 +1,289 @@
+"""
+Fan jobs out across several ComfyUI servers.
+
+Each backend is health-checked with /system_stats up front. Jobs are
+dispatched to the healthy backend with the shortest /queue (running +
+pending, which also counts other users' prompts), at most `depth` of ours
+in flight per backend so the GPU never idles between jobs but work isn't
+committed to a box long before it can start it, and none to a backend
+whose /queue already holds the policy's max_queue. A waiter thread per
+backend turns completions from that server's tracker into events.
+
+Backends are re-probed every `health_interval` seconds while they have
+work; one that stops answering (after the policy's retries) is marked
+dead and its in-flight jobs go back to the front of the queue for the
+others. An HTTP error or a local disk error fails just its job. That
+failover is the scheduler's circuit breaker, so its clients don't have
+their own.
+
+Prompts are journaled like single-server runs (with the journal's
+client_id per server), but the scheduler itself always queues afresh;
+a later single-server run against one of its backends can resume them.
+"""
+import dataclasses
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import workflow_key
+from .client import ComfyClient, open_client
+from .pipeline import Pipeline
+from .policy import Policy, queue_depth, unreachable
+from .tracker import PromptFailed
+
+
+class Backend:
+    def __init__(self, client: ComfyClient):
+        self.client = client
+        self.url = client.base_url
+        self.name = "unknown"
+        self.alive = False
+        self.in_flight = {}  # prompt_id -> (job, queued_at, cache_key)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def probe(self) -> bool:
+        try:
+            stats = self.client.system_stats()
+        except (OSError, ValueError):
+            return False
+        self.name = stats.get("devices", [{}])[0].get("name", "unknown")
+        return True
+
+    def queue_depth(self) -> int:
+        return queue_depth(self.client.queue_state())
+
+
+class Scheduler:
+    def __init__(self, urls: list, depth: int = 2, health_interval: float = 5.0, client_ids: dict = None,
+                 policy: Policy = None):
+        client_ids = client_ids or {}
+        self.policy = policy or Policy()
+        client_policy = dataclasses.replace(self.policy, breaker_failures=0)
+        self.backends = [Backend(open_client(url, client_ids.get(url), policy=client_policy)) for url in urls]
+        self.depth = depth
+        self.health_interval = health_interval
+        self.events = queue.Queue()
+
+    def connect(self) -> list:
+        """Health-check every backend and open its completion tracker; returns the healthy ones.
+
+        Trackers start here, before anything is queued (warm-ups included),
+        so no completion event can go out before the socket subscribes.
+        """
+        for backend in self.backends:
+            backend.alive = backend.probe()
+            status = "not available"
+            if backend.alive:
+                tracking = "websocket" if backend.client.tracker.connected else "polling"
+                status = f"connected: {backend.name} ({tracking})"
+            print(f"ComfyUI {backend.url} {status}")
+        return [b for b in self.backends if b.alive]
+
+    def close(self):
+        for backend in self.backends:
+            backend.alive = False
+            backend.wake.set()
+            backend.client.close()
+
+    # ----- dispatch -----
+
+    def pick(self):
+        """Healthy backend with spare depth and the shortest server queue, or None."""
+        best = None
+        for backend in self.backends:
+            if not backend.alive or len(backend.in_flight) >= self.depth:
+                continue
+            try:
+                load = backend.queue_depth()
+            except (OSError, ValueError):
+                self.mark_dead(backend)
+                continue
+            if self.policy.max_queue and load >= self.policy.max_queue:
+                continue  # backpressure: full of other users' prompts
+            if best is None or (load, len(backend.in_flight)) < best[0]:
+                best = ((load, len(backend.in_flight)), backend)
+        return best[1] if best else None
+
+    def mark_dead(self, backend: Backend):
+        if backend.alive:
+            print(f"  Backend {backend.url} is down")
+        backend.alive = False
+        backend.wake.set()
+        with backend.lock:
+            orphaned = list(backend.in_flight.values())
+            backend.in_flight.clear()
+        for job, queued_at, key in orphaned:
+            self.events.put(("requeue", backend, None, job))
+
+    def _wait_loop(self, backend: Backend):
+        tracker = backend.client.tracker
+        while backend.alive:
+            with backend.lock:
+                ids = list(backend.in_flight)
+            if not ids:
+                backend.wake.wait(0.5)
+                backend.wake.clear()
+                continue
+            try:
+                prompt_id, entry = tracker.wait_any(ids, timeout=0.5)
+            except TimeoutError:
+                continue
+            except PromptFailed as e:
+                self.events.put(("failed", backend, e.prompt_id, e))
+                continue
+            self.events.put(("done", backend, prompt_id, entry))
+
+    # ----- run -----
+
+    def warm_up(self, jobs: list, pipeline: Pipeline):
+        """Warm every healthy backend up at once; each has its own models to load."""
+        threads = [threading.Thread(target=pipeline.with_client(b.client).warm_up, args=(jobs,))
+                   for b in self.backends if b.alive]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run(self, jobs: list, pipeline: Pipeline, workers: int = 2) -> dict:
+        """Render jobs across every healthy backend. Returns {name: success}.
+
+        pipeline supplies the cache, encode pool and resize options; its
+        client is swapped for each backend's.
+        """
+        pipelines = {b: pipeline.with_client(b.client) for b in self.backends}
+        pending = deque(jobs)
+        attempts = {}
+        futures = {}
+        results = {}
+        for backend in self.backends:
+            if backend.alive:
+                threading.Thread(target=self._wait_loop, args=(backend,), daemon=True).start()
+
+        def finish(backend, job, entry, key):
+            """Download and save a completed render; None if it had to be requeued."""
+            p = pipelines[backend]
+            try:
+                try:
+                    paths = p.download(entry, [key], job)
+                except Exception as e:
+                    if not unreachable(e):
+                        raise  # a missing /view file or a full disk fails the job, not the server
+                    # Rendered, but the server died before we could fetch it.
+                    self.mark_dead(backend)
+                    self.events.put(("requeue", backend, None, job))
+                    return None
+                if not paths:
+                    return False
+                p.checked_save(job, paths[0])  # a QA re-roll renders on this same backend
+                return True
+            finally:
+                self.events.put(("settled", backend, None, job))  # wake the dispatch loop
+
+        def save_cached(job, source):
+            pipeline.checked_save(job, source)
+            return True
+
+        last_health = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            # A download that fails on a dying backend requeues its job, so keep
+            # going until every event is handled and every download has settled.
+            while (pending or any(b.in_flight for b in self.backends) or not self.events.empty()
+                   or any(not f.done() for f in futures.values())):
+                while pending:
+                    job = pending[0]
+                    workflow = job.workflow()
+                    key = workflow_key(workflow)
+                    cached = pipeline.cached(key)
+                    if cached is not None:
+                        pending.popleft()
+                        print(f"  Cache hit: {job.name} ({key[:12]})")
+                        futures[job.name] = threads.submit(save_cached, job, cached)
+                        continue
+                    backend = self.pick()
+                    if backend is None:
+                        break
+                    try:
+                        prompt_id = pipeline.queue(job, workflow, backend.client)
+                    except Exception as e:
+                        if unreachable(e):
+                            self.mark_dead(backend)
+                            continue
+                        pending.popleft()  # rejected (an invalid graph, a missing model): the job's fault
+                        print(f"  ERROR queueing {job.name}: {e}")
+                        results[job.name] = False
+                        continue
+                    pending.popleft()
+                    attempts[job.name] = attempts.get(job.name, 0) + 1
+                    with backend.lock:
+                        backend.in_flight[prompt_id] = (job, time.time(), key)
+                    backend.wake.set()
+                    print(f"  Queued: {job.name} -> {backend.url} ({prompt_id})")
+
+                if not any(b.alive for b in self.backends):
+                    for job in pending:
+                        print(f"  ERROR: no backend left for {job.name}")
+                        results[job.name] = False
+                    pending.clear()
+                    break
+
+                try:
+                    kind, backend, prompt_id, payload = self.events.get(timeout=1.0)
+                except queue.Empty:
+                    kind = None
+                if kind == "requeue":
+                    job = payload
+                    if attempts.get(job.name, 0) >= len(self.backends):
+                        print(f"  ERROR: {job.name} failed on every backend")
+                        results[job.name] = False
+                    else:
+                        print(f"  Requeue: {job.name} (was on {backend.url})")
+                        pending.appendleft(job)
+                elif kind in ("done", "failed"):
+                    with backend.lock:
+                        item = backend.in_flight.pop(prompt_id, None)
+                    if item is not None:
+                        job, queued_at, key = item
+                        if kind == "failed":
+                            pipeline.journal.forget(job.name)
+                            print(f"  ERROR: {job.name}: {payload}")
+                            results[job.name] = False
+                        else:
+                            pipeline.rendered(job, prompt_id, queued_at, payload)
+                            print(f"  Completed: {job.name} on {backend.url}")
+                            futures[job.name] = threads.submit(finish, backend, job, payload, key)
+
+                if time.time() - last_health >= self.health_interval:
+                    last_health = time.time()
+                    self.check_health(pipeline, results)
+
+            for name, future in futures.items():
+                try:
+                    ok = future.result()
+                    if ok is not None:
+                        results[name] = ok
+                except Exception as e:
+                    print(f"  ERROR saving {name}: {e}")
+                    results[name] = False
+        return results
+
+    def check_health(self, pipeline: Pipeline, results: dict):
+        """Re-probe busy backends and expire jobs stuck past their render timeout (pipeline.times)."""
+        now = time.time()
+        for backend in self.backends:
+            if not backend.alive or not backend.in_flight:
+                continue
+            if not backend.probe():
+                self.mark_dead(backend)
+                continue
+            with backend.lock:
+                # Each prompt gets the time for itself and those of ours queued before it.
+                order = sorted(backend.in_flight.items(), key=lambda item: item[1][1])
+                for ahead, (prompt_id, (job, queued_at, key)) in enumerate(order):
+                    timeout = pipeline.times.timeout(ahead)
+                    if now - queued_at > timeout:
+                        del backend.in_flight[prompt_id]
+                        print(f"  ERROR: {job.name} ({prompt_id}) did not complete within {timeout:.0f}s")
+                        results[job.name] = False
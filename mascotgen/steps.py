@@ -0,0 +1,63 @@
+"""
+Runner steps written once for the threaded and the asyncio clients.
+
+A step is a generator that yields the calls it needs made, each a tuple
+of a callable and its arguments, and is sent back the result (or thrown
+the exception). drive() makes the calls with a blocking client; adrive()
+makes them with an asyncio one, awaiting whatever comes back awaitable.
+(SLEEP, seconds) sleeps either way. Resuming, admission, the warm-up and
+the QA re-roll (Pipeline) and waiting on prompts (CompletionTracker) are
+steps, so the asyncio runner runs the same code as the threaded ones.
+"""
+import asyncio
+import inspect
+import time
+
+SLEEP = object()  # (SLEEP, seconds): time.sleep or asyncio.sleep, whichever driver runs the step
+
+
+def drive(step):
+    """Run step with blocking calls; returns its result."""
+    result, error = None, None
+    while True:
+        try:
+            call = step.send(result) if error is None else step.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        fn, *args = call
+        result, error = None, None
+        try:
+            result = time.sleep(*args) if fn is SLEEP else fn(*args)
+        except Exception as e:
+            error = e
+        except BaseException:
+            step.close()
+            raise
+
+
+async def adrive(step):
+    """Run step on the event loop, awaiting calls that return awaitables; returns its result.
+
+    On cancellation the step is closed (its finally blocks run) before
+    CancelledError propagates.
+    """
+    result, error = None, None
+    while True:
+        try:
+            call = step.send(result) if error is None else step.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        fn, *args = call
+        result, error = None, None
+        try:
+            if fn is SLEEP:
+                await asyncio.sleep(*args)
+            else:
+                result = fn(*args)
+                if inspect.isawaitable(result):
+                    result = await result
+        except Exception as e:
+            error = e
+        except BaseException:
+            step.close()
+            raise
@@ -0,0 +1,185 @@
+"""
+Per-stage wall-clock accounting and tracing for a run.
+
+Every stage a job passes through is recorded as one event:
+
+    warmup    the tiny model-loading render before the batch (once per server)
+    queue     POST /prompt round trip
+    render    queued -> completion observed (gpu_wait + execute + notification)
+    gpu_wait  queued -> ComfyUI's execution_start (time behind other prompts)
+    execute   execution_start -> execution_success, i.e. the GPU actually working
+    download  /view streamed to disk (bytes = image size)
+    qa        the original's QA measurements (see mascotgen.qa); failed renders say why
+    dedupe    perceptual hash + index lookup of the original (with --dedupe)
+    resize    decode + every output size of one job (bytes = total written)
+    encode    one output file: resize + encode + write (the first also pays the decode);
+              .webp/.avif files include their quality search
+
+gpu_wait/execute come from the timestamps in ComfyUI's status messages,
+which are on the server's clock; they are clamped to the locally observed
+render interval so a skewed remote clock can't produce nonsense.
+
+The summary separates cold-start cost (the warm-up render, or without one
+the first execute's excess over the median) from the steady-state
+per-image cost (median execute).
+
+Stages overlap in --pipeline and multi-backend runs, so the summary gives
+each one both its busy time (sum of every interval) and its wall time
+(union of intervals: how long at least one job was in that stage).
+Timestamps are time.time() so intervals measured in encode worker
+processes line up with the parent's.
+
+With trace_to(), events are also streamed to a file as they happen,
+either as JSON lines or in Chrome trace-event format (one row per job;
+open it in chrome://tracing or ui.perfetto.dev).
+"""
+import json
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("warmup", "queue", "render", "gpu_wait", "execute", "download", "qa", "dedupe", "resize", "encode")
+TRACE_FORMATS = ("jsonl", "chrome")
+
+# Which stage's wall time stands for which resource in bottleneck().
+BOUND_BY = {"execute": "GPU", "download": "network", "resize": "PIL"}
+
+
+class Stages:
+    """Thread-safe collector of stage events, optionally streamed to a trace file.
+
+    With retain=False events only go to the trace file (if any) and the
+    summary stays empty, so long streaming runs don't accumulate them.
+    """
+
+    def __init__(self, retain: bool = True):
+        self.lock = threading.Lock()
+        self.retain = retain
+        self.events = []   # {"stage", "start", "end", "bytes", **fields}
+        self._trace = None
+        self._format = None
+        self._lanes = {}   # job name -> chrome tid
+
+    def trace_to(self, path, fmt: str = "jsonl"):
+        """Stream every event to path from now on (and everything recorded so far)."""
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"unknown trace format {fmt!r}")
+        with self.lock:
+            self._trace = open(path, "w", encoding="utf-8")
+            self._format = fmt
+            if fmt == "chrome":
+                # The closing bracket is optional in this format, so a crashed run still loads.
+                self._trace.write("[\n")
+            for event in self.events:
+                self._write(event)
+            self._trace.flush()
+
+    def close(self):
+        with self.lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+    def add(self, stage: str, start: float, end: float, nbytes: int = 0, **fields):
+        """Record one interval of stage; fields (job, prompt_id, file, ...) go into the trace."""
+        event = {"stage": stage, "start": start, "end": end, "bytes": nbytes, **fields}
+        with self.lock:
+            if self.retain:
+                self.events.append(event)
+            if self._trace is not None:
+                self._write(event)
+                self._trace.flush()
+
+    @contextmanager
+    def time(self, stage: str, **fields):
+        """Time the with-block as one interval of stage."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(stage, start, time.time(), **fields)
+
+    def _write(self, event: dict):
+        if self._format == "jsonl":
+            self._trace.write(json.dumps({**event, "duration": event["end"] - event["start"]}) + "\n")
+            return
+        lane = event.get("job", "run")
+        if lane not in self._lanes:
+            self._lanes[lane] = len(self._lanes) + 1
+            self._trace.write(json.dumps({"name": "thread_name", "ph": "M", "pid": 1,
+                                          "tid": self._lanes[lane], "args": {"name": lane}}) + ",\n")
+        args = {k: v for k, v in event.items() if k not in ("stage", "start", "end")}
+        self._trace.write(json.dumps({
+            "name": event["stage"], "cat": event["stage"], "ph": "X", "pid": 1, "tid": self._lanes[lane],
+            "ts": int(event["start"] * 1e6), "dur": int((event["end"] - event["start"]) * 1e6), "args": args,
+        }) + ",\n")
+
+    def summary(self) -> dict:
+        """{stage: {"count", "busy", "wall", "bytes", "first", "median"}} with times in seconds.
+
+        first is the duration of the stage's earliest event, median the
+        median duration over all of them.
+        """
+        with self.lock:
+            events = list(self.events)
+        by_stage = {}
+        for event in events:
+            by_stage.setdefault(event["stage"], []).append((event["start"], event["end"], event["bytes"]))
+        out = {}
+        for stage, items in by_stage.items():
+            wall = 0.0
+            end = None
+            for s, e, _ in sorted(items):
+                if end is None or s > end:
+                    wall += e - s
+                    end = e
+                elif e > end:
+                    wall += e - end
+                    end = e
+            out[stage] = {
+                "count": len(items),
+                "busy": sum(e - s for s, e, _ in items),
+                "wall": wall,
+                "bytes": sum(n for _, _, n in items),
+                "first": min(items)[1] - min(items)[0],
+                "median": statistics.median(e - s for s, e, _ in items),
+            }
+        return out
+
+
+def bottleneck(summary: dict):
+    """Name the resource ("GPU", "network" or "PIL") whose stage was active longest, or None."""
+    walls = {BOUND_BY[stage]: s["wall"] for stage, s in summary.items() if stage in BOUND_BY}
+    if not walls:
+        return None
+    return max(walls, key=walls.get)
+
+
+def cold_start(summary: dict):
+    """(cold-start seconds, steady-state seconds per image), either None if unknown."""
+    execute = summary.get("execute") or summary.get("render")
+    steady = execute["median"] if execute else None
+    if "warmup" in summary:
+        return summary["warmup"]["busy"], steady
+    if execute and execute["count"] > 1:
+        return max(0.0, execute["first"] - execute["median"]), steady
+    return None, steady
+
+
+def format_summary(summary: dict) -> list:
+    """Lines of a per-stage table (count, wall, busy, MB) plus the bottleneck verdict."""
+    lines = [f"  {'stage':<10}{'count':>7}{'wall':>10}{'busy':>10}{'MB':>9}"]
+    for stage in STAGES:
+        s = summary.get(stage)
+        if s:
+            lines.append(f"  {stage:<10}{s['count']:>7}{s['wall']:>9.2f}s{s['busy']:>9.2f}s{s['bytes']/1e6:>9.1f}")
+    cold, steady = cold_start(summary)
+    if cold is not None:
+        lines.append(f"  Cold start: {cold:.2f}s" + (" (warm-up)" if "warmup" in summary else " (first render)"))
+    if steady is not None:
+        lines.append(f"  Steady state: {steady:.2f}s/image")
+    bound = bottleneck(summary)
+    if bound:
+        lines.append(f"  Bound by: {bound}")
+    return lines
@@ -0,0 +1,255 @@
+"""
+Prompt completion tracking over ComfyUI's /ws event stream.
+
+One socket per client_id: ComfyUI pushes `executed` (per output node) and
+`execution_success` messages for every prompt queued with that client_id,
+so a prompt resolves the moment the GPU finishes instead of on the next
+/history poll. A prompt that finished before the socket subscribed is
+picked up by one /history check. If websocket-client isn't installed or
+the socket drops, the tracker falls back to polling /history with
+jittered exponential backoff.
+
+The waiting itself is a step (see mascotgen.steps): wait_any drives it
+with this tracker's socket thread, and the asyncio client drives the
+same step with its own socket reader feeding handle().
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from .policy import CircuitOpen, jitter
+from .steps import SLEEP, drive
+
+
+class PromptFailed(RuntimeError):
+    """ComfyUI reported an execution error or interruption for a prompt."""
+
+    def __init__(self, prompt_id: str, reason):
+        super().__init__(f"Prompt {prompt_id} failed: {reason}")
+        self.prompt_id = prompt_id
+
+
+class CompletionTracker:
+    SWEEP_INTERVAL = 15.0  # seconds between /history checks of prompts the socket hasn't reported
+
+    def __init__(self, base_url: str, client_id: str = None,
+                 poll_initial: float = 0.25, poll_max: float = 4.0, fetch_history=None):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id or str(uuid.uuid4())
+        self.fetch_history = fetch_history  # prompt_id -> entry|None; defaults to a one-shot urlopen
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self._cond = threading.Condition()
+        self._outputs = {}    # prompt_id -> {node_id: output}
+        self._messages = {}   # prompt_id -> [[type, data], ...] as in /history status.messages
+        self._finished = {}   # prompt_id -> history-shaped entry
+        self._errors = {}     # prompt_id -> message
+        self._checked = set()  # prompt_ids looked up in /history since the socket came up
+        self._swept = time.time()  # last /history sweep of unreported prompts
+        self._seq = 0          # messages that resolved a prompt (see idle)
+        self._ws = None
+        self._thread = None
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    @property
+    def seq(self) -> int:
+        """How many messages so far resolved a prompt (see idle)."""
+        return self._seq
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """Open the event socket. Returns False (polling mode) if it can't."""
+        try:
+            import websocket
+        except ImportError:
+            return False
+        url = urllib.parse.urlparse(self.base_url)
+        scheme = "wss" if url.scheme == "https" else "ws"
+        try:
+            ws = websocket.create_connection(
+                f"{scheme}://{url.netloc}/ws?clientId={self.client_id}", timeout=timeout)
+        except (OSError, websocket.WebSocketException):
+            return False
+        ws.settimeout(None)
+        self._swept = time.time()
+        self._ws = ws
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+        return True
+
+    def close(self):
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            ws.close()
+        with self._cond:
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self):
+        ws = self._ws
+        try:
+            while True:
+                message = ws.recv()
+                if not isinstance(message, str):
+                    continue  # binary latent previews
+                self.handle(json.loads(message))
+        except Exception:
+            pass
+        finally:
+            with self._cond:
+                if self._ws is ws:
+                    self._ws = None
+                self._cond.notify_all()
+
+    def handle(self, message: dict):
+        """Apply one decoded /ws message (also used by the asyncio client's socket reader)."""
+        msg_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+        with self._cond:
+            if msg_type in ("execution_start", "execution_cached", "execution_success"):
+                # Same shape as /history's status messages; older servers don't send a timestamp.
+                data = {"timestamp": int(time.time() * 1000), **data}
+                self._messages.setdefault(prompt_id, []).append([msg_type, data])
+            if msg_type == "executed":
+                self._outputs.setdefault(prompt_id, {})[data["node"]] = data.get("output") or {}
+            elif msg_type == "execution_success" or (msg_type == "executing" and data.get("node") is None):
+                self._finished.setdefault(prompt_id, {
+                    "outputs": self._outputs.pop(prompt_id, {}),
+                    "status": {"status_str": "success", "completed": True,
+                               "messages": self._messages.pop(prompt_id, [])},
+                })
+            elif msg_type in ("execution_start", "execution_cached"):
+                return
+            elif msg_type == "execution_error":
+                self._messages.pop(prompt_id, None)
+                self._errors[prompt_id] = f"{data.get('exception_type')}: {data.get('exception_message')}"
+            elif msg_type == "execution_interrupted":
+                self._errors[prompt_id] = "interrupted"
+                self._messages.pop(prompt_id, None)
+            else:
+                return
+            self._seq += 1
+            self._cond.notify_all()
+
+    def check_history(self, prompt_id: str):
+        """Return the /history entry for prompt_id, or None if it hasn't finished yet."""
+        if self.fetch_history is not None:
+            return self.fetch_history(prompt_id)
+        req = urllib.request.Request(f"{self.base_url}/history/{prompt_id}")
+        with urllib.request.urlopen(req) as resp:
+            history = json.loads(resp.read())
+        return history.get(prompt_id)
+
+    def take(self, prompt_ids):
+        """Pop (prompt_id, entry) for the first finished prompt in prompt_ids, or None; raises PromptFailed."""
+        with self._cond:  # re-entrant: waiting() already holds it
+            for prompt_id in prompt_ids:
+                if prompt_id in self._errors:
+                    self._finished.pop(prompt_id, None)
+                    self._checked.discard(prompt_id)
+                    raise PromptFailed(prompt_id, self._errors.pop(prompt_id))
+                if prompt_id in self._finished:
+                    self._checked.discard(prompt_id)
+                    return prompt_id, self._finished.pop(prompt_id)
+            return None
+
+    def wait_any(self, prompt_ids, timeout: float = 300) -> tuple:
+        """Block until one of prompt_ids finishes; return (prompt_id, history_entry)."""
+        return drive(self.waiting(prompt_ids, timeout, self.check_history, self.idle, lambda: self.connected))
+
+    def wait(self, prompt_id: str, timeout: float = 300) -> dict:
+        return self.wait_any([prompt_id], timeout)[1]
+
+    def idle(self, seq: int, timeout: float):
+        """Block until a message after seq resolves a prompt, the socket drops, or timeout passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq or not self.connected, timeout)
+
+    def waiting(self, prompt_ids, timeout: float, history, idle, connected):
+        """Step (see mascotgen.steps): wait for one of prompt_ids to finish; returns (prompt_id, history_entry).
+
+        history(prompt_id) fetches a /history entry, idle(seq, seconds)
+        waits for the next message and connected() says whether a socket
+        is feeding handle(). While one is, /history is still checked once
+        for each id it hasn't reported (the prompt may have finished before
+        the socket subscribed) and every SWEEP_INTERVAL seconds after that,
+        in case an event went missing. Without one, /history is polled.
+        """
+        prompt_ids = list(prompt_ids)
+        deadline = time.time() + timeout
+        while connected():
+            with self._cond:
+                seq = self._seq
+                found = self.take(prompt_ids)
+                if found:
+                    return found
+                now = time.time()
+                if now - self._swept >= self.SWEEP_INTERVAL:
+                    self._swept = now
+                    due = prompt_ids
+                else:
+                    due = [prompt_id for prompt_id in prompt_ids if prompt_id not in self._checked]
+            if due:
+                found = yield from self._check(due, history)
+                if found:
+                    return found
+                continue
+            remaining = deadline - now
+            if remaining <= 0:
+                raise TimeoutError(f"Prompts {prompt_ids} did not complete within {timeout}s")
+            yield idle, seq, min(remaining, self._swept + self.SWEEP_INTERVAL - now)
+        # No socket (or it dropped): anything it already delivered still counts.
+        found = self.take(prompt_ids)
+        if found:
+            return found
+        delay = self.poll_initial
+        while True:
+            found = yield from self._check(prompt_ids, history)
+            if found:
+                return found
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"Prompts {prompt_ids} did not complete within {timeout}s")
+            yield SLEEP, min(jitter(delay), remaining)
+            delay = min(delay * 2, self.poll_max)
+
+    def _check(self, prompt_ids, history):
+        """Step: one /history pass over prompt_ids; (prompt_id, entry) for the first finished, or None."""
+        for prompt_id in prompt_ids:
+            self._checked.add(prompt_id)
+            try:
+                entry = yield history, prompt_id
+            except CircuitOpen:
+                raise  # the client's retries gave up on the server
+            except (OSError, ValueError):
+                # URLError/connection resets and half-written JSON: retry after backoff.
+                continue
+            if entry is not None:
+                self._forget(prompt_id)
+                status = entry.get("status") or {}
+                if status.get("status_str") == "error":
+                    raise PromptFailed(prompt_id, status.get("messages"))
+                return prompt_id, entry
+        return None
+
+    def _forget(self, prompt_id: str):
+        """Drop socket state for a prompt resolved through /history."""
+        with self._cond:
+            for state in (self._outputs, self._messages, self._finished, self._errors):
+                state.pop(prompt_id, None)
+            self._checked.discard(prompt_id)
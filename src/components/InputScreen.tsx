@@ -1,4 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
+import MascotSprite from './MascotSprite';
 
 interface RecentSearch {
   name1: string;
@@ -41,7 +42,7 @@ const InputScreen: React.FC<InputScreenProps> = ({ onCalculate, recentSearches,
       {/* Header */}
       <div className="input-header">
         <div className="input-mascot-wrap">
-          <img src="/mascot/mascot-main.png" alt="끌림이" className="input-mascot-img" />
+          <MascotSprite file="mascot-main.png" alt="끌림이" className="input-mascot-img" />
         </div>
         <h1>우리 케미</h1>
         <p>두 이름 사이의 끌림을 측정해볼까?</p>
@@ -0,0 +1,35 @@
+import React from 'react';
+import { MASCOT_ATLAS } from '../data/mascot-atlas';
+
+interface MascotSpriteProps {
+  file: string;
+  alt: string;
+  className?: string;
+}
+
+// One mascot icon cut from its size tier's sprite atlas (see mascotgen.atlas),
+// so every icon of a size shares one image request. Position and size are
+// percentages of the element, so the CSS class can scale it like an <img>.
+export default function MascotSprite({ file, alt, className }: MascotSpriteProps) {
+  const tier = Object.values(MASCOT_ATLAS).find((t) => file in t.sprites);
+  if (!tier) {
+    return <img src={`/mascot/${file}`} alt={alt} className={className} />;
+  }
+  const { x, y, w, h } = tier.sprites[file];
+  const offset = (pos: number, size: number, total: number) => (total === size ? 0 : (pos / (total - size)) * 100);
+
+  return (
+    <span
+      role="img"
+      aria-label={alt}
+      className={className}
+      style={{
+        display: 'block',
+        backgroundImage: `url(${tier.image})`,
+        backgroundRepeat: 'no-repeat',
+        backgroundSize: `${(tier.width / w) * 100}% ${(tier.height / h) * 100}%`,
+        backgroundPosition: `${offset(x, w, tier.width)}% ${offset(y, h, tier.height)}%`,
+      }}
+    />
+  );
+}
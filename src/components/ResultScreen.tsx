@@ -3,6 +3,7 @@ import { ChemiResult, WeeklyChemiForecast, ATTRACTION_LEVELS, CHEMI_ATTRIBUTE_LA
 import { getStrongestAttribute, getWeakestAttribute } from '../utils/chemi-engine';
 import MagneticField from './MagneticField';
 import BannerAd from './BannerAd';
+import MascotSprite from './MascotSprite';
 
 interface ResultScreenProps {
   result: ChemiResult;
@@ -292,7 +293,7 @@ const ResultScreen: React.FC<ResultScreenProps> = ({
       {/* One-liner — 끌림이 한줄평 */}
       <div className="result-card card section-gap">
         <div className="mascot-oneliner">
-          <img src="/mascot/mascot-main-64.png" alt="끌림이" className="mascot-oneliner-img" />
+          <MascotSprite file="mascot-main-64.png" alt="끌림이" className="mascot-oneliner-img" />
           <p className="mascot-oneliner-text">{result.oneLiner}</p>
         </div>
       </div>
@@ -327,8 +328,8 @@ const ResultScreen: React.FC<ResultScreenProps> = ({
       {/* Mascot Speech Bubble */}
       <div className="mascot-advice-section section-gap">
         <div className="mascot-advice-bubble">
-          <img
-            src={result.level.level >= 3 ? '/mascot/mascot-happy-64.png' : result.level.level >= 2 ? '/mascot/mascot-thinking-64.png' : '/mascot/mascot-sad-64.png'}
+          <MascotSprite
+            file={result.level.level >= 3 ? 'mascot-happy-64.png' : result.level.level >= 2 ? 'mascot-thinking-64.png' : 'mascot-sad-64.png'}
             alt="끌림이"
             className="mascot-advice-img"
           />
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { ChemiResult } from '../types';
+import MascotSprite from './MascotSprite';
 
 interface RevealScreenProps {
   result: ChemiResult;
@@ -58,7 +59,7 @@ const RevealScreen: React.FC<RevealScreenProps> = ({ result }) => {
 
         {/* Center magnet icon */}
         <div className="reveal-magnet">
-          <img src="/mascot/mascot-thinking.png" alt="끌림이" className="reveal-mascot-img" />
+          <MascotSprite file="mascot-thinking.png" alt="끌림이" className="reveal-mascot-img" />
         </div>
 
         {/* Message */}
@@ -0,0 +1,111 @@
+// Generated by mascotgen.atlas from name-chemi.toml; do not edit.
+
+export interface AtlasSprite {
+  x: number;
+  y: number;
+  w: number;
+  h: number;
+}
+
+export interface AtlasTier {
+  image: string;
+  width: number;
+  height: number;
+  sprites: Record<string, AtlasSprite>;
+}
+
+export const MASCOT_ATLAS: Record<string, AtlasTier> = {
+  "128": {
+    "height": 258,
+    "image": "/mascot/mascot-atlas-128.png",
+    "sprites": {
+      "mascot-happy.png": {
+        "h": 128,
+        "w": 128,
+        "x": 0,
+        "y": 0
+      },
+      "mascot-main.png": {
+        "h": 128,
+        "w": 128,
+        "x": 130,
+        "y": 0
+      },
+      "mascot-sad.png": {
+        "h": 128,
+        "w": 128,
+        "x": 0,
+        "y": 130
+      },
+      "mascot-thinking.png": {
+        "h": 128,
+        "w": 128,
+        "x": 130,
+        "y": 130
+      }
+    },
+    "width": 258
+  },
+  "48": {
+    "height": 98,
+    "image": "/mascot/mascot-atlas-48.png",
+    "sprites": {
+      "mascot-happy-48.png": {
+        "h": 48,
+        "w": 48,
+        "x": 0,
+        "y": 0
+      },
+      "mascot-main-48.png": {
+        "h": 48,
+        "w": 48,
+        "x": 50,
+        "y": 0
+      },
+      "mascot-sad-48.png": {
+        "h": 48,
+        "w": 48,
+        "x": 0,
+        "y": 50
+      },
+      "mascot-thinking-48.png": {
+        "h": 48,
+        "w": 48,
+        "x": 50,
+        "y": 50
+      }
+    },
+    "width": 98
+  },
+  "64": {
+    "height": 130,
+    "image": "/mascot/mascot-atlas-64.png",
+    "sprites": {
+      "mascot-happy-64.png": {
+        "h": 64,
+        "w": 64,
+        "x": 0,
+        "y": 0
+      },
+      "mascot-main-64.png": {
+        "h": 64,
+        "w": 64,
+        "x": 66,
+        "y": 0
+      },
+      "mascot-sad-64.png": {
+        "h": 64,
+        "w": 64,
+        "x": 0,
+        "y": 66
+      },
+      "mascot-thinking-64.png": {
+        "h": 64,
+        "w": 64,
+        "x": 66,
+        "y": 66
+      }
+    },
+    "width": 130
+  }
+};
@@ -0,0 +1,80 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mascotgen import fake_server  # noqa: E402
+from mascotgen.jobs import RenderJob  # noqa: E402
+from mascotgen.policy import Policy  # noqa: E402
+
+# Retries and backoff short enough that a dead server fails within a test's patience.
+FAST = Policy(retries=1, backoff=0.05, backoff_max=0.1, deadlines={"submit": 2, "download": 2, "api": 2},
+              breaker_failures=0)
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def job(output_dir, name: str = "piglet", seed: int = 1) -> RenderJob:
+    return RenderJob(name=name, prompt="A pink piglet waving, solid white background", seed=seed,
+                     output_dir=Path(output_dir), sizes={f"{name}.png": 32}, gen_size=64)
+
+
+def finished(server, prompt_id: str, timeout: float = 10):
+    """Wait until the fake server has rendered prompt_id."""
+    deadline = time.time() + timeout
+    while prompt_id not in server.comfy.history:
+        assert time.time() < deadline, f"{prompt_id} never finished"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def serve():
+    """Start fake ComfyUI servers (fake_server.serve kwargs); each is stopped after the test."""
+    servers = []
+
+    def start(**kwargs):
+        server = fake_server.serve(port=0, **{"latency": 0.05, **kwargs})
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        if not server.comfy.dead:
+            fake_server.kill(server)
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """(method, path) of every request the fake servers handle during the test."""
+    seen = []
+    do_get, do_post = fake_server.Handler.do_GET, fake_server.Handler.do_POST
+
+    def get(self):
+        seen.append(("GET", self.path))
+        return do_get(self)
+
+    def post(self):
+        seen.append(("POST", self.path))
+        return do_post(self)
+
+    monkeypatch.setattr(fake_server.Handler, "do_GET", get)
+    monkeypatch.setattr(fake_server.Handler, "do_POST", post)
+    return seen
+
+
+@pytest.fixture
+def no_websocket(monkeypatch):
+    """Fake servers refuse the /ws upgrade, so clients fall back to polling /history."""
+    do_get = fake_server.Handler.do_GET
+
+    def get(self):
+        if self.path.startswith("/ws"):
+            return self._json({"error": "not found"}, 404)
+        return do_get(self)
+
+    monkeypatch.setattr(fake_server.Handler, "do_GET", get)
@@ -0,0 +1,63 @@
+import itertools
+import json
+from pathlib import Path
+
+import pytest
+
+from mascotgen.atlas import PADDING, AtlasSpec, build_atlases, pack
+from mascotgen.jobs import RenderJob
+
+
+@pytest.mark.parametrize("sprites", [
+    [(f"icon-{i}.png", 48, 48) for i in range(12)],
+    [("a.png", 64, 64), ("b.png", 48, 48), ("c.png", 64, 32), ("d.png", 16, 128), ("e.png", 1, 1)],
+    [("only.png", 128, 128)],
+])
+def test_pack_places_every_sprite_without_overlaps(sprites):
+    layout, width, height = pack(sprites)
+    assert sorted(layout) == sorted(name for name, _, _ in sprites)
+    for name, w, h in sprites:
+        x, y, lw, lh = layout[name]
+        assert (lw, lh) == (w, h)
+        assert 0 <= x and x + w <= width and 0 <= y and y + h <= height
+    for (a, (ax, ay, aw, ah)), (b, (bx, by, bw, bh)) in itertools.combinations(layout.items(), 2):
+        apart = (ax + aw + PADDING <= bx or bx + bw + PADDING <= ax
+                 or ay + ah + PADDING <= by or by + bh + PADDING <= ay)
+        assert apart, f"{a} and {b} overlap"
+
+
+def test_pack_is_roughly_square():
+    _, width, height = pack([(f"icon-{i}.png", 48, 48) for i in range(16)])
+    assert width == height == 4 * 48 + 3 * PADDING
+
+
+def test_atlases_are_built_and_updated_incrementally(tmp_path, capsys):
+    from PIL import Image
+    colors = {"red": (255, 0, 0), "blue": (0, 0, 255)}
+    jobs = [RenderJob(name=name, prompt="", seed=0, output_dir=tmp_path,
+                      sizes={f"{name}.png": 64, f"{name}-48.png": 48}) for name in colors]
+    for name, rgb in colors.items():
+        for fname, size in jobs[0].sizes.items():
+            Image.new("RGB", (size, size), rgb).save(tmp_path / fname.replace("red", name))
+    spec = AtlasSpec(name="atlas", max_size=64, ts=tmp_path / "atlas.ts", url="/icons/")
+    state = tmp_path / "state.json"
+
+    maps = build_atlases(jobs, spec, state)
+    tiers = maps[Path(tmp_path)]
+    assert sorted(tiers) == ["48", "64"]
+    with Image.open(tmp_path / "atlas-64.png") as sheet:
+        for name, rgb in colors.items():
+            sprite = tiers["64"]["sprites"][f"{name}.png"]
+            assert sheet.convert("RGB").getpixel((sprite["x"] + 10, sprite["y"] + 10)) == rgb
+    assert json.loads((tmp_path / "atlas.json").read_text()) == tiers
+    assert '"image": "/icons/atlas-48.png"' in (tmp_path / "atlas.ts").read_text()
+    capsys.readouterr()
+
+    build_atlases(jobs, spec, state)
+    assert "Atlas:" not in capsys.readouterr().out  # nothing changed
+
+    Image.new("RGB", (48, 48), (0, 255, 0)).save(tmp_path / "blue-48.png")
+    build_atlases(jobs, spec, state)
+    out = capsys.readouterr().out
+    assert "atlas-48.png (48x98, updated 1/2 sprites" in out
+    assert "atlas-64.png" not in out
@@ -0,0 +1,40 @@
+import pytest
+
+from mascotgen.build import main as build
+
+MANIFEST = """
+url = "local://build"
+
+[crop]
+background = "#FFFFFF"
+
+[assets.piglet]
+prompt = "A pink piglet waving, solid white background"
+seed = 7
+output_dir = "out"
+sizes = { "piglet.png" = 32, "piglet-16.png" = 16 }
+"""
+
+
+@pytest.mark.parametrize("flags", [[], ["--no-qa", "--no-crop"]])
+def test_check_after_a_build_with_the_same_flags_is_clean(tmp_path, flags):
+    if not flags:
+        pytest.importorskip("numpy")
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    assert build([str(manifest), "--check", *flags]) == 1
+    assert build([str(manifest), "--no-warmup", *flags]) == 0
+    assert build([str(manifest), "--check", *flags]) == 0
+    assert build([str(manifest), "--check", *(["--no-crop"] if not flags else [])]) == 1
+
+
+def test_touch_then_check_with_the_same_flags_is_clean(tmp_path):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    out = tmp_path / ".render-cache" / "local" / "out"  # where local:// runs write
+    out.mkdir(parents=True)
+    for name in ("piglet.png", "piglet-16.png"):
+        (out / name).write_bytes(b"")
+    assert build([str(manifest), "--touch", "--no-crop"]) == 0
+    assert build([str(manifest), "--check", "--no-crop"]) == 0
+    assert build([str(manifest), "--check"]) == 1
@@ -0,0 +1,61 @@
+import os
+
+from mascotgen.cache import RenderCache, workflow_key
+from mascotgen.jobs import make_workflow
+
+
+def test_key_ignores_dict_order_and_the_filename_prefix():
+    workflow = make_workflow("a piglet", seed=1)
+    reordered = {node_id: {"inputs": dict(reversed(node["inputs"].items())), "class_type": node["class_type"]}
+                 for node_id, node in reversed(workflow.items())}
+    assert workflow_key(reordered) == workflow_key(workflow)
+    assert workflow_key(make_workflow("a piglet", seed=1, prefix="other")) == workflow_key(workflow)
+    assert workflow["9"]["inputs"]["filename_prefix"] == "mascot"  # the caller's graph is untouched
+
+
+def test_key_changes_with_what_determines_the_pixels():
+    key = workflow_key(make_workflow("a piglet", seed=1))
+    assert workflow_key(make_workflow("a piglet", seed=2)) != key
+    assert workflow_key(make_workflow("a piglet", seed=1, width=256, height=256)) != key
+    assert workflow_key(make_workflow("a kitten", seed=1)) != key
+    assert workflow_key(make_workflow("a piglet", seed=1, upscale_model="x2.pth")) != key
+
+
+def test_hit_and_miss(tmp_path):
+    cache = RenderCache(tmp_path)
+    assert cache.get("ab" * 32) is None
+    assert cache.get_path("ab" * 32) is None
+    cache.put("ab" * 32, b"render")
+    assert cache.get("ab" * 32) == b"render"
+    assert cache.get_path("ab" * 32) == tmp_path / "ab" / f"{'ab' * 32}.png"
+    path = cache.put_stream("cd" * 32, lambda f: f.write(b"streamed"))
+    assert path.read_bytes() == b"streamed"
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+
+def test_a_failed_write_leaves_no_entry(tmp_path):
+    cache = RenderCache(tmp_path)
+
+    def broken(f):
+        f.write(b"half")
+        raise OSError("connection lost")
+
+    try:
+        cache.put_stream("ab" * 32, broken)
+    except OSError:
+        pass
+    assert cache.get("ab" * 32) is None
+    assert not list(tmp_path.glob("*/*"))
+
+
+def test_least_recently_used_entries_are_evicted_past_the_cap(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=30)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, b"x" * 10)
+        os.utime(cache.get_path(key), (0, 1_000_000 - age))  # keys[0] is the oldest
+    cache.get(keys[0])  # ...until it's used again
+
+    cache.put("ff" * 32, b"x" * 10)
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], "ff" * 32))
@@ -0,0 +1,109 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from conftest import FAST
+from mascotgen.aio import AsyncComfyClient
+from mascotgen.client import ComfyClient
+
+ANSWER = b'{"prompt_id": "p1"}'
+
+
+@pytest.fixture
+def raw_server():
+    """A bare HTTP/1.1 server; mode "drop" hangs up on every request, "close" after every answer."""
+    listeners = []
+
+    def start(mode: str):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        listeners.append(listener)
+        seen = []
+
+        def handle(conn):
+            with conn:
+                data = b""
+                while True:
+                    while b"\r\n\r\n" not in data:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            return
+                        data += chunk
+                    head, _, data = data.partition(b"\r\n\r\n")
+                    seen.append(head.split(b"\r\n")[0].decode())
+                    length = next((int(line.split(b":")[1]) for line in head.split(b"\r\n")
+                                   if line.lower().startswith(b"content-length:")), 0)
+                    while len(data) < length:
+                        data += conn.recv(65536)
+                    data = data[length:]
+                    if mode == "drop":
+                        return
+                    conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(ANSWER) + ANSWER)
+                    if mode == "close":
+                        time.sleep(0.05)
+                        return
+
+        def accept():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+        threading.Thread(target=accept, daemon=True).start()
+        return f"http://127.0.0.1:{listener.getsockname()[1]}", seen
+
+    yield start
+    for listener in listeners:
+        listener.close()
+
+
+def test_a_reset_submit_is_sent_once(raw_server):
+    base_url, seen = raw_server("drop")
+    client = ComfyClient(base_url, policy=FAST)
+    with pytest.raises(ConnectionError):
+        client.queue_prompt({})
+    assert seen.count("POST /prompt HTTP/1.1") == 1
+
+
+def test_a_reset_async_submit_is_sent_once(raw_server):
+    base_url, seen = raw_server("drop")
+
+    async def main():
+        client = AsyncComfyClient(base_url, policy=FAST)
+        try:
+            await client.queue_prompt({})
+        finally:
+            await client.close()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(main())
+    assert seen.count("POST /prompt HTTP/1.1") == 1
+
+
+def test_idle_connections_closed_by_the_server_are_reopened(raw_server):
+    base_url, seen = raw_server("close")
+    client = ComfyClient(base_url, policy=FAST)
+    for _ in range(2):
+        assert client.queue_prompt({}) == "p1"
+        time.sleep(0.1)  # the server has closed the keep-alive socket by now
+        assert client.get_json("/queue") == {"prompt_id": "p1"}
+        time.sleep(0.1)
+    assert seen.count("POST /prompt HTTP/1.1") == 2
+
+    async def main():
+        client = AsyncComfyClient(base_url, policy=FAST)
+        try:
+            for _ in range(2):
+                assert await client.queue_prompt({}) == "p1"
+                await asyncio.sleep(0.1)
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+    assert seen.count("POST /prompt HTTP/1.1") == 4
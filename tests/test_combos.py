@@ -0,0 +1,118 @@
+import dataclasses
+import json
+import types
+from pathlib import Path
+
+from mascotgen import combos
+from mascotgen.combos import ComboIndex, ComboSpec, combo_seed, expand, todo
+
+AXES = {
+    "pose": {"wave": "waving hello", "jump": "jumping"},
+    "color": {"pink": "romantic pink", "gold": "gold and pink", "mint": "mint green"},
+}
+
+
+def spec(tmp_path, **kwargs) -> ComboSpec:
+    return ComboSpec(prompt="A piglet {pose}, {color} color scheme", axes=AXES, output_dir=Path(tmp_path),
+                     sizes={"{name}.png": 64, "{name}-xs.png": 16}, seed=1000, **kwargs)
+
+
+def test_expand_yields_every_combination_lazily_in_axis_order(tmp_path):
+    jobs = expand(spec(tmp_path))
+    assert isinstance(jobs, types.GeneratorType)
+    jobs = list(jobs)
+    assert [job.name for job in jobs] == ["wave-pink", "wave-gold", "wave-mint", "jump-pink", "jump-gold", "jump-mint"]
+    assert combos.count(spec(tmp_path)) == len(jobs)
+    first = jobs[0]
+    assert first.prompt == "A piglet waving hello, romantic pink color scheme"
+    assert first.sizes == {"wave-pink.png": 64, "wave-pink-xs.png": 16}
+    assert first.output_dir == Path(tmp_path) / combos.shard(spec(tmp_path), "wave-pink")
+    assert len(first.output_dir.name) == 2
+    assert len({job.seed for job in jobs}) == len(jobs)
+
+
+def test_names_follow_the_template_and_seeds_follow_the_names(tmp_path):
+    named = {job.name: job for job in expand(spec(tmp_path, name="{color}_{pose}", shard_chars=0))}
+    assert sorted(named) == sorted(f"{c}_{p}" for p in AXES["pose"] for c in AXES["color"])
+    assert named["pink_wave"].seed == combo_seed(1000, "pink_wave")
+    assert named["pink_wave"].output_dir == Path(tmp_path)
+
+    grown = {**AXES, "pose": {"sit": "sitting", **AXES["pose"]}}
+    regrown = {job.name: job.seed for job in expand(dataclasses.replace(spec(tmp_path), axes=grown))}
+    assert all(regrown[job.name] == job.seed for job in expand(spec(tmp_path)))  # no reseeding
+
+
+def test_the_index_is_per_shard_and_the_last_entry_wins(tmp_path):
+    index = ComboIndex(tmp_path)
+    job, other = list(expand(spec(tmp_path)))[:2]
+    for j in (job, other):
+        Path(j.output_dir).mkdir(parents=True, exist_ok=True)
+    assert index.entry(job) is None and not index.done(job)
+
+    rows = []
+    for fname in job.sizes:
+        path = Path(job.output_dir) / fname
+        path.write_bytes(b"png")
+        rows.append((path, 64, 64, 3, 0.0, None))
+    index.record(job, rows)
+    entry = index.entry(job)
+    assert entry["seed"] == job.seed
+    assert entry["files"] == {f"{job.output_dir.name}/{fname}": 3 for fname in job.sizes}
+    assert index.done(job) and not index.done(other)
+
+    assert not index.done(dataclasses.replace(job, prompt=job.prompt + ", smiling"))
+    assert not index.done(dataclasses.replace(job, seed=job.seed + 1))
+    (Path(job.output_dir) / "wave-pink-xs.png").unlink()
+    assert not index.done(job)
+
+    index.record(job, [], duplicate_of="jump-pink")
+    assert index.entry(job)["duplicate_of"] == "jump-pink"
+    assert index.done(job)  # a duplicate is done without files
+
+
+def test_todo_skips_what_is_indexed_and_honours_only_and_limit(tmp_path):
+    index = ComboIndex(tmp_path)
+    done = next(expand(spec(tmp_path)))
+    Path(done.output_dir).mkdir(parents=True)
+    index.record(done, [], duplicate_of="x")
+
+    def run(**flags):
+        args = types.SimpleNamespace(**{"only": [], "all": False, "limit": 0, **flags})
+        tally = {"queued": 0, "skipped": 0}
+        return [job.name for job in todo(spec(tmp_path), index, args, tally)], tally
+
+    assert run() == (["wave-gold", "wave-mint", "jump-pink", "jump-gold", "jump-mint"], {"queued": 5, "skipped": 1})
+    assert run(all=True)[0][0] == "wave-pink"
+    assert run(limit=2)[0] == ["wave-gold", "wave-mint"]
+    assert run(only=["jump-mint", "wave-pink"])[0] == ["jump-mint"]
+
+
+def test_a_second_run_renders_nothing(tmp_path, capsys):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text("""
+url = "local://combos"
+
+[combos]
+prompt = "A piglet {pose}, solid white background"
+seed = 1000
+output_dir = "variants"
+gen_size = 64
+sizes = { "{name}.png" = 32 }
+
+[combos.axes.pose]
+wave = "waving hello"
+jump = "jumping"
+sit = "sitting"
+""")
+    flags = [str(manifest), "--no-qa", "--no-crop", "--no-warmup"]
+    assert combos.main(flags) == 0
+    assert "Rendered: 3" in capsys.readouterr().out
+    variants = tmp_path / ".render-cache" / "local" / "variants"  # where local:// runs write
+    lines = [json.loads(line) for path in variants.glob("*/index.jsonl") for line in path.read_text().splitlines()]
+    assert sorted(entry["name"] for entry in lines) == ["jump", "sit", "wave"]
+    assert all((variants / f).exists() for entry in lines for f in entry["files"])
+    assert not (tmp_path / "variants").exists()
+
+    assert combos.main(flags) == 0
+    out = capsys.readouterr().out
+    assert "Rendered: 0" in out and "Up to date: 3" in out
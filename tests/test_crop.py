@@ -0,0 +1,83 @@
+import pytest
+
+from mascotgen.imaging import CropSpec, crop_subject, iter_resized
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+WHITE = (255, 255, 255)
+ORANGE = (255, 112, 67)
+
+
+def render(box=(40, 60, 80, 100), size: int = 200, hole: bool = False):
+    """A solid orange rectangle at box on white; with hole, a white square inside it."""
+    img = Image.new("RGB", (size, size), WHITE)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=ORANGE)
+    if hole:
+        x, y = (box[0] + box[2]) // 2, (box[1] + box[3]) // 2
+        draw.rectangle((x - 5, y - 5, x + 4, y + 4), fill=WHITE)
+    return img
+
+
+@pytest.mark.parametrize("margin", [0.0, 0.1, 0.25])
+def test_the_crop_is_the_subject_plus_the_margin(margin):
+    out = crop_subject(render(), CropSpec(background=WHITE, margin=margin, key=False))
+    side = round(40 + 2 * margin * 40)
+    assert out.size == (side, side)
+    pad = round(margin * 40)
+    assert out.getpixel((pad, pad)) == ORANGE
+    assert out.getpixel((side - pad - 1, side - pad - 1)) == ORANGE
+    if pad:
+        assert out.getpixel((pad - 1, pad - 1)) == WHITE
+
+
+def test_the_crop_is_widened_to_the_aspect_around_the_subject():
+    out = crop_subject(render(box=(50, 20, 70, 120)), CropSpec(background=WHITE, margin=0, key=False))
+    assert out.size == (100, 100)  # a 20x100 subject, centred in a square
+    assert out.getpixel((50, 50)) == ORANGE and out.getpixel((10, 50)) == WHITE
+    wide = crop_subject(render(), CropSpec(background=WHITE, margin=0, key=False), aspect=2.0)
+    assert wide.size == (80, 40)
+
+
+def test_an_all_background_image_is_returned_unchanged():
+    blank = Image.new("RGB", (64, 64), WHITE)
+    assert crop_subject(blank, CropSpec(background=WHITE)) is blank
+    specks = blank.copy()
+    specks.putpixel((10, 10), ORANGE)  # a single stray pixel isn't a subject
+    assert crop_subject(specks, CropSpec(background=WHITE)) is specks
+
+
+def test_a_subject_touching_the_edge_is_padded_with_background():
+    out = crop_subject(render(box=(0, 60, 40, 100)), CropSpec(background=WHITE, margin=0.25, key=False))
+    assert out.size == (60, 60)
+    assert out.getpixel((0, 30)) == WHITE  # past the render's left edge
+    assert out.getpixel((10, 30)) == ORANGE
+    keyed = crop_subject(render(box=(0, 60, 40, 100)), CropSpec(background=WHITE, margin=0.25))
+    assert keyed.getpixel((0, 30))[3] == 0
+
+
+def test_the_background_is_keyed_out_but_enclosed_holes_stay():
+    out = crop_subject(render(box=(40, 40, 100, 100), hole=True), CropSpec(background=WHITE, margin=0.1))
+    assert out.mode == "RGBA"
+    assert out.getpixel((0, 0)) == (0, 0, 0, 0)
+    assert out.getpixel((out.width // 2, out.height // 2)) == WHITE + (255,)  # the hole is enclosed
+    assert out.getpixel((10, 10)) == ORANGE + (255,)
+
+
+def test_the_background_defaults_to_the_border_colour():
+    dark = Image.new("RGB", (100, 100), (0x1A, 0x0A, 0x14))
+    ImageDraw.Draw(dark).ellipse((30, 30, 69, 69), fill=ORANGE)
+    out = crop_subject(dark, CropSpec(margin=0))
+    assert out.size == (40, 40)
+    assert out.getpixel((0, 0))[3] == 0
+
+
+def test_every_size_is_cut_from_the_crop(tmp_path):
+    source = tmp_path / "render.png"
+    render().save(source)
+    sizes = {"icon.png": 32, "icon-16.png": 16}
+    resized = dict(iter_resized(source, sizes, crop=CropSpec(background=WHITE, margin=0)))
+    assert {fname: img.size for fname, img in resized.items()} == {"icon.png": (32, 32), "icon-16.png": (16, 16)}
+    assert resized["icon-16.png"].getpixel((0, 0)) == ORANGE + (255,)  # no padding left
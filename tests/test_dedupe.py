@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from mascotgen.build import main as build
+
+pytest.importorskip("numpy")
+
+MANIFEST = """
+url = "local://dedupe"
+[assets.first]
+prompt = "A pink piglet waving, solid white background"
+seed = 7
+output_dir = "out"
+sizes = { "first.png" = 32 }
+[assets.second]
+prompt = "A pink piglet waving, solid white background"
+seed = 7
+output_dir = "out"
+sizes = { "second.png" = 32 }
+"""
+
+
+def test_a_duplicate_of_another_asset_fails_and_stays_stale(tmp_path, capsys):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    assert build([str(manifest), "--dedupe", "--no-warmup", "--concurrency", "1"]) == 1
+    out = capsys.readouterr().out
+    assert "Failed: second" in out
+    scratch = tmp_path / ".render-cache" / "local"  # where local:// runs write
+    assert sorted(json.loads((scratch / "assets.state.json").read_text())) == ["out/first.png"]
+    assert not (scratch / "out" / "second.png").exists()
+
+    assert build([str(manifest), "--check"]) == 1
+    assert "second" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from mascotgen import cli, imaging
+from mascotgen.imaging import available_formats, encode_modern, similarity, write_sizes
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+
+def mascot(mode: str = "RGB"):
+    """A 64px orange disc with a highlight on a soft gradient, with a transparent background in RGBA."""
+    img = Image.new(mode, (64, 64))
+    for y in range(64):
+        for x in range(64):
+            inside = (x - 32) ** 2 + (y - 30) ** 2 < 20 ** 2
+            if inside:
+                color = (255, 112, 67) if (x - 26) ** 2 + (y - 24) ** 2 > 16 else (255, 230, 220)
+            else:
+                color = (200 + x // 2, 200 + y // 2, 230)
+            img.putpixel((x, y), color + ((255 if inside else 0,) if mode == "RGBA" else ()))
+    return img
+
+
+def decoded(data: bytes, mode: str):
+    with Image.open(io.BytesIO(data)) as img:
+        return img.convert(mode)
+
+
+@pytest.mark.parametrize("fmt", available_formats())
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_the_chosen_quality_is_the_lowest_that_meets_the_threshold(fmt, mode):
+    img = mascot(mode)
+    data, quality, score = encode_modern(img, fmt, threshold=0.995)
+    assert score >= 0.995
+    assert similarity(img, decoded(data, mode)) == pytest.approx(score)
+    if quality > 20:
+        _, _, below = encode_modern(img, fmt, threshold=0.995, lo=quality - 1, hi=quality - 1)
+        assert below < 0.995
+
+
+def test_an_unreachable_threshold_returns_the_highest_quality_tried():
+    fmt = available_formats()[0] if available_formats() else pytest.skip("no WebP/AVIF encoder")
+    data, quality, score = encode_modern(mascot(), fmt, threshold=1.01, hi=90)
+    assert quality == 90
+    assert score < 1.01
+
+
+def test_alpha_is_judged_on_both_app_backgrounds():
+    img = mascot("RGBA")
+    fringe = img.copy()
+    fringe.putalpha(Image.eval(img.getchannel("A"), lambda a: max(a, 96)))  # background shows through
+    assert similarity(img, img) == pytest.approx(1.0)
+    assert similarity(img, fringe) < similarity(img.convert("RGB"), fringe.convert("RGB"))
+
+
+def test_sizes_are_written_in_every_requested_format(tmp_path):
+    formats = available_formats() or pytest.skip("no WebP/AVIF encoder")
+    source = io.BytesIO()
+    mascot().save(source, format="PNG")
+    rows = write_sizes(source.getvalue(), tmp_path, {"m.png": 48, "m-32.png": 32}, formats=formats, threshold=0.9)
+    assert [row[0].name for row in rows] == ["m.png", "m-32.png"] + [f"m{suffix}.{fmt}" for suffix in ("", "-32")
+                                                                     for fmt in formats]
+    assert all(row[5] is None for row in rows[:2]) and all(row[5] >= 20 for row in rows[2:])
+    assert all(row[0].exists() for row in rows)
+
+
+def test_a_format_this_pillow_cannot_encode_is_refused_up_front(monkeypatch, capsys):
+    monkeypatch.setattr(cli, "available_formats", lambda: ("webp",))
+    parser = cli.build_parser("test")
+    with pytest.raises(SystemExit):
+        cli.parse_args(parser, ["--format", "avif"])
+    assert "can't encode avif" in capsys.readouterr().err
+    assert cli.parse_args(parser, ["--format", "webp"]).formats == ["webp"]
+
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        imaging.encode_modern(mascot(), "jxl")
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import url
+from mascotgen.build import main as build
+from mascotgen.manifest import load_manifest, relocate
+
+MANIFEST = """
+url = "local://sandbox"
+
+[atlas]
+ts = "src/atlas.ts"
+
+[assets.piglet]
+prompt = "A pink piglet waving, solid white background"
+seed = 7
+output_dir = "out"
+sizes = { "piglet.png" = 32 }
+"""
+
+FLAGS = ["--no-qa", "--no-crop", "--no-warmup"]
+
+
+def written(root: Path) -> set:
+    return {path.relative_to(root).as_posix() for path in root.rglob("*") if path.is_file()}
+
+
+def test_a_local_run_writes_only_under_the_cache_dir(serve, requests, tmp_path, capsys):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    assert build([str(manifest), *FLAGS]) == 0
+    assert "Synthetic renders (local://): writing under" in capsys.readouterr().out
+    outside = {path for path in written(tmp_path) if not path.startswith(".render-cache/local/")}
+    assert outside == {"assets.toml"}
+    assert {".render-cache/local/out/piglet.png", ".render-cache/local/assets.state.json",
+            ".render-cache/local/src/atlas.ts"} <= written(tmp_path)
+
+    # Against ComfyUI, nothing of the synthetic run is current or cached.
+    server_url = url(serve())
+    assert build([str(manifest), "--check", "--url", server_url]) == 1
+    assert build([str(manifest), "--url", server_url, *FLAGS]) == 0
+    out = capsys.readouterr().out
+    assert "Cache hit" not in out
+    assert ("POST", "/prompt") in requests
+    assert (tmp_path / "out" / "piglet.png").exists()
+    assert build([str(manifest), "--check", "--url", server_url]) == 0
+
+
+def test_a_local_pick_is_not_recorded_in_the_manifest(tmp_path, capsys):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    assert build([str(manifest), "--all", "--variants", "2", "--pick", "1", "piglet", *FLAGS]) == 0
+    assert "Not recorded in assets.toml: piglet's candidates are synthetic" in capsys.readouterr().out
+    assert manifest.read_text() == MANIFEST
+
+
+def test_local_and_comfyui_servers_are_not_mixed(tmp_path):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST)
+    with pytest.raises(SystemExit, match="can't be mixed"):
+        build([str(manifest), "--url", "local://", "--url", "http://127.0.0.1:1", *FLAGS])
+
+
+def test_relocate_keeps_the_layout_under_the_root(tmp_path):
+    manifest = load_manifest(Path(__file__).resolve().parent.parent / "manifests" / "name-chemi.toml")
+    moved = relocate(manifest, tmp_path)
+    assert {Path(job.output_dir) for job in moved.jobs} == {tmp_path / "public" / "mascot", tmp_path / "app-logos"}
+    assert moved.state_path == tmp_path / "name-chemi.state.json"
+    assert moved.cache_dir == tmp_path / ".render-cache"
+    assert moved.atlas.ts == tmp_path / "src" / "data" / "mascot-atlas.ts"
+    assert moved.path == manifest.path
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from mascotgen.imaging import CropSpec
+from mascotgen.manifest import load_manifest
+from mascotgen.plan import RenderPlan, largest, plan
+
+MANIFESTS = Path(__file__).resolve().parent.parent / "manifests"
+
+
+@pytest.mark.parametrize("output, expected", [(128, 256), (171, 320), (256, 384), (300, 512), (512, 768)])
+def test_the_render_is_the_oversampled_output_rounded_up_to_64(output, expected):
+    assert plan(RenderPlan(oversample=1.5), {"a.png": output, "a-48.png": 48}) == (expected, None)
+
+
+def test_the_oversample_factor_scales_the_render():
+    assert plan(RenderPlan(oversample=1.0), {"a.png": 320}) == (320, None)
+    assert plan(RenderPlan(oversample=2.0), {"a.png": 320}) == (640, None)
+    assert plan(RenderPlan(oversample=2.0, multiple=16), {"a.png": 130}) == (272, None)
+
+
+def test_a_cropped_asset_renders_larger_by_the_subject_fill():
+    sizes = {"mascot.png": 256, "mascot-xs.png": 48}
+    assert plan(RenderPlan(), sizes) == (384, None)
+    assert plan(RenderPlan(), sizes, CropSpec()) == (576, None)  # 384 / 0.7 = 549
+
+
+def test_renders_stay_within_the_size_limits():
+    assert plan(RenderPlan(), {"a.png": 48}) == (256, None)
+    assert plan(RenderPlan(), {"a.png": 2000}) == (1024, None)
+    assert largest({"a.png": (600, 200), "b.png": 128}) == 600
+
+
+def test_only_large_outputs_render_in_two_stages():
+    spec = RenderPlan(upscale_model="RealESRGAN_x2.pth")
+    assert plan(spec, {"logo.png": 600}) == (512, "RealESRGAN_x2.pth")  # 900 / 2 = 450
+    assert plan(spec, {"mascot.png": 128}, CropSpec()) == (320, None)
+    assert plan(RenderPlan(), {"logo.png": 600}) == (960, None)
+
+
+def test_the_manifests_plan_what_their_comments_say():
+    love = load_manifest(MANIFESTS / "love-fortune.toml")
+    assert {job.name: job.gen_size for job in love.jobs}["mascot-main"] == 576  # 256, cropped
+    assert love.combos.gen_size == 512  # pinned
+    assert love.combos.upscale_model is None
+
+    chemi = {job.name: job for job in load_manifest(MANIFESTS / "name-chemi.toml").jobs}
+    assert {chemi[name].gen_size for name in chemi if name.startswith("mascot-")} == {320}
+    logo = chemi["name-chemi-logo"]
+    assert (logo.gen_size, logo.upscale_model) == (512, None)  # pinned, single stage
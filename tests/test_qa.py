@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import job
+from mascotgen.qa import QAFailed, QASpec, check, failures, measure, reroll, reroll_seed
+
+pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+WHITE = (255, 255, 255)
+BRAND = (255, 112, 67)
+SPEC = QASpec(background=WHITE, brand=BRAND)
+
+
+def render(size: int = 128, centre=(0.5, 0.5), radius: float = 0.25, color=BRAND, background=WHITE):
+    """A disc of color on background, centred at `centre` (fractions of the side)."""
+    img = Image.new("RGB", (size, size), background)
+    cx, cy, r = centre[0] * size, centre[1] * size, radius * size
+    ImageDraw.Draw(img).ellipse((cx - r, cy - r, cx + r, cy + r), fill=color)
+    return img
+
+
+def test_a_centred_brand_subject_on_the_background_passes():
+    metrics = measure(render(), SPEC)
+    assert metrics["border"] == 1.0
+    assert metrics["offset"] < 0.01
+    assert metrics["brand"] > 0.9
+    assert 0.15 < metrics["subject"] < 0.25
+    assert failures(metrics, SPEC) == []
+
+
+def test_an_off_centre_subject_fails():
+    metrics = measure(render(centre=(0.7, 0.5)), SPEC)
+    assert metrics["offset"] == pytest.approx(0.2, abs=0.02)
+    assert failures(metrics, SPEC) == ["off-centre by 20% (max 12%)"]
+    assert failures(measure(render(centre=(0.55, 0.45)), SPEC), SPEC) == []  # within max_offset
+
+
+def test_the_wrong_background_fails_the_border():
+    dark = render(background=(0x1A, 0x0A, 0x14))
+    problems = failures(measure(dark, SPEC), SPEC)
+    assert problems[0].startswith("border 0% background")
+    assert failures(measure(dark, QASpec(brand=BRAND)), QASpec(brand=BRAND)) == []  # background from the border
+
+
+def test_a_subject_running_off_the_edge_fails_the_border():
+    metrics = measure(render(radius=0.5), SPEC)
+    assert metrics["border"] < SPEC.min_border
+    assert any(problem.startswith("border") for problem in failures(metrics, SPEC))
+
+
+def test_a_subject_without_the_brand_hue_fails():
+    metrics = measure(render(color=(40, 90, 220)), SPEC)
+    assert metrics["brand"] == 0.0
+    assert failures(metrics, SPEC) == ["brand hue 0.0% of subject (min 3%)"]
+    assert measure(render(color=(40, 90, 220)), QASpec(background=WHITE))["brand"] is None
+
+
+def test_a_blank_render_has_no_subject():
+    metrics = measure(Image.new("RGB", (64, 64), WHITE), SPEC)
+    assert metrics["subject"] == 0.0
+    assert failures(metrics, SPEC) == ["no subject"]
+
+
+def test_large_renders_are_measured_on_a_thumbnail():
+    assert measure(render(1024, centre=(0.7, 0.5)), SPEC)["offset"] == pytest.approx(0.2, abs=0.02)
+
+
+def test_check_raises_for_a_failing_render(tmp_path):
+    piglet = job(tmp_path)
+    piglet.qa = SPEC
+    good, bad = tmp_path / "good.png", tmp_path / "bad.png"
+    render().save(good)
+    render(centre=(0.3, 0.5)).save(bad)
+    assert check(piglet, good)["brand"] > 0.9
+    with pytest.raises(QAFailed) as failed:
+        check(piglet, bad)
+    assert failed.value.job is piglet
+    assert failed.value.failures == ["off-centre by 20% (max 12%)"]
+    piglet.qa = None
+    assert check(piglet, bad) is None
+
+
+def test_rerolled_seeds_are_stable_and_distinct():
+    seeds = [reroll_seed(42, attempt) for attempt in (1, 2, 3)]
+    assert seeds == [reroll_seed(42, attempt) for attempt in (1, 2, 3)]
+    assert len(set(seeds + [42])) == 4
+    assert reroll(job("."), 1).seed == reroll_seed(1, 1)
@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import FAST, finished, job, url
+from mascotgen import aio
+from mascotgen.client import ComfyClient, open_client
+from mascotgen.journal import Journal
+from mascotgen.pipeline import Pipeline
+
+
+def crashed_run(base_url: str, journal: Journal, jobs: list) -> list:
+    """Queue jobs and journal them, then walk away as a killed run would."""
+    client = open_client(base_url, journal.client_id(base_url), policy=FAST)
+    pipeline = Pipeline(client, policy=FAST, journal=journal)
+    try:
+        return [pipeline.queue(j, j.workflow()) for j in jobs]
+    finally:
+        client.close()
+
+
+def submitted(requests) -> int:
+    return sum(1 for method, path in requests if (method, path) == ("POST", "/prompt"))
+
+
+@pytest.mark.parametrize("runner", ["sync", "pipelined", "async"])
+def test_resume_from_the_journal(serve, requests, tmp_path, capsys, runner):
+    server = serve(latency=0.2)
+    journal_path = tmp_path / "journal.json"
+    jobs = [job(tmp_path, f"piglet-{i}", seed=i) for i in range(3)]
+    prompt_ids = crashed_run(url(server), Journal(journal_path), jobs[:2])
+    assert submitted(requests) == 2
+
+    journal = Journal(journal_path)
+    client = ComfyClient(url(server), journal.client_id(url(server)), policy=FAST)
+    pipeline = Pipeline(client, policy=FAST, journal=journal)
+    try:
+        if runner == "sync":
+            results = pipeline.run(jobs)
+        elif runner == "pipelined":
+            results = pipeline.run_pipelined(jobs)
+        else:
+            results = aio.run(pipeline, url(server), jobs, concurrency=3, warmup=False)
+    finally:
+        client.close()
+
+    assert results == {j.name: True for j in jobs}
+    assert submitted(requests) == 3  # only the job the crashed run never queued
+    out = capsys.readouterr().out
+    assert all(f"Resumed: {j.name} -> {prompt_id}" in out for j, prompt_id in zip(jobs, prompt_ids))
+    assert Journal(journal_path).assets == {}
+
+
+def test_resume_on_the_local_backend(tmp_path, capsys):
+    base_url = "local://resume?latency=0.2"
+    journal_path = tmp_path / "journal.json"
+    jobs = [job(tmp_path, f"piglet-{i}", seed=i) for i in range(2)]
+    crashed_run(base_url, Journal(journal_path), jobs[:1])
+
+    pipeline = Pipeline(None, policy=FAST, journal=Journal(journal_path))
+    results = aio.run(pipeline, base_url, jobs, concurrency=2, warmup=False)
+
+    assert results == {j.name: True for j in jobs}
+    assert "Resumed: piglet-0" in capsys.readouterr().out
+    assert len(open_client(base_url).engine.history) == 2
+
+
+def test_a_stale_journal_entry_is_queued_afresh(serve, requests, tmp_path, capsys):
+    server = serve()
+    journal_path = tmp_path / "journal.json"
+    piglet = job(tmp_path)
+    prompt_id, = crashed_run(url(server), Journal(journal_path), [piglet])
+    finished(server, prompt_id)
+    server.comfy.history.clear()  # the server restarted: the prompt is gone
+
+    journal = Journal(journal_path)
+    client = ComfyClient(url(server), journal.client_id(url(server)), policy=FAST)
+    try:
+        assert Pipeline(client, policy=FAST, journal=journal).run([piglet]) == {piglet.name: True}
+    finally:
+        client.close()
+    assert submitted(requests) == 2
+    assert "Resumed" not in capsys.readouterr().out
@@ -0,0 +1,67 @@
+import dataclasses
+import threading
+import time
+
+from conftest import FAST, job, url
+from mascotgen import fake_server
+from mascotgen.pipeline import Pipeline
+from mascotgen.scheduler import Scheduler
+
+
+def run(scheduler: Scheduler, jobs: list) -> dict:
+    healthy = scheduler.connect()
+    assert healthy
+    try:
+        return scheduler.run(jobs, Pipeline(healthy[0].client, policy=FAST))
+    finally:
+        scheduler.close()
+
+
+def test_failover_to_the_surviving_backend(serve, tmp_path, capsys):
+    a, b = serve(latency=0.3), serve(latency=0.3)
+    scheduler = Scheduler([url(a), url(b)], depth=2, health_interval=0.2, policy=FAST)
+    jobs = [job(tmp_path, f"piglet-{i}", seed=i) for i in range(6)]
+
+    def kill_b_with_work_on_it():
+        backend = scheduler.backends[1]
+        deadline = time.time() + 10
+        while not backend.in_flight and time.time() < deadline:
+            time.sleep(0.01)
+        fake_server.kill(b)
+
+    killer = threading.Thread(target=kill_b_with_work_on_it)
+    killer.start()
+    results = run(scheduler, jobs)
+    killer.join()
+
+    assert results == {j.name: True for j in jobs}
+    assert all((tmp_path / f"{j.name}.png").exists() for j in jobs)
+    out = capsys.readouterr().out
+    assert f"Backend {url(b)} is down" in out
+    assert "Requeue:" in out
+
+
+def test_local_backends_share_the_work(tmp_path):
+    scheduler = Scheduler(["local://sched-a", "local://sched-b"], depth=1)
+    jobs = [job(tmp_path, f"piglet-{i}", seed=i) for i in range(4)]
+    results = run(scheduler, jobs)
+    assert results == {j.name: True for j in jobs}
+    used = {backend.url for backend in scheduler.backends if backend.client.engine.history}
+    assert used == {"local://sched-a", "local://sched-b"}
+
+
+def test_a_missing_output_fails_the_job_not_the_backend(serve, monkeypatch, tmp_path, capsys):
+    server = serve()
+    do_get = fake_server.Handler.do_GET
+
+    def get(self):
+        if self.path.startswith("/view") and "filename=broken" in self.path:
+            return self._json({"error": "gone"}, 404)
+        return do_get(self)
+
+    monkeypatch.setattr(fake_server.Handler, "do_GET", get)
+    scheduler = Scheduler([url(server)], depth=2, policy=FAST)
+    jobs = [dataclasses.replace(job(tmp_path, "broken"), prefix="broken"), job(tmp_path, "fine")]
+    results = run(scheduler, jobs)
+    assert results == {"broken": False, "fine": True}
+    assert "is down" not in capsys.readouterr().out
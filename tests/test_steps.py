@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from mascotgen.steps import SLEEP, adrive, drive
+
+
+def flaky(calls: list):
+    """A step that asks for a failing call, recovers, sleeps and returns what it saw."""
+    try:
+        yield calls.append, "fails"
+        yield int, "not a number"
+    except ValueError as e:
+        seen = str(e)
+    yield SLEEP, 0
+    return seen
+
+
+async def twice(n):
+    await asyncio.sleep(0)
+    return 2 * n
+
+
+def doubled():
+    return (yield twice, 21)
+
+
+def test_drive_sends_results_and_throws_errors():
+    calls = []
+    assert "invalid literal" in drive(flaky(calls))
+    assert calls == ["fails"]
+
+
+def test_adrive_awaits_what_calls_return():
+    calls = []
+    assert "invalid literal" in asyncio.run(adrive(flaky(calls)))
+    assert asyncio.run(adrive(doubled())) == 42
+
+
+def test_cancelling_adrive_closes_the_step():
+    closed = []
+
+    def step():
+        try:
+            yield asyncio.sleep, 10
+        finally:
+            closed.append(True)
+
+    async def main():
+        task = asyncio.create_task(adrive(step()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+    assert closed == [True]
@@ -0,0 +1,47 @@
+import json
+
+from conftest import url
+from mascotgen.build import main as build
+from mascotgen.manifest import load_manifest
+
+MANIFEST = """
+url = "{url}"
+
+[assets.piglet]
+prompt = "A pink piglet waving, solid white background"
+seed = 7
+output_dir = "out"
+sizes = { "piglet.png" = 32 }
+"""
+
+FLAGS = ["--no-qa", "--no-crop", "--no-warmup"]
+
+
+def test_a_pick_is_recorded_and_rebuilds_to_the_same_image(serve, tmp_path):
+    manifest = tmp_path / "assets.toml"
+    manifest.write_text(MANIFEST.replace("{url}", url(serve())))
+    assert build([str(manifest), "--all", "--variants", "3", "--pick", "1", "piglet", *FLAGS]) == 0
+    assert "seed = 7\nvariant = 1\n" in manifest.read_text()
+    assert load_manifest(manifest).jobs[0].variant == 1
+    picked = (tmp_path / "out" / "piglet.png").read_bytes()
+
+    assert build([str(manifest), "--check"]) == 0  # the state has the pick as the manifest now asks for it
+    assert build([str(manifest), "--all", *FLAGS]) == 0
+    assert (tmp_path / "out" / "piglet.png").read_bytes() == picked
+
+    assert build([str(manifest), "--all", "--variants", "3", "--pick", "2", "piglet", *FLAGS]) == 0
+    assert manifest.read_text().count("variant = ") == 1
+    assert "variant = 2" in manifest.read_text()
+    assert (tmp_path / "out" / "piglet.png").read_bytes() != picked
+    assert list(json.loads((tmp_path / "assets.state.json").read_text())) == ["out/piglet.png"]
+
+
+def test_a_sweep_without_a_pick_leaves_manifest_and_state_alone(serve, tmp_path):
+    manifest = tmp_path / "assets.toml"
+    text = MANIFEST.replace("{url}", url(serve()))
+    manifest.write_text(text)
+    assert build([str(manifest), "--all", "--variants", "3", "piglet", *FLAGS]) == 0
+    assert manifest.read_text() == text
+    assert not (tmp_path / "assets.state.json").exists()
+    assert sorted(p.name for p in (tmp_path / "sweeps" / "piglet").iterdir()) == [
+        "piglet-v0.png", "piglet-v1.png", "piglet-v2.png"]
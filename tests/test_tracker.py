@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import finished, job, url
+from mascotgen.aio import AsyncComfyClient
+from mascotgen.client import ComfyClient
+from mascotgen.tracker import CompletionTracker
+
+
+def test_websocket_completion(serve, tmp_path):
+    server = serve()
+    client = ComfyClient(url(server))
+    try:
+        assert client.tracker.connected
+        prompt_id = client.queue_prompt(job(tmp_path).workflow())
+        entry = client.wait(prompt_id, timeout=10)
+    finally:
+        client.close()
+    assert ComfyClient.output_images(entry)
+    assert [msg for msg, _ in entry["status"]["messages"]][-1] == "execution_success"
+
+
+def test_polling_fallback(serve, no_websocket, requests, tmp_path):
+    server = serve()
+    client = ComfyClient(url(server))
+    try:
+        assert not client.tracker.connected
+        prompt_id = client.queue_prompt(job(tmp_path).workflow())
+        entry = client.wait(prompt_id, timeout=10)
+    finally:
+        client.close()
+    assert ComfyClient.output_images(entry)
+    assert ("GET", f"/history/{prompt_id}") in requests
+
+
+def test_prompt_finished_before_the_socket_subscribed(serve, tmp_path):
+    """The fast-completion race: no event is coming, so one /history check has to find it."""
+    server = serve(latency=0)
+    client = ComfyClient(url(server))
+    try:
+        prompt_id = client.queue_prompt(job(tmp_path).workflow())
+        finished(server, prompt_id)
+        assert client.tracker.connected
+        start = time.time()
+        entry = client.wait(prompt_id, timeout=5)
+    finally:
+        client.close()
+    assert time.time() - start < CompletionTracker.SWEEP_INTERVAL / 5
+    assert ComfyClient.output_images(entry)
+
+
+def test_wait_any_returns_whichever_finishes(serve, tmp_path):
+    server = serve(latency=0.2)
+    client = ComfyClient(url(server))
+    try:
+        first = client.queue_prompt(job(tmp_path, "first").workflow())
+        second = client.queue_prompt(job(tmp_path, "second").workflow())
+        waiting = [second, first]
+        while waiting:
+            prompt_id, entry = client.tracker.wait_any(waiting, timeout=10)
+            assert ComfyClient.output_images(entry)
+            waiting.remove(prompt_id)
+        with pytest.raises(TimeoutError):
+            client.tracker.wait_any([client.queue_prompt(job(tmp_path, "third").workflow())], timeout=0.05)
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize("websocket", [True, False], ids=["websocket", "polling"])
+def test_async_wait(serve, request, tmp_path, websocket):
+    if not websocket:
+        request.getfixturevalue("no_websocket")
+    server = serve(latency=0)
+
+    async def main():
+        client = AsyncComfyClient(url(server))
+        try:
+            assert await client.start_tracking() is websocket
+            # Finished before anyone waits on it, and (with the socket) before it subscribed.
+            early = await client.queue_prompt(job(tmp_path, "early").workflow())
+            finished(server, early)
+            start = time.time()
+            await client.wait(early, timeout=5)
+            elapsed = time.time() - start
+            late = await client.queue_prompt(job(tmp_path, "late").workflow())
+            entry = await client.wait(late, timeout=10)
+        finally:
+            await client.close()
+        return elapsed, entry
+
+    elapsed, entry = asyncio.run(main())
+    assert elapsed < CompletionTracker.SWEEP_INTERVAL / 5
+    assert ComfyClient.output_images(entry)